@@ -0,0 +1,8 @@
+"""
+Game-Style Calculator - Batch Module
+This module evaluates large expression files without loading them into memory
+"""
+
+# Import batch entry points for easy access
+from .stream import BatchStats, iter_lines, evaluate_lines, evaluate_file
+from .parallel import evaluate_file_parallel, evaluate_parallel
@@ -0,0 +1,113 @@
+"""
+Game-Style Calculator - Batch Command Line
+Evaluates an expression file, one expression per line.
+
+Usage:
+    python -m batch expressions.txt                  Results to stdout as text
+    python -m batch expressions.txt -f csv -o out.csv
+    python -m batch - -f jsonl < expressions.txt     Read standard input
+    python -m batch expressions.txt -j 0             One worker process per CPU
+"""
+
+# Standard library imports
+import argparse
+import sys
+
+# Local application imports
+from calculator import logger, parse_number
+from batch.parallel import DEFAULT_SHARD_SIZE, evaluate_file_parallel
+from batch.stream import (
+    DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, OUTPUT_FORMATS, evaluate_file
+)
+
+# Output buffer size; results are already written in large batches
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+def positive_int(text):
+    """Argument type for sizes, which must be at least 1."""
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return value
+
+
+def build_parser():
+    """
+    Build the argument parser for the batch command.
+    
+    Returns:
+        argparse.ArgumentParser: The configured parser
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m batch", description="Evaluate one expression per line of a file.")
+    parser.add_argument("input", help='expression file, or "-" for standard input')
+    parser.add_argument("-o", "--output", default="-",
+                        help='result file (default: "-" for standard output)')
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="text",
+                        help="output format (default: text)")
+    angle = parser.add_mutually_exclusive_group()
+    angle.add_argument("--deg", dest="angle_mode", action="store_const", const="DEG",
+                       default="DEG", help="trigonometric functions take degrees (default)")
+    angle.add_argument("--rad", dest="angle_mode", action="store_const", const="RAD",
+                       help="trigonometric functions take radians")
+    parser.add_argument("--ans", type=parse_number, default=0, help="value of ANS")
+    parser.add_argument("--memory", type=parse_number, default=0, help="value of M")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE,
+                        help="input bytes read per step")
+    parser.add_argument("--batch-size", type=positive_int, default=DEFAULT_BATCH_SIZE,
+                        help="output records written per write")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="worker processes; 0 for one per CPU (default: 1)")
+    parser.add_argument("--shard-size", type=positive_int, default=DEFAULT_SHARD_SIZE,
+                        help="input bytes per work unit when using several workers")
+    parser.add_argument("--no-mmap", dest="use_mmap", action="store_false",
+                        help="read the input with read() instead of mmap")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="do not report throughput on stderr")
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the batch command.
+    
+    Args:
+        argv (list): Arguments without the program name; defaults to sys.argv[1:]
+        
+    Returns:
+        int: Process exit code (0 if every line succeeded, 1 otherwise)
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers != 1 and args.input == "-":
+        parser.error("standard input cannot be split between workers; use -j 1")
+    logger.disabled = True
+    
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        output = open(args.output, "w", encoding="utf-8", newline="",
+                      buffering=OUTPUT_BUFFER_SIZE)
+    try:
+        if args.workers != 1:
+            stats = evaluate_file_parallel(
+                args.input, output, fmt=args.format, workers=args.workers,
+                shard_size=args.shard_size, angle_mode=args.angle_mode,
+                ans=args.ans, memory=args.memory)
+        else:
+            stats = evaluate_file(
+                args.input, output, fmt=args.format, angle_mode=args.angle_mode,
+                ans=args.ans, memory=args.memory, chunk_size=args.chunk_size,
+                batch_size=args.batch_size, use_mmap=args.use_mmap)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    if not args.quiet:
+        sys.stderr.write(stats.summary() + "\n")
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Game-Style Calculator - Parallel Batch Evaluation
+Spreads batch evaluation over a pool of worker processes.
+
+Files are split into newline-aligned byte ranges; iterables are split into
+lists of lines. Each work unit is evaluated and formatted by a worker, and
+results are written in input order. Workers live for the whole run, so
+each keeps its own warm compiled-expression cache.
+"""
+
+# Standard library imports
+import io
+import itertools
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Local application imports
+from calculator import DEFAULT_LIMITS, evaluate_many, logger
+from batch.stream import FORMATTERS, BatchStats, evaluate_lines, iter_lines
+
+# Bytes of input per work unit
+DEFAULT_SHARD_SIZE = 4 << 20
+
+# Expressions per work unit when evaluating an iterable
+DEFAULT_SHARD_LINES = 20000
+
+# Work units queued per worker; bounds memory while keeping workers busy
+PREFETCH_PER_WORKER = 2
+
+#-----------------------------------------------------------------------------
+# Sharding
+#-----------------------------------------------------------------------------
+
+def split_file(path, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Split a file into newline-aligned byte ranges.
+    
+    Newlines are counted while splitting, so every shard knows the number of
+    its first line without the workers having to coordinate.
+    
+    Args:
+        path (str): Path of the expression file
+        shard_size (int): Approximate bytes per shard
+        
+    Yields:
+        tuple: (start, end, first_line_number) for each shard
+        
+    Raises:
+        ValueError: If shard_size is not positive
+    """
+    if shard_size <= 0:
+        raise ValueError(f"Shard size must be positive, got {shard_size}")
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start, line = 0, 1
+            while start < size:
+                end = mapped.find(b"\n", min(start + shard_size, size) - 1)
+                end = size if end < 0 else end + 1
+                yield start, end, line
+                line += mapped[start:end].count(b"\n")
+                start = end
+
+#-----------------------------------------------------------------------------
+# Workers
+#-----------------------------------------------------------------------------
+
+def _init_worker():
+    """Prepare a worker process; batch runs never log per expression."""
+    logger.disabled = True
+
+
+def _evaluate_shard(path, start, end, first_line, fmt, options):
+    """
+    Evaluate and format one byte range of a file in a worker.
+    
+    Returns:
+        tuple: (formatted text, records written, records with an error)
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    offset = first_line - 1
+    lines = ((number + offset, text)
+             for number, text in iter_lines(io.BytesIO(data), len(data) + 1, use_mmap=False))
+    records = list(evaluate_lines(lines, **options))
+    errors = sum(1 for record in records if record[3])
+    return FORMATTERS[fmt][0](records), len(records), errors
+
+
+def _evaluate_block(expressions, options):
+    """Evaluate a list of expressions in a worker."""
+    return list(evaluate_many(expressions, **options))
+
+
+def _ordered_results(executor, tasks, window):
+    """
+    Submit tasks with at most `window` in flight and yield results in order.
+    
+    Args:
+        executor (ProcessPoolExecutor): Pool to submit to
+        tasks (iterable): (function, args) pairs
+        window (int): Maximum number of outstanding tasks
+        
+    Yields:
+        The result of each task, in submission order
+    """
+    pending = deque()
+    for func, args in tasks:
+        pending.append(executor.submit(func, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+#-----------------------------------------------------------------------------
+# Public API
+#-----------------------------------------------------------------------------
+
+def _worker_count(workers):
+    """Resolve the worker count, where None or 0 means one per CPU."""
+    return workers or os.cpu_count() or 1
+
+
+def evaluate_file_parallel(path, output, *, fmt="text", workers=None, shard_size=DEFAULT_SHARD_SIZE,
+                           angle_mode="DEG", ans=0, memory=0, limits=DEFAULT_LIMITS):
+    """
+    Evaluate an expression file with a pool of worker processes.
+    
+    Produces exactly the output of batch.stream.evaluate_file().
+    
+    Args:
+        path (str): Path of the input file (standard input cannot be sharded)
+        output: Text stream to write results to
+        fmt (str): Output format, one of "text", "csv" or "jsonl"
+        workers (int): Number of worker processes; None or 0 for one per CPU
+        shard_size (int): Approximate input bytes per work unit
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        limits (ResourceLimits): Resource guard settings; None disables the guard
+        
+    Returns:
+        BatchStats: Line, error and timing totals for the run
+        
+    Raises:
+        ValueError: If fmt is unknown or shard_size is not positive
+    """
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    if shard_size <= 0:
+        raise ValueError(f"Shard size must be positive, got {shard_size}")
+    start_time = time.perf_counter()
+    workers = _worker_count(workers)
+    options = {"angle_mode": angle_mode, "ans": ans, "memory": memory, "limits": limits}
+    
+    header = FORMATTERS[fmt][1]
+    if header:
+        output.write(header)
+    
+    count = errors = 0
+    tasks = ((_evaluate_shard, (path, start, end, line, fmt, options))
+             for start, end, line in split_file(path, shard_size))
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        for text, shard_count, shard_errors in _ordered_results(
+                executor, tasks, workers * PREFETCH_PER_WORKER):
+            output.write(text)
+            count += shard_count
+            errors += shard_errors
+    output.flush()
+    
+    return BatchStats(count, errors, os.path.getsize(path), time.perf_counter() - start_time)
+
+
+def evaluate_parallel(expressions, *, workers=None, shard_lines=DEFAULT_SHARD_LINES,
+                      angle_mode="DEG", ans=0, memory=0, limits=DEFAULT_LIMITS):
+    """
+    Evaluate an iterable of expressions lazily with a pool of worker processes.
+    
+    A parallel counterpart of evaluate_many(): results come back in input
+    order and the iterable is consumed a few blocks at a time.
+    
+    Args:
+        expressions (iterable): Raw mathematical expressions
+        workers (int): Number of worker processes; None or 0 for one per CPU
+        shard_lines (int): Expressions per work unit
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        limits (ResourceLimits): Resource guard settings; None disables the guard
+        
+    Yields:
+        tuple: (success, result_string, error_message) for each expression
+        
+    Raises:
+        ValueError: If shard_lines is not positive
+    """
+    if shard_lines <= 0:
+        raise ValueError(f"Shard size must be positive, got {shard_lines}")
+    workers = _worker_count(workers)
+    options = {"angle_mode": angle_mode, "ans": ans, "memory": memory, "limits": limits}
+    iterator = iter(expressions)
+    blocks = iter(lambda: list(itertools.islice(iterator, shard_lines)), [])
+    tasks = ((_evaluate_block, (block, options)) for block in blocks)
+    
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        for results in _ordered_results(executor, tasks, workers * PREFETCH_PER_WORKER):
+            yield from results
@@ -0,0 +1,273 @@
+"""
+Game-Style Calculator - Streaming Batch Evaluation
+Evaluates expression files of any size, one expression per line, through
+a generator pipeline:
+
+    read chunks (mmap or read()) -> split lines -> evaluate -> format -> write
+
+Only one input chunk and one batch of output records are held at a time,
+so memory use stays flat however large the file is.
+"""
+
+# Standard library imports
+import csv
+import io
+import itertools
+import json
+import mmap
+import os
+import sys
+import time
+from collections import namedtuple
+
+# Local application imports
+from calculator import DEFAULT_LIMITS, evaluate_many
+
+# Bytes read from the input per step
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Output records formatted and written per write() call
+DEFAULT_BATCH_SIZE = 4096
+
+# Output formats accepted by evaluate_file()
+OUTPUT_FORMATS = ("text", "csv", "jsonl")
+
+# Column names for the CSV header and JSONL keys
+COLUMNS = ("line", "expression", "result", "error")
+
+
+class BatchStats(namedtuple("BatchStats", ["lines", "errors", "bytes", "seconds"])):
+    """
+    Summary of a batch run.
+    
+    Fields:
+        lines (int): Expressions evaluated (blank lines are not counted)
+        errors (int): Expressions that failed
+        bytes (int): Input size in bytes
+        seconds (float): Wall-clock duration
+    """
+    
+    __slots__ = ()
+    
+    @property
+    def lines_per_second(self):
+        """float: Throughput of the run."""
+        return self.lines / self.seconds if self.seconds > 0 else 0.0
+    
+    def summary(self):
+        """
+        Describe the run in one line for progress output.
+        
+        Returns:
+            str: Human-readable summary
+        """
+        return (f"Evaluated {self.lines:,} lines ({self.errors:,} errors) "
+                f"in {self.seconds:.2f} s: {self.lines_per_second:,.0f} lines/sec")
+
+#-----------------------------------------------------------------------------
+# Input
+#-----------------------------------------------------------------------------
+
+def _iter_mmap_chunks(file, chunk_size):
+    """
+    Yield successive chunks of a regular file through a read-only mapping.
+    
+    Pages already consumed are released as we go, so the mapping does not
+    pin the whole file in resident memory.
+    """
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        release = hasattr(mapped, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+        # madvise() ranges must start on a page boundary
+        chunk_size = max(mmap.PAGESIZE, chunk_size - chunk_size % mmap.PAGESIZE)
+        size = len(mapped)
+        for start in range(0, size, chunk_size):
+            yield mapped[start:start + chunk_size]
+            if release:
+                mapped.madvise(mmap.MADV_DONTNEED, start, min(chunk_size, size - start))
+
+
+def _iter_read_chunks(file, chunk_size):
+    """Yield successive chunks of a binary stream using read()."""
+    read = file.read
+    chunk = read(chunk_size)
+    while chunk:
+        yield chunk
+        chunk = read(chunk_size)
+
+
+def iter_lines(file, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=True):
+    """
+    Yield the numbered lines of a binary file, reading it chunk by chunk.
+    
+    Regular files are memory-mapped when use_mmap is set; pipes, empty files
+    and other streams fall back to read(). Lines are decoded as UTF-8 with
+    surrounding whitespace (including \\r of CRLF endings) stripped.
+    
+    Args:
+        file: Binary file object opened for reading
+        chunk_size (int): Bytes to process per step
+        use_mmap (bool): Whether to try memory-mapping the file
+        
+    Yields:
+        tuple: (line_number, text) with line numbers starting at 1
+    """
+    chunks = None
+    if use_mmap:
+        try:
+            if os.fstat(file.fileno()).st_size > 0:
+                chunks = _iter_mmap_chunks(file, chunk_size)
+        except (OSError, ValueError, io.UnsupportedOperation):
+            chunks = None
+    if chunks is None:
+        chunks = _iter_read_chunks(file, chunk_size)
+    
+    number = 0
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk if carry else chunk
+        # Decode only up to the last newline so multi-byte characters and
+        # lines that straddle a chunk boundary are carried over intact
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            carry = data
+            continue
+        carry = data[cut + 1:]
+        for line in data[:cut].decode("utf-8", "replace").split("\n"):
+            number += 1
+            yield number, line.strip()
+    if carry:
+        yield number + 1, carry.decode("utf-8", "replace").strip()
+
+#-----------------------------------------------------------------------------
+# Evaluation
+#-----------------------------------------------------------------------------
+
+def evaluate_lines(lines, *, angle_mode="DEG", ans=0, memory=0, cache=None,
+                   limits=DEFAULT_LIMITS):
+    """
+    Evaluate numbered lines lazily, skipping blank ones.
+    
+    Every line sees the same ANS and memory values; lines do not feed into
+    each other, which keeps results independent of how a file is split up.
+    
+    Args:
+        lines (iterable): (line_number, expression) pairs, e.g. from iter_lines()
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        cache (ExpressionCache): Cache to compile through; defaults to the shared cache
+        limits (ResourceLimits): Resource guard settings; None disables the guard
+        
+    Yields:
+        tuple: (line_number, expression, result, error); result is "" on failure
+    """
+    numbered, expressions = itertools.tee(
+        (number, expr) for number, expr in lines if expr)
+    outcomes = evaluate_many((expr for _, expr in expressions), angle_mode=angle_mode,
+                             ans=ans, memory=memory, cache=cache, limits=limits)
+    for (number, expr), (success, result, error) in zip(numbered, outcomes):
+        yield number, expr, result if success else "", error
+
+#-----------------------------------------------------------------------------
+# Output
+#-----------------------------------------------------------------------------
+
+def format_text(records):
+    """Format records as "line<TAB>result" or "line<TAB>Error: message" lines."""
+    return "".join(
+        f"{number}\t{result}\n" if not error else f"{number}\tError: {error}\n"
+        for number, _, result, error in records)
+
+
+def format_csv(records):
+    """Format records as CSV rows (line, expression, result, error)."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(records)
+    return buffer.getvalue()
+
+
+def format_jsonl(records):
+    """Format records as JSON objects, one per line."""
+    dumps = json.dumps
+    return "".join(dumps(dict(zip(COLUMNS, record)), ensure_ascii=False) + "\n"
+                   for record in records)
+
+
+# Batch formatter and header line for each output format
+FORMATTERS = {
+    "text": (format_text, ""),
+    "csv": (format_csv, ",".join(COLUMNS) + "\n"),
+    "jsonl": (format_jsonl, ""),
+}
+
+
+def write_records(records, output, fmt="text", batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write evaluated records in batches, one write() call per batch.
+    
+    Args:
+        records (iterable): Records from evaluate_lines()
+        output: Text stream to write to
+        fmt (str): One of OUTPUT_FORMATS
+        batch_size (int): Records formatted and written together
+        
+    Returns:
+        tuple: (records written, records with an error)
+    """
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    formatter, header = FORMATTERS[fmt]
+    if header:
+        output.write(header)
+    
+    count = errors = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        count += len(batch)
+        errors += sum(1 for record in batch if record[3])
+        output.write(formatter(batch))
+    output.flush()
+    return count, errors
+
+
+def evaluate_file(source, output, *, fmt="text", angle_mode="DEG", ans=0, memory=0,
+                  cache=None, limits=DEFAULT_LIMITS, chunk_size=DEFAULT_CHUNK_SIZE,
+                  batch_size=DEFAULT_BATCH_SIZE, use_mmap=True):
+    """
+    Evaluate every line of an expression file and write the results.
+    
+    Args:
+        source (str): Path of the input file, or "-" for standard input
+        output: Text stream to write results to
+        fmt (str): Output format, one of "text", "csv" or "jsonl"
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        cache (ExpressionCache): Cache to compile through; defaults to the shared cache
+        limits (ResourceLimits): Resource guard settings; None disables the guard
+        chunk_size (int): Input bytes processed per step
+        batch_size (int): Output records written per write() call
+        use_mmap (bool): Whether to memory-map regular input files
+        
+    Returns:
+        BatchStats: Line, error and timing totals for the run
+    """
+    start = time.perf_counter()
+    if source == "-":
+        file, size = sys.stdin.buffer, 0
+    else:
+        file = open(source, "rb")
+        size = os.fstat(file.fileno()).st_size
+    try:
+        records = evaluate_lines(iter_lines(file, chunk_size, use_mmap), angle_mode=angle_mode,
+                                 ans=ans, memory=memory, cache=cache, limits=limits)
+        count, errors = write_records(records, output, fmt, batch_size)
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+    return BatchStats(count, errors, size, time.perf_counter() - start)
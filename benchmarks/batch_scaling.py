@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for parallel batch evaluation.
+
+Generates an expression corpus, evaluates it with the streaming evaluator
+and with 1, 2, 4, ... worker processes (up to the CPU count), and reports
+throughput and speedup over the single-process run.
+
+Usage:
+    python benchmarks/batch_scaling.py [--lines N] [--max-workers N]
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import evaluate_file, evaluate_file_parallel
+
+DEFAULT_LINES = 400_000
+
+# Expression shapes; {} is filled with random operands so most lines are distinct
+TEMPLATES = (
+    "{}+{}×{}",
+    "sin({})+cos({})",
+    "({}+{})×({}-{})÷{}",
+    "sqrt({})+log({})",
+    "{}^3-{}^2+{}",
+    "{}%×{}",
+)
+
+
+def write_corpus(path, lines, seed=1234):
+    """
+    Write a reproducible corpus of random expressions.
+    
+    Args:
+        path (str): File to create
+        lines (int): Number of expressions
+        seed (int): Random seed
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(lines):
+            template = rng.choice(TEMPLATES)
+            operands = [rng.randint(1, 999) for _ in range(template.count("{}"))]
+            f.write(template.format(*operands) + "\n")
+
+
+def worker_counts(max_workers):
+    """Powers of two up to max_workers, always including max_workers."""
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    lines = DEFAULT_LINES
+    max_workers = os.cpu_count() or 1
+    if "--lines" in argv:
+        lines = int(argv[argv.index("--lines") + 1])
+    if "--max-workers" in argv:
+        max_workers = int(argv[argv.index("--max-workers") + 1])
+    
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.txt")
+        write_corpus(corpus, lines)
+        print(f"{lines:,} expressions, {os.path.getsize(corpus) / 1e6:.1f} MB, "
+              f"{os.cpu_count()} CPUs")
+        
+        with open(os.devnull, "w") as sink:
+            baseline = evaluate_file(corpus, sink, fmt="csv")
+            print(f"{'stream':>10}: {baseline.lines_per_second:>10,.0f} lines/sec")
+            for workers in worker_counts(max_workers):
+                stats = evaluate_file_parallel(corpus, sink, fmt="csv", workers=workers)
+                speedup = stats.lines_per_second / baseline.lines_per_second
+                print(f"{workers:>3} workers: {stats.lines_per_second:>10,.0f} lines/sec  "
+                      f"speedup {speedup:4.2f}x  efficiency {speedup / workers:4.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the calculator core, with JSON baselines.
+
+Times the Calculator operations behind the keypad: prepare_expression(),
+calculate() over several expression corpora, editing a long expression
+with insert_text() and backspace(), and the memory keys. Each benchmark
+reports:
+
+    ops/s      Operations per second over all timed samples
+    best       Time per operation in microseconds in the fastest sample
+    p50, p99   Time per operation in microseconds, over samples of a few
+               milliseconds each (so one slow operation shows up as a slow
+               sample rather than being averaged away over the whole run)
+    alloc      Bytes allocated per operation, measured by tracemalloc in a
+               separate pass (peak above the starting point, so temporary
+               objects count even when they are freed again)
+    retained   Bytes per operation still allocated after the pass
+
+Usage:
+    python benchmarks/core.py run [--samples N] [--quick] [--only PREFIX]
+                                  [--save FILE] [--compare BASELINE]
+                                  [--threshold PCT]
+    python benchmarks/core.py compare BASELINE CURRENT [--threshold PCT]
+
+"compare" exits with status 1 when a benchmark's best time per operation
+or its allocations grew by more than the threshold (default 10%), so a
+saved baseline can gate changes to the core. Baselines are only comparable on
+the same machine and Python version; both are recorded in the file.
+"""
+
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import Calculator, ExpressionCache
+from utils.timing import Histogram
+
+DEFAULT_SAMPLES = 100
+QUICK_SAMPLES = 15
+DEFAULT_THRESHOLD = 10.0    # Percent
+SAMPLE_SECONDS = 0.002      # Target duration of one timed sample
+WARMUP_OPS = 100            # Untimed operations first, to compile each corpus
+ALLOCATION_OPS = 200        # Operations traced per allocation pass
+
+# Allocation changes smaller than this (bytes per operation) are noise
+ALLOCATION_SLACK = 64
+
+#-----------------------------------------------------------------------------
+# Expression Corpora
+#-----------------------------------------------------------------------------
+
+SHORT = ["2+3", "12×7-5", "100÷8", "3.5×2+1", "2^10", "50+10%", "9-4×2", "(1+2)×3"]
+
+TRIG = ["sin(30)+cos(60)", "tan(45)×2", "sin(ANS)+cos(ANS×2)", "log(ANS+1)×sin(45)", "sin(π÷6)^2",
+        "cos(ANS)^2+sin(ANS)^2", "tan(ANS÷3)", "sqrt(sin(ANS)^2+1)"]
+
+HUGE = ["2^10000", "3^5000×7", "9^999-1", "7^2000÷7^1990", "(2^4000+1)×(2^4000-1)"]
+
+
+def nested(depth):
+    """Return expressions with parentheses and function calls nested depth deep."""
+    return [
+        "(" * depth + "ANS" + "+1)×2" * depth,
+        "sqrt(" * depth + "ANS" + ")" * depth,
+        "sin(" * depth + "ANS" + ")" * depth,
+    ]
+
+
+def operand(rng):
+    """Return a random operand: mostly integers, some decimals and ANS."""
+    draw = rng.random()
+    if draw < 0.7:
+        return str(rng.randint(1, 999))
+    if draw < 0.9:
+        return f"{rng.uniform(0, 99):.3f}"
+    return "ANS"
+
+
+def generated(count, terms, seed=2024):
+    """
+    Return count random arithmetic expressions of terms operands each.
+
+    Some operands are ANS, so the optimizer cannot fold a whole expression
+    into one constant and calculating it runs real arithmetic.
+    """
+    rng = random.Random(seed)
+    expressions = []
+    for _ in range(count):
+        parts = [operand(rng)]
+        for _ in range(terms - 1):
+            parts.append(rng.choice("+-×÷"))
+            parts.append(operand(rng))
+        expressions.append("".join(parts))
+    return expressions
+
+#-----------------------------------------------------------------------------
+# Benchmarks
+#-----------------------------------------------------------------------------
+# Each benchmark is a function of the number of operations it will run that
+# sets up its state and returns the operation, a function of no arguments.
+
+def new_calculator(angle_mode="DEG", cache=None):
+    """Return a powered-on calculator with ANS set, as after a calculation."""
+    calculator = Calculator(cache=cache)
+    calculator.power_on = True
+    calculator.angle_mode = angle_mode
+    calculator.ans = 0.75
+    return calculator
+
+
+def cycle(items):
+    """Return a function returning items in turn, forever."""
+    state = [0]
+    count = len(items)
+
+    def next_item():
+        index = state[0]
+        state[0] = index + 1 if index + 1 < count else 0
+        return items[index]
+    return next_item
+
+
+def calculate_over(corpus, angle_mode="DEG", cache_entries=None):
+    """
+    Make a benchmark that types each expression of a corpus and calculates it.
+
+    Args:
+        corpus (list): Expressions, used in turn
+        angle_mode (str): "DEG" or "RAD"
+        cache_entries (int): Give the calculator its own expression cache of
+            this size; None uses the shared cache, so the corpus is compiled
+            once and then only run
+    """
+    def setup(ops):
+        cache = None if cache_entries is None else ExpressionCache(max_entries=cache_entries)
+        calculator = new_calculator(angle_mode, cache)
+        next_expression = cycle(corpus)
+
+        def op():
+            calculator.current_expression = next_expression()
+            calculator.calculate()
+            calculator.ans = 0.75   # Keep ANS from feeding back into the corpus
+        return op
+    return setup
+
+
+def prepare_over(corpus):
+    """Make a benchmark rendering each expression of a corpus as Python."""
+    def setup(ops):
+        prepare = new_calculator().prepare_expression
+        next_expression = cycle(corpus)
+        return lambda: prepare(next_expression())
+    return setup
+
+
+def insert_at_end(ops):
+    """Type ops more keys at the end of a 10,000 key expression."""
+    calculator = new_calculator()
+    calculator.current_expression = "7+" * 5000
+    next_key = cycle(["2", "×", "3", "+"])
+    insert = calculator.insert_text
+    return lambda: insert(next_key())
+
+
+def insert_in_middle(ops):
+    """Type keys in the middle of a 10,000 key expression."""
+    calculator = new_calculator()
+    calculator.current_expression = "7+" * 5000
+    calculator.move_cursor(-5000)
+    next_key = cycle(["2", "×", "3", "+"])
+    insert = calculator.insert_text
+    return lambda: insert(next_key())
+
+
+def type_with_preview(ops):
+    """Type keys at the end of a 10,000 key expression, updating the preview each time."""
+    calculator = new_calculator()
+    calculator.current_expression = "7+" * 5000
+    next_key = cycle(["2", "×", "3", "+"])
+
+    def op():
+        calculator.insert_text(next_key())
+        calculator.preview()
+    return op
+
+
+def backspace(ops):
+    """Delete keys from the end of an expression long enough for every operation."""
+    calculator = new_calculator()
+    calculator.current_expression = "7+" * (ops // 2 + 5000)
+    return calculator.backspace
+
+
+def memory_keys(ops):
+    """Press M+, M-, MR and C in turn after a calculation."""
+    calculator = new_calculator()
+    calculator.current_expression = "1.5"
+    calculator.calculate()
+    steps = cycle([calculator.memory_add, calculator.memory_subtract,
+                   calculator.memory_recall, calculator.clear])
+
+    def op():
+        steps()()
+    return op
+
+
+def named_memory(ops):
+    """Store the result in one of 16 named slots and recall it."""
+    calculator = new_calculator()
+    calculator.current_expression = "2.5"
+    calculator.calculate()
+    next_name = cycle(["slot" + letter for letter in "abcdefghijklmnop"])
+
+    def op():
+        name = next_name()
+        calculator.memory_store(name)
+        calculator.memory_recall(name)
+        calculator.current_expression = ""
+    return op
+
+
+NESTED = nested(40)
+LONG = generated(20, 200)
+
+BENCHMARKS = {
+    "prepare/short": prepare_over(SHORT),
+    "prepare/nested": prepare_over(NESTED),
+    "prepare/long": prepare_over(LONG),
+    "calculate/short": calculate_over(SHORT),
+    "calculate/nested": calculate_over(NESTED),
+    "calculate/trig-deg": calculate_over(TRIG, "DEG"),
+    "calculate/trig-rad": calculate_over(TRIG, "RAD"),
+    "calculate/huge-powers": calculate_over(HUGE),
+    "calculate/long": calculate_over(LONG),
+    "calculate/long-uncached": calculate_over(LONG, cache_entries=1),
+    "edit/insert-end": insert_at_end,
+    "edit/insert-middle": insert_in_middle,
+    "edit/type-preview": type_with_preview,
+    "edit/backspace": backspace,
+    "memory/keys": memory_keys,
+    "memory/named": named_memory,
+}
+
+#-----------------------------------------------------------------------------
+# Measurement
+#-----------------------------------------------------------------------------
+
+def calibrate(setup):
+    """Return how many operations take about SAMPLE_SECONDS."""
+    op = setup(1000)
+    inner = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(inner):
+            op()
+        if time.perf_counter() - start >= SAMPLE_SECONDS / 4 or inner >= 1000:
+            elapsed = time.perf_counter() - start
+            return max(1, min(100_000, int(inner * SAMPLE_SECONDS / max(elapsed, 1e-9))))
+        inner *= 4
+
+
+def measure_time(setup, samples, inner):
+    """
+    Time samples batches of inner operations, after warming up.
+
+    Returns:
+        tuple: (operations per second, Histogram of ns per operation)
+    """
+    warmup = max(inner, WARMUP_OPS)
+    op = setup(samples * inner + warmup)
+    for _ in range(warmup):
+        op()
+    batch = range(inner)
+    histogram = Histogram()
+    clock = time.perf_counter_ns
+    total = 0
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(samples):
+            start = clock()
+            for _ in batch:
+                op()
+            elapsed = clock() - start
+            total += elapsed
+            histogram.record(elapsed // inner)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return samples * inner * 1e9 / max(total, 1), histogram
+
+
+def measure_allocations(setup, ops=ALLOCATION_OPS):
+    """
+    Trace the memory allocated by each of ops operations.
+
+    Returns:
+        tuple: (mean bytes allocated per operation, bytes retained per operation)
+    """
+    op = setup(ops + WARMUP_OPS)
+    for _ in range(WARMUP_OPS):
+        op()    # Warm caches and lazily built state outside the trace
+    gc.collect()
+    tracemalloc.start()
+    try:
+        allocated = 0
+        first, _ = tracemalloc.get_traced_memory()
+        for _ in range(ops):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            op()
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        last, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return allocated / ops, max(0, last - first) / ops
+
+
+def run_benchmarks(names, samples):
+    """
+    Run benchmarks and collect their results.
+
+    Args:
+        names (list): Benchmark names, keys of BENCHMARKS
+        samples (int): Timed samples per benchmark
+
+    Returns:
+        dict: The results document saved as a baseline
+    """
+    results = {}
+    for name in names:
+        setup = BENCHMARKS[name]
+        inner = calibrate(setup)
+        ops_per_sec, histogram = measure_time(setup, samples, inner)
+        allocated, retained = measure_allocations(setup)
+        results[name] = {
+            "ops_per_sec": round(ops_per_sec, 1),
+            "best_us": round(histogram.min / 1000, 3),
+            "p50_us": round(histogram.percentile(50) / 1000, 3),
+            "p99_us": round(histogram.percentile(99) / 1000, 3),
+            "alloc_bytes": round(allocated, 1),
+            "retained_bytes": round(retained, 1),
+            "samples": samples,
+            "ops_per_sample": inner,
+        }
+        print(format_row(name, results[name]), flush=True)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "benchmarks": results,
+    }
+
+#-----------------------------------------------------------------------------
+# Reporting
+#-----------------------------------------------------------------------------
+
+HEADER = (f"{'benchmark':<26}{'ops/s':>12}{'best µs':>10}{'p50 µs':>10}{'p99 µs':>10}"
+          f"{'alloc B':>10}{'retained B':>12}")
+
+
+def format_row(name, result):
+    """Format one benchmark result as a table row."""
+    return (f"{name:<26}{result['ops_per_sec']:>12,.0f}{result['best_us']:>10.2f}{result['p50_us']:>10.2f}"
+            f"{result['p99_us']:>10.2f}{result['alloc_bytes']:>10,.0f}"
+            f"{result['retained_bytes']:>12,.0f}")
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two results documents.
+
+    A benchmark regressed when its best time per operation grew by more
+    than threshold percent, or its allocations per operation grew by more
+    than threshold percent and ALLOCATION_SLACK bytes. The fastest sample
+    is compared, as timeit recommends, because other processes only ever
+    add time: on a busy machine the mean and even the median move by more
+    than a real regression would, while the best stays put.
+
+    Args:
+        baseline (dict): Results document to compare against
+        current (dict): New results document
+        threshold (float): Allowed change, in percent
+
+    Returns:
+        tuple: (report lines, names of regressed benchmarks)
+    """
+    lines = [f"{'benchmark':<26}{'ops/s':>12}{'best µs':>10}{'change':>9}{'alloc B':>10}{'change':>9}"]
+    regressed = []
+    old_results = baseline["benchmarks"]
+    for name, new in current["benchmarks"].items():
+        old = old_results.get(name)
+        row = f"{name:<26}{new['ops_per_sec']:>12,.0f}{new['best_us']:>10.2f}"
+        if old is None:
+            lines.append(f"{row}{'new':>9}")
+            continue
+        slowdown = (new["best_us"] / old["best_us"] - 1) * 100 if old["best_us"] else 0.0
+        growth = new["alloc_bytes"] - old["alloc_bytes"]
+        alloc = growth / old["alloc_bytes"] * 100 if old["alloc_bytes"] else 0.0
+        flags = []
+        if slowdown > threshold:
+            flags.append("slower")
+        if growth > ALLOCATION_SLACK and alloc > threshold:
+            flags.append("allocates more")
+        lines.append(f"{row}{slowdown:>+8.1f}%{new['alloc_bytes']:>10,.0f}{alloc:>+8.1f}%"
+                     + (f"  REGRESSION: {', '.join(flags)}" if flags else ""))
+        if flags:
+            regressed.append(name)
+    for name in old_results:
+        if name not in current["benchmarks"]:
+            lines.append(f"{name:<26}{'missing':>12}")
+    if (baseline.get("python"), baseline.get("machine")) != (current.get("python"), current.get("machine")):
+        lines.append(f"note: baseline is from Python {baseline.get('python')} on "
+                     f"{baseline.get('machine')}, so differences may not be regressions")
+    return lines, regressed
+
+
+def load(path):
+    """Read a results document."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(results, path):
+    """Write a results document."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+#-----------------------------------------------------------------------------
+# Command Line
+#-----------------------------------------------------------------------------
+
+def option(argv, name, default, convert=str):
+    """Return the value following name in argv, or default."""
+    if name not in argv:
+        return default
+    return convert(argv[argv.index(name) + 1])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ("run", "compare"):
+        print("usage:" + __doc__.split("Usage:")[1].split('"compare"')[0].rstrip())
+        return 2
+    threshold = option(argv, "--threshold", DEFAULT_THRESHOLD, float)
+
+    if argv[0] == "compare":
+        if len(argv) < 3:
+            print("compare needs BASELINE and CURRENT files")
+            return 2
+        lines, regressed = compare(load(argv[1]), load(argv[2]), threshold)
+        print("\n".join(lines))
+        return 1 if regressed else 0
+
+    samples = option(argv, "--samples", QUICK_SAMPLES if "--quick" in argv else DEFAULT_SAMPLES, int)
+    prefix = option(argv, "--only", "")
+    names = [name for name in BENCHMARKS if name.startswith(prefix)]
+    if not names:
+        print(f"no benchmark starts with {prefix!r}")
+        return 2
+
+    # Benchmarks measure the core, not logging
+    Calculator.logger.disabled = True
+    print(HEADER)
+    results = run_benchmarks(names, samples)
+    path = option(argv, "--save", None)
+    if path:
+        save(results, path)
+        print(f"saved to {path}")
+    baseline_path = option(argv, "--compare", None)
+    if baseline_path:
+        lines, regressed = compare(load(baseline_path), results, threshold)
+        print()
+        print("\n".join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark for hash-consing and common-subexpression elimination.
+
+Builds a report-style expression that repeats large sub-terms, then
+compares the parser's hash-consed tree with an unshared copy of it (what
+the parser produced before interning): AST memory, unique node count and
+time per evaluation.
+
+Usage:
+    python benchmarks/cse.py [--terms N] [--runs N]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import BinaryOp, CompiledExpression, FunctionCall, UnaryOp, parse
+
+DEFAULT_TERMS = 40
+DEFAULT_RUNS = 20_000
+
+SUB_TERMS = [
+    "sin(ANS+37)×cos(ANS+37)",
+    "sin(ANS+37)^2",
+    "sqrt(M×M+ANS×ANS)",
+    "log(sqrt(M×M+ANS×ANS)+1)",
+]
+
+
+def build_expression(terms):
+    """Join repeated sub-terms with alternating + and -."""
+    parts = [SUB_TERMS[i % len(SUB_TERMS)] for i in range(terms)]
+    expression = parts[0]
+    for i, part in enumerate(parts[1:]):
+        expression += ("+" if i % 2 else "-") + "(" + part + ")"
+    return expression
+
+
+def unshare(node):
+    """Return a copy of a tree in which no node is referenced twice."""
+    kind = type(node)
+    if kind is BinaryOp:
+        return BinaryOp(node.op, unshare(node.left), unshare(node.right))
+    if kind is UnaryOp:
+        return UnaryOp(node.op, unshare(node.operand))
+    if kind is FunctionCall:
+        return FunctionCall(node.name, unshare(node.argument))
+    return kind(*(getattr(node, field) for field in kind.__slots__))
+
+
+def measure_tree(build):
+    """Return (tree, bytes allocated while building it)."""
+    tracemalloc.start()
+    tree = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return tree, size
+
+
+def time_program(program, runs):
+    """Return seconds per evaluation."""
+    run = program.run
+    env = {"ANS": 12.5, "M": 3}
+    start = time.perf_counter()
+    for _ in range(runs):
+        run(env)
+    return (time.perf_counter() - start) / runs
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    terms = DEFAULT_TERMS
+    runs = DEFAULT_RUNS
+    if "--terms" in argv:
+        terms = int(argv[argv.index("--terms") + 1])
+    if "--runs" in argv:
+        runs = int(argv[argv.index("--runs") + 1])
+    
+    expression = build_expression(terms)
+    shared_tree, shared_bytes = measure_tree(lambda: parse(expression))
+    plain_tree, plain_bytes = measure_tree(lambda: unshare(parse(expression)))
+    # Compile without the optimizer so only sharing differs
+    shared = CompiledExpression(shared_tree, optimize=False)
+    plain = CompiledExpression(plain_tree, optimize=False)
+    assert shared({"ANS": 12.5, "M": 3}) == plain({"ANS": 12.5, "M": 3})
+    shared_time = time_program(shared, runs)
+    plain_time = time_program(plain, runs)
+    
+    print(f"{terms} repeated sub-terms, {len(expression)} characters")
+    print(f"unshared   : {plain.node_count:6} nodes  {plain_bytes:8,} bytes  "
+          f"{plain_time * 1e6:7.1f} us/eval")
+    print(f"hash-consed: {shared.node_count:6} nodes  {shared_bytes:8,} bytes  "
+          f"{shared_time * 1e6:7.1f} us/eval")
+    print(f"speed-up: {plain_time / shared_time:.2f}x  "
+          f"memory: {plain_bytes / shared_bytes:.1f}x smaller")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
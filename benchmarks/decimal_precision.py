@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Decimal mode at different precisions.
+
+For each precision, reports the one-off cost of building the backend (π
+and e are computed here; the first precision also imports decimal) and the
+time per evaluation of a few representative expressions, compiled once.
+
+Usage:
+    python benchmarks/decimal_precision.py [--digits 20,50,100] [--runs N]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import CompiledExpression, get_decimal_backend, parse
+
+DEFAULT_DIGITS = (20, 50, 100)
+DEFAULT_RUNS = 2_000
+
+EXPRESSIONS = {
+    "arithmetic": "ANS×1.0725^12-M÷3",
+    "sqrt, log": "sqrt(ANS)+log(M)",
+    "trig (DEG)": "sin(ANS)^2+cos(ANS)^2",
+    "trig (large)": "tan(ANS×1000000)",
+}
+
+
+def time_program(program, env, runs):
+    """Return seconds per evaluation."""
+    run = program.run
+    start = time.perf_counter()
+    for _ in range(runs):
+        run(env)
+    return (time.perf_counter() - start) / runs
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    digits = DEFAULT_DIGITS
+    runs = DEFAULT_RUNS
+    if "--digits" in argv:
+        digits = tuple(int(d) for d in argv[argv.index("--digits") + 1].split(","))
+    if "--runs" in argv:
+        runs = int(argv[argv.index("--runs") + 1])
+
+    print(f"{'':14}" + "".join(f"{d:>10} dig" for d in digits))
+    setup = []
+    programs = {}
+    for precision in digits:
+        start = time.perf_counter()
+        backend = get_decimal_backend(precision)
+        setup.append(time.perf_counter() - start)
+        env = {"ANS": backend.arithmetic.convert(37.5), "M": backend.arithmetic.convert(1234)}
+        for name, expression in EXPRESSIONS.items():
+            program = CompiledExpression(parse(expression), "DEG", backend)
+            programs.setdefault(name, []).append((program, env))
+
+    print(f"{'backend setup':14}" + "".join(f"{t * 1e3:10.2f} ms " for t in setup))
+    for name, entries in programs.items():
+        times = [time_program(program, env, runs) for program, env in entries]
+        print(f"{name:14}" + "".join(f"{t * 1e6:10.1f} us " for t in times))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
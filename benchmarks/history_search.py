@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the SQLite history store.
+
+Records a synthetic history spread over a year through HistoryStore
+(reporting the insert rate), then times typical searches against it:
+a value range within the last week, an expression prefix, a time range
+and the latest page.
+
+Usage:
+    python benchmarks/history_search.py [--rows N] [--runs N] [--path FILE]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import HistoryStore
+
+DEFAULT_ROWS = 1_000_000
+DEFAULT_RUNS = 20
+
+YEAR = 365 * 24 * 3600
+WEEK = 7 * 24 * 3600
+MONTH = 30 * 24 * 3600
+
+OPERATORS = "+-×÷^"
+
+
+def populate(store, rows, now):
+    """Record rows spread evenly over the year before now; return rows per second."""
+    rng = random.Random(42)
+    start = time.perf_counter()
+    step = YEAR / rows
+    first = now - YEAR
+    for i in range(rows):
+        a = rng.randint(1, 10_000)
+        b = rng.randint(1, 10_000)
+        value = a * b * 10 ** rng.randint(-4, 4)
+        store.record(f"{a}{rng.choice(OPERATORS)}{b}", repr(value), value,
+                     latency=1e-5, timestamp=first + i * step)
+    store.flush()
+    return rows / (time.perf_counter() - start)
+
+
+def time_search(store, runs, **criteria):
+    """Return (seconds per search, entries returned)."""
+    found = store.search(**criteria)
+    start = time.perf_counter()
+    for _ in range(runs):
+        store.search(**criteria)
+    return (time.perf_counter() - start) / runs, len(found)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    rows = DEFAULT_ROWS
+    runs = DEFAULT_RUNS
+    path = None
+    if "--rows" in argv:
+        rows = int(argv[argv.index("--rows") + 1])
+    if "--runs" in argv:
+        runs = int(argv[argv.index("--runs") + 1])
+    if "--path" in argv:
+        path = argv[argv.index("--path") + 1]
+
+    directory = None
+    if path is None:
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, "history.db")
+
+    now = time.time()
+    store = HistoryStore(path)
+    if store.count() < rows:
+        rate = populate(store, rows - store.count(), now)
+        print(f"insert:  {rate:12,.0f} rows/s")
+    print(f"rows:    {store.count():12,}")
+
+    searches = {
+        "1e6..1e7, last week": dict(min_value=1e6, max_value=1e7, since=now - WEEK),
+        "prefix '9999'": dict(prefix="9999"),
+        "one hour, a month ago": dict(since=now - MONTH, until=now - MONTH + 3600),
+        "latest": dict(),
+    }
+    for name, criteria in searches.items():
+        seconds, found = time_search(store, runs, **criteria)
+        print(f"{name:24} {seconds * 1e3:8.2f} ms  ({found:,} entries)")
+
+    store.close()
+    if directory is not None:
+        directory.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the expression optimizer.
+
+Compiles a set of stored-formula style expressions with and without
+optimize_tree() and reports the node count (which drives the cache's
+memory estimate) and the time per evaluation of each.
+
+Usage:
+    python benchmarks/optimizer.py [--runs N]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import CompiledExpression, parse
+
+DEFAULT_RUNS = 200_000
+
+FORMULAS = [
+    "ANS×(2×π÷360)",
+    "sqrt(2)×M+10^3",
+    "ANS^2+M^2",
+    "ANS^0.5×1+0",
+    "sin(45)×ANS-cos(60)×M",
+    "(1+5%)^12×ANS",
+]
+
+
+def time_program(program, env, runs):
+    """Return seconds per evaluation of a compiled program."""
+    run = program.run
+    start = time.perf_counter()
+    for _ in range(runs):
+        run(env)
+    return (time.perf_counter() - start) / runs
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    runs = DEFAULT_RUNS
+    if "--runs" in argv:
+        runs = int(argv[argv.index("--runs") + 1])
+    
+    env = {"ANS": 12.5, "M": 3}
+    total_plain = total_optimized = 0.0
+    print(f"{'expression':<26}{'nodes':>12}{'ns/eval':>18}")
+    for formula in FORMULAS:
+        plain = CompiledExpression(parse(formula), optimize=False)
+        optimized = CompiledExpression(parse(formula))
+        plain_time = time_program(plain, env, runs)
+        optimized_time = time_program(optimized, env, runs)
+        total_plain += plain_time
+        total_optimized += optimized_time
+        print(f"{formula:<26}{plain.node_count:>5} -> {optimized.node_count:<5}"
+              f"{plain_time * 1e9:>8.0f} -> {optimized_time * 1e9:<6.0f}")
+    print(f"speed-up: {total_plain / total_optimized:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
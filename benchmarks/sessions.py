@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for calculation service sessions.
+
+Creates N sessions that have each calculated "ANS+1.5" from their own ANS,
+in two layouts, and reports the memory traced per session:
+
+    legacy   The service before sessions were made compact, loaded from
+             git history (--legacy-rev): a dict of service.server.Session
+             objects, each a Calculator of that revision plus the
+             asyncio.Lock the server kept per session
+    compact  service.sessions.SessionStore, which keeps a state record of
+             registers per session and runs requests on one shared
+             SessionCalculator
+
+Usage:
+    python benchmarks/sessions.py [--sessions N] [--legacy-rev REV]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import calculator
+from service.sessions import SessionStore
+
+DEFAULT_SESSIONS = 500_000
+
+# Last revision before the session store (7a1244c) replaced the session layout
+LEGACY_REV = "7a1244c^"
+
+
+def load_revision(rev, path, name):
+    """
+    Import a module as it was at a git revision.
+    
+    Args:
+        rev (str): Git revision
+        path (str): File path relative to the project root
+        name (str): Name of the new module
+    
+    Returns:
+        module: The module, not entered in sys.modules
+    """
+    source = subprocess.run(["git", "show", f"{rev}:{path}"], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType(name)
+    module.__file__ = os.path.join(PROJECT_ROOT, path)
+    exec(compile(source, f"{rev}:{path}", "exec"), module.__dict__)
+    return module
+
+
+def load_legacy(rev):
+    """Return the Session class and calculator module of a revision."""
+    legacy_calculator = load_revision(rev, "calculator.py", "legacy_calculator")
+    # The old server imports calculator by name, so let it see the old one
+    sys.modules["calculator"] = legacy_calculator
+    try:
+        server = load_revision(rev, "service/server.py", "legacy_server")
+    finally:
+        sys.modules["calculator"] = calculator
+    return server.Session, legacy_calculator
+
+
+def build_legacy(names, Session, legacy_calculator):
+    cache = legacy_calculator.ExpressionCache()
+    sessions = {}
+    for i, name in enumerate(names):
+        session = sessions[name] = Session(cache)
+        session.calculator.last_answer = legacy_calculator.format_result(i * 1.5 + 0.25)
+        session.calculator.current_expression = "ANS+1.5"
+        session.calculator.calculate()
+    return sessions
+
+
+def build_compact(names):
+    store = SessionStore(max_sessions=len(names), cache=calculator.ExpressionCache())
+    for i, name in enumerate(names):
+        with store.use(name) as session:
+            session.result_value = session.ans = i * 1.5 + 0.25
+            session.current_expression = "ANS+1.5"
+            session.calculate()
+    return store
+
+
+def measure(build, *args):
+    """Return (bytes per session, seconds) for building the sessions."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    sessions = build(*args)
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return size / len(args[0]), seconds
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = DEFAULT_SESSIONS
+    rev = LEGACY_REV
+    if "--sessions" in argv:
+        count = int(argv[argv.index("--sessions") + 1])
+    if "--legacy-rev" in argv:
+        rev = argv[argv.index("--legacy-rev") + 1]
+    
+    # The legacy Session makes an asyncio.Lock, which wants an event loop
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    
+    # Session names belong to the clients, so they are created up front
+    names = [f"user-{i}" for i in range(count)]
+    legacy, legacy_time = measure(build_legacy, names, *load_legacy(rev))
+    compact, compact_time = measure(build_compact, names)
+    
+    print(f"{count:,} sessions (names excluded, legacy from {rev})")
+    print(f"legacy : {legacy:7.1f} bytes/session  {legacy * count / 2**20:7.1f} MB  "
+          f"built in {legacy_time:.2f} s")
+    print(f"compact: {compact:7.1f} bytes/session  {compact * count / 2**20:7.1f} MB  "
+          f"built in {compact_time:.2f} s")
+    print(f"reduction: {legacy / compact:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the headless command line interface.
+
+Runs `python -m cli "1+1"` repeatedly in fresh interpreters and reports the
+wall-clock time. Exits with status 1 when the median exceeds the budget, so
+it can be used as a CI check.
+
+For reference it also times a bare interpreter and the floor of any
+`python -m` command: -m imports runpy, and through it importlib.util and
+contextlib, before the module runs. Only the time above that floor is the
+command line interface's own.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--budget MS]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_RUNS = 20
+DEFAULT_BUDGET_MS = 50.0
+
+
+def time_command(command, env, runs):
+    """
+    Time a command over several runs.
+
+    Args:
+        command (list): Command line to execute
+        env (dict): Environment for the child processes
+        runs (int): Number of timed runs
+
+    Returns:
+        list: Wall-clock times in milliseconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=PROJECT_ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    runs = DEFAULT_RUNS
+    budget = DEFAULT_BUDGET_MS
+    if "--runs" in argv:
+        runs = int(argv[argv.index("--runs") + 1])
+    if "--budget" in argv:
+        budget = float(argv[argv.index("--budget") + 1])
+
+    # Measure with cached bytecode, as an installed copy would run
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    cli = [sys.executable, "-m", "cli", "1+1"]
+    bare = [sys.executable, "-c", "pass"]
+    floor = [sys.executable, "-c", "import runpy"]
+
+    time_command(cli, env, 1)  # Warm-up run writes the .pyc files
+    cli_times = time_command(cli, env, runs)
+    bare_times = time_command(bare, env, runs)
+    floor_times = time_command(floor, env, runs)
+
+    median = statistics.median(cli_times)
+    print(f"interpreter only : min {min(bare_times):6.1f} ms  "
+          f"median {statistics.median(bare_times):6.1f} ms")
+    print(f"python -m floor  : min {min(floor_times):6.1f} ms  "
+          f"median {statistics.median(floor_times):6.1f} ms")
+    print(f"python -m cli    : min {min(cli_times):6.1f} ms  "
+          f"median {median:6.1f} ms  (budget {budget:.0f} ms)")
+    print(f"cli above floor  : median "
+          f"{median - statistics.median(floor_times):6.1f} ms")
+
+    if median > budget:
+        print("FAIL: cold start is over budget")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
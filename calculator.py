@@ -7,7 +7,2954 @@ for the calculator application.
 
 # Standard library imports
 import math       # For mathematical functions
-import logging    # For application logging
+import operator   # For operator functions used by the expression compiler
+import os         # For enabling phase timing from the environment
+import sys        # For estimating the memory used by cached expressions
+import _thread    # For the expression cache lock (threading costs start-up time)
+import time       # For timing calculations recorded in the history
+from collections import deque, namedtuple, OrderedDict  # For token records, undo steps and the LRU cache
+
+#-----------------------------------------------------------------------------
+# Logging
+#-----------------------------------------------------------------------------
+
+class LazyLogger:
+    """
+    Stand-in for logging.getLogger(name) that defers importing logging.
+    
+    Importing logging is the largest part of this module's start-up cost,
+    which matters for the command line tools. Until something else imports
+    logging nothing can have configured it, so debug and info records would
+    be dropped anyway; warnings and errors import logging and are emitted
+    as usual.
+    """
+    
+    def __init__(self, name):
+        """
+        Initialize the proxy.
+        
+        Args:
+            name (str): Name of the logger to bind on first real use
+        """
+        self.name = name
+        self.disabled = False   # Like logging.Logger.disabled: drop everything
+        self._logger = None
+    
+    def _bind(self):
+        """Return the real logger, importing logging if needed."""
+        if self._logger is None:
+            import logging
+            self._logger = logging.getLogger(self.name)
+        return self._logger
+    
+    def debug(self, msg, *args, **kwargs):
+        if not self.disabled and "logging" in sys.modules:
+            self._bind().debug(msg, *args, **kwargs)
+    
+    def info(self, msg, *args, **kwargs):
+        if not self.disabled and "logging" in sys.modules:
+            self._bind().info(msg, *args, **kwargs)
+    
+    def warning(self, msg, *args, **kwargs):
+        if not self.disabled:
+            self._bind().warning(msg, *args, **kwargs)
+    
+    def error(self, msg, *args, **kwargs):
+        if not self.disabled:
+            self._bind().error(msg, *args, **kwargs)
+
+
+logger = LazyLogger(__name__)
+
+#-----------------------------------------------------------------------------
+# Expression Language Definition
+#-----------------------------------------------------------------------------
+
+# Symbols accepted in expressions, mapped to their canonical operator
+OPERATOR_SYMBOLS = {
+    "+": "+",
+    "-": "-",
+    "×": "*",
+    "*": "*",
+    "÷": "/",
+    "/": "/",
+    "^": "^",
+    "%": "%",
+}
+
+# Named constants available in expressions
+CONSTANTS = {
+    "π": math.pi,
+    "pi": math.pi,
+    "e": math.e,
+}
+
+# Registers whose values are supplied at evaluation time
+REGISTERS = ("ANS", "M")
+
+# Functions that do not depend on the angle mode
+FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "log": math.log10,
+}
+
+# Trigonometric functions, which are applied according to the angle mode
+TRIG_FUNCTIONS = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+}
+
+# Binding powers used by the parser (higher binds tighter)
+INFIX_BINDING = {
+    "+": 10,
+    "-": 10,
+    "*": 20,
+    "/": 20,
+    "^": 40,
+}
+PERCENT_BINDING = 20    # Postfix %, applied like a division by 100
+PREFIX_BINDING = 30     # Unary + and -, so -2^2 == -(2^2)
+
+# Token kinds produced by the tokenizer
+NUMBER = "number"
+NAME = "name"
+OPERATOR = "operator"
+LPAREN = "("
+RPAREN = ")"
+END = "end"
+
+_DIGITS = frozenset("0123456789")
+
+
+class ExpressionSyntaxError(SyntaxError):
+    """Raised when an expression cannot be tokenized or parsed."""
+
+
+# text is the source of a float literal, so Decimal mode can read it exactly
+Token = namedtuple("Token", ["kind", "value", "pos", "text"], defaults=[None])
+
+#-----------------------------------------------------------------------------
+# Tokenizer
+#-----------------------------------------------------------------------------
+
+def tokenize(expr, variables=frozenset()):
+    """
+    Split an expression into tokens in a single pass.
+    
+    Numbers become int or float values (decimal points and exponents make
+    a float, and keep their source text for Decimal mode), operator
+    symbols are normalized (× becomes *, ÷ becomes /) and names are
+    checked against the known constants, functions, registers and the
+    given variable names.
+    
+    Args:
+        expr (str): Raw mathematical expression
+        variables (frozenset): Names to accept as variables
+        
+    Returns:
+        list: Token records, always terminated by an END token
+        
+    Raises:
+        ExpressionSyntaxError: If the expression contains unknown characters
+            or names, or a malformed number
+    """
+    tokens = []
+    append = tokens.append
+    length = len(expr)
+    i = 0
+    
+    while i < length:
+        ch = expr[i]
+        
+        if ch in _DIGITS or ch == ".":
+            # Number literal: digits, an optional fraction and an optional exponent
+            start = i
+            while i < length and expr[i] in _DIGITS:
+                i += 1
+            is_float = False
+            if i < length and expr[i] == ".":
+                is_float = True
+                i += 1
+                while i < length and expr[i] in _DIGITS:
+                    i += 1
+            # Only treat e/E as an exponent when digits follow, so "2e"
+            # stays a number followed by the constant e
+            if i < length and expr[i] in "eE":
+                j = i + 1
+                if j < length and expr[j] in "+-":
+                    j += 1
+                if j < length and expr[j] in _DIGITS:
+                    is_float = True
+                    i = j
+                    while i < length and expr[i] in _DIGITS:
+                        i += 1
+            text = expr[start:i]
+            if text == "." or text.count(".") > 1 or (i < length and expr[i] == "."):
+                raise ExpressionSyntaxError(f"Syntax error: invalid number at position {start}")
+            if is_float:
+                append(Token(NUMBER, float(text), start, text))
+            else:
+                append(Token(NUMBER, int(text), start))
+            
+        elif ch in OPERATOR_SYMBOLS:
+            # Accept Python-style ** as exponentiation
+            if ch == "*" and i + 1 < length and expr[i + 1] == "*":
+                append(Token(OPERATOR, "^", i))
+                i += 2
+            else:
+                append(Token(OPERATOR, OPERATOR_SYMBOLS[ch], i))
+                i += 1
+                
+        elif ch == "(":
+            append(Token(LPAREN, ch, i))
+            i += 1
+            
+        elif ch == ")":
+            append(Token(RPAREN, ch, i))
+            i += 1
+            
+        elif ch.isspace():
+            i += 1
+            
+        elif ch == "π":
+            append(Token(NAME, ch, i))
+            i += 1
+            
+        elif ch.isalpha():
+            # Names are runs of ASCII letters, matched whole so that
+            # letters inside a longer name are never treated as constants
+            start = i
+            while i < length and expr[i].isascii() and expr[i].isalpha():
+                i += 1
+            if start == i:
+                raise ExpressionSyntaxError(f"Syntax error: unexpected character {ch!r} at position {i}")
+            name = expr[start:i]
+            if (name not in CONSTANTS and name not in FUNCTIONS and name not in TRIG_FUNCTIONS
+                    and name not in REGISTERS and name not in variables):
+                raise ExpressionSyntaxError(f"Syntax error: unknown name {name!r} at position {start}")
+            append(Token(NAME, name, start))
+            
+        else:
+            raise ExpressionSyntaxError(f"Syntax error: unexpected character {ch!r} at position {i}")
+    
+    append(Token(END, None, length))
+    return tokens
+
+#-----------------------------------------------------------------------------
+# Abstract Syntax Tree
+#-----------------------------------------------------------------------------
+
+class Number:
+    """A numeric literal, with its source text when it was written as a float."""
+    __slots__ = ("value", "text")
+    
+    def __init__(self, value, text=None):
+        self.value = value
+        self.text = text
+
+
+class Constant:
+    """A named constant such as π or e."""
+    __slots__ = ("name",)
+    
+    def __init__(self, name):
+        self.name = name
+
+
+class Register:
+    """A reference to a register (ANS or M) read at evaluation time."""
+    __slots__ = ("name",)
+    
+    def __init__(self, name):
+        self.name = name
+
+
+class Variable:
+    """A reference to a caller-supplied variable such as x."""
+    __slots__ = ("name",)
+    
+    def __init__(self, name):
+        self.name = name
+
+
+class UnaryOp:
+    """A prefix sign (+, -) or the postfix percent operator (%)."""
+    __slots__ = ("op", "operand")
+    
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+
+
+class BinaryOp:
+    """An infix operation: +, -, *, / or ^."""
+    __slots__ = ("op", "left", "right")
+    
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class FunctionCall:
+    """A call of a named function with a single argument."""
+    __slots__ = ("name", "argument")
+    
+    def __init__(self, name, argument):
+        self.name = name
+        self.argument = argument
+
+
+class NodeTable:
+    """
+    Hash-consing table that makes structurally identical subtrees one object.
+    
+    Nodes are built bottom-up through make(), so children are already
+    unique and a node is identified by its type, its own fields and the
+    identity of its children. Repeated sub-terms such as the two sin(ANS)
+    in sin(ANS)×cos(ANS)+sin(ANS)^2 then share one node, which the
+    compiler evaluates only once per run.
+    """
+    __slots__ = ("nodes",)
+    
+    def __init__(self):
+        self.nodes = {}
+    
+    def __len__(self):
+        return len(self.nodes)
+    
+    def make(self, cls, *fields):
+        """
+        Return the unique node of type cls with the given fields.
+        
+        Args:
+            cls (type): Node class, e.g. BinaryOp
+            *fields: Constructor arguments; child nodes must come from this table
+            
+        Returns:
+            The shared node
+        """
+        if cls is Number:
+            value = fields[0]
+            # 1 and 1.0, or 0.0 and -0.0, compare equal but are different
+            # literals, as are float literals that only differ past float precision
+            key = (Number, type(value), value.hex() if isinstance(value, float) else value,
+                   fields[1] if len(fields) > 1 else None)
+        else:
+            key = (cls,) + fields
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = cls(*fields)
+        return node
+
+#-----------------------------------------------------------------------------
+# Parser
+#-----------------------------------------------------------------------------
+
+class Parser:
+    """
+    Precedence-climbing (Pratt) parser turning tokens into an AST.
+    
+    Missing closing parentheses at the end of the expression are closed
+    automatically, matching the calculator's forgiving input style.
+    Nodes are interned in a NodeTable, so repeated sub-terms are shared.
+    """
+    
+    def __init__(self, tokens, variables=frozenset()):
+        """
+        Initialize the parser.
+        
+        Args:
+            tokens (list): Tokens produced by tokenize()
+            variables (frozenset): Names to treat as variables
+        """
+        self.tokens = tokens
+        self.variables = variables
+        self.pos = 0
+        self.make = NodeTable().make
+    
+    def parse(self):
+        """
+        Parse the whole token stream.
+        
+        Returns:
+            The root AST node
+            
+        Raises:
+            ExpressionSyntaxError: If the tokens do not form a valid expression
+        """
+        node = self.expression(0)
+        token = self.tokens[self.pos]
+        if token.kind == RPAREN:
+            raise ExpressionSyntaxError(f"Syntax error: unmatched ')' at position {token.pos}")
+        if token.kind != END:
+            raise self.unexpected(token)
+        return node
+    
+    def expression(self, right_binding):
+        """
+        Parse an expression whose operators bind tighter than right_binding.
+        
+        Args:
+            right_binding (int): Binding power of the operator on the left
+            
+        Returns:
+            The AST node for the parsed expression
+        """
+        tokens = self.tokens
+        token = tokens[self.pos]
+        self.pos += 1
+        left = self.prefix(token)
+        
+        while True:
+            token = tokens[self.pos]
+            if token.kind != OPERATOR:
+                return left
+            op = token.value
+            if op == "%":
+                if PERCENT_BINDING <= right_binding:
+                    return left
+                self.pos += 1
+                left = self.make(UnaryOp, "%", left)
+                continue
+            binding = INFIX_BINDING[op]
+            if binding <= right_binding:
+                return left
+            self.pos += 1
+            # ^ is right-associative, everything else is left-associative
+            right = self.expression(binding - 1 if op == "^" else binding)
+            left = self.make(BinaryOp, op, left, right)
+    
+    def prefix(self, token):
+        """
+        Parse the construct that starts with the given token.
+        
+        Args:
+            token (Token): The token at the start of an operand
+            
+        Returns:
+            The AST node for the operand
+        """
+        kind = token.kind
+        if kind == NUMBER:
+            return self.make(Number, token.value, token.text)
+        if kind == NAME:
+            name = token.value
+            if name in CONSTANTS:
+                return self.make(Constant, name)
+            if name in REGISTERS:
+                return self.make(Register, name)
+            if name in self.variables:
+                return self.make(Variable, name)
+            if self.tokens[self.pos].kind != LPAREN:
+                raise ExpressionSyntaxError(
+                    f"Syntax error: expected '(' after {name} at position {token.pos}")
+            self.pos += 1
+            argument = self.expression(0)
+            self.close_paren()
+            return self.make(FunctionCall, name, argument)
+        if kind == LPAREN:
+            node = self.expression(0)
+            self.close_paren()
+            return node
+        if kind == OPERATOR and token.value in ("+", "-"):
+            return self.make(UnaryOp, token.value, self.expression(PREFIX_BINDING))
+        raise self.unexpected(token)
+    
+    def close_paren(self):
+        """Consume a closing parenthesis, treating the end as an implicit one."""
+        token = self.tokens[self.pos]
+        if token.kind == RPAREN:
+            self.pos += 1
+        elif token.kind != END:
+            raise self.unexpected(token)
+    
+    def unexpected(self, token):
+        """Build the syntax error for an unexpected token."""
+        if token.kind == END:
+            return ExpressionSyntaxError("Syntax error: unexpected end of expression")
+        return ExpressionSyntaxError(
+            f"Syntax error: unexpected {token.value!r} at position {token.pos}")
+
+
+def parse(expr, variables=frozenset()):
+    """
+    Tokenize and parse an expression.
+    
+    Args:
+        expr (str): Raw mathematical expression
+        variables (frozenset): Names to accept as variables
+        
+    Returns:
+        The root AST node
+    """
+    return Parser(tokenize(expr, variables), variables).parse()
+
+#-----------------------------------------------------------------------------
+# Numeric Tower
+#-----------------------------------------------------------------------------
+
+# Integers stay exact, dividing integers that do not divide evenly gives a
+# Fraction, and floats appear only from decimal literals, constants and
+# functions like sin and sqrt. Python's operators already keep int and
+# Fraction arithmetic exact, so only / and ^ need their own rules; those
+# are looked up by the operand types rather than tested case by case.
+# fractions is imported on first use, as it costs more start-up time than
+# the rest of this module.
+_Fraction = None
+
+
+def _fraction_type():
+    """Import Fraction on first use and register its handlers."""
+    global _Fraction
+    if _Fraction is None:
+        from fractions import Fraction
+        _Fraction = Fraction
+        _MAGNITUDES[Fraction] = _fraction_magnitude
+        _NORMALIZERS[Fraction] = _normalize_fraction
+        _FORMATTERS[Fraction] = _format_fraction
+    return _Fraction
+
+
+def _divide_ints(a, b):
+    """Divide exactly: an int when b divides a, otherwise a Fraction."""
+    if not b:
+        raise ZeroDivisionError("division by zero")
+    quotient, remainder = divmod(a, b)
+    if not remainder:
+        return quotient
+    return _fraction_type()(a, b)
+
+
+def _power_ints(a, b):
+    """Raise to an integer power; negative exponents give an exact Fraction."""
+    if b >= 0 or not a:
+        return a ** b   # 0 ** -1 raises ZeroDivisionError as usual
+    return _fraction_type()(1, a ** -b)
+
+
+# (type, type) -> implementation; pairs not listed use Python's operator
+_DIVISION = {(int, int): _divide_ints}
+_POWER = {(int, int): _power_ints}
+
+
+def exact_divide(a, b):
+    """
+    Divide two numbers, keeping integer and rational results exact.
+    
+    Args:
+        a, b: Numbers (int, Fraction, float, ...)
+        
+    Returns:
+        int | Fraction | float: The quotient
+    """
+    return _DIVISION.get((type(a), type(b)), operator.truediv)(a, b)
+
+
+def exact_power(a, b):
+    """
+    Raise a to the power b, keeping integer and rational results exact.
+    
+    Args:
+        a, b: Numbers (int, Fraction, float, ...)
+        
+    Returns:
+        The power; a float when the exponent is fractional
+    """
+    return _POWER.get((type(a), type(b)), operator.pow)(a, b)
+
+
+def _normalize_fraction(value):
+    """Turn a Fraction with denominator 1 back into an int."""
+    return value.numerator if value.denominator == 1 else value
+
+
+# type -> function simplifying a result; types not listed are kept as they are
+_NORMALIZERS = {}
+
+
+def normalize_number(value):
+    """
+    Return a result in its simplest exact type (Fraction(4, 1) becomes 4).
+    
+    Args:
+        value: A computed number
+        
+    Returns:
+        The same number, as an int where possible
+    """
+    normalize = _NORMALIZERS.get(type(value))
+    return value if normalize is None else normalize(value)
+
+#-----------------------------------------------------------------------------
+# Compiler
+#-----------------------------------------------------------------------------
+
+# Closure builders for binary operators with two computed operands
+_BINARY_BUILDERS = {
+    "+": lambda left, right: lambda env: left(env) + right(env),
+    "-": lambda left, right: lambda env: left(env) - right(env),
+    "*": lambda left, right: lambda env: left(env) * right(env),
+}
+
+# Closure builders for binary operators whose right operand is a literal
+_BINARY_CONSTANT_BUILDERS = {
+    "+": lambda left, value: lambda env: left(env) + value,
+    "-": lambda left, value: lambda env: left(env) - value,
+    "*": lambda left, value: lambda env: left(env) * value,
+}
+
+# Operators that are folded into a single loop when chained, e.g. 1+2-3+4
+_CHAIN_GROUPS = {
+    "+": ("+", "-"),
+    "-": ("+", "-"),
+    "*": ("*", "/"),
+    "/": ("*", "/"),
+}
+_CHAIN_FUNCTIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+}
+
+
+class Backend:
+    """
+    The numeric primitives a compiled expression is built from.
+    
+    +, - and * are applied with Python's own operators; division and
+    powers come from the backend, so a backend supplies those plus the
+    constants and functions that work on its kind of value (exact numbers,
+    NumPy arrays, ...).
+    
+    Number types whose arithmetic depends on a context (decimal.Decimal and
+    its precision) also supply an arithmetic object with three hooks:
+    convert(value, text=None) turns literals (read from their source text
+    when it is given) and register values into the backend's type,
+    scope() returns the context manager that constant folding runs in, and
+    wrap(run) returns the evaluator that runs a compiled expression in
+    that context and delivers its final result.
+    """
+    
+    def __init__(self, name, constants, functions, trig_functions, radians,
+                 divide=operator.truediv, power=operator.pow, arithmetic=None):
+        """
+        Initialize a backend.
+        
+        Args:
+            name (str): Short name, part of the expression cache key
+            constants (dict): Constant name -> value
+            functions (dict): Function name -> callable, independent of angle mode
+            trig_functions (dict): Function name -> callable taking radians
+            radians (callable): Converts degrees to radians
+            divide (callable): Implements / (and %, as a division by 100)
+            power (callable): Implements ^
+            arithmetic: Context hooks (convert, scope, wrap), or None for
+                numbers that need no context
+        """
+        self.name = name
+        self.constants = constants
+        self.functions = functions
+        self.trig_functions = trig_functions
+        self.radians = radians
+        self.operators = dict(_CHAIN_FUNCTIONS, **{"/": divide, "^": power})
+        self.arithmetic = arithmetic
+
+
+# Default backend: exact ints and fractions, floats only where unavoidable
+EXACT_BACKEND = Backend("exact", CONSTANTS, FUNCTIONS, TRIG_FUNCTIONS, math.radians,
+                        exact_divide, exact_power)
+
+
+def _degrees(func, radians):
+    """Wrap a trigonometric function so it takes its argument in degrees."""
+    return lambda x: func(radians(x))
+
+
+def _resolve_function(name, angle_mode, backend):
+    """Look up a function, applying the angle mode to trigonometric ones."""
+    if name in backend.trig_functions:
+        func = backend.trig_functions[name]
+        if angle_mode == "DEG":
+            func = _degrees(func, backend.radians)
+        return func
+    return backend.functions[name]
+
+
+def compile_node(node, angle_mode="DEG", backend=EXACT_BACKEND, shared=None):
+    """
+    Compile an AST node into a Python closure.
+    
+    The closure takes a single environment argument: a dict mapping
+    register (ANS, M) and variable names to their values for this evaluation.
+    
+    Args:
+        node: Root AST node
+        angle_mode (str): "DEG" or "RAD", fixed into trigonometric calls
+        backend (Backend): Supplies constants and functions
+        shared (dict): Nodes referenced more than once, mapped to their
+            compiled closure (None until compiled). Each is compiled once
+            and memoizes its value in the environment, so the environment
+            must be a fresh dict for every evaluation.
+        
+    Returns:
+        callable: A function of the environment that evaluates the expression
+    """
+    if shared is not None and node in shared:
+        compiled = shared[node]
+        if compiled is None:
+            compiled = shared[node] = _memoize(node, _compile(node, angle_mode, backend, shared))
+        return compiled
+    return _compile(node, angle_mode, backend, shared)
+
+
+def _memoize(node, compute):
+    """Wrap a compiled sub-expression so it runs at most once per environment."""
+    def memoized(env):
+        # The node object itself is the key, so it cannot clash with a name
+        try:
+            return env[node]
+        except KeyError:
+            value = env[node] = compute(env)
+            return value
+    return memoized
+
+
+def _compile(node, angle_mode, backend, shared):
+    """Compile one node; children go through compile_node()."""
+    kind = type(node)
+    
+    if kind is Number:
+        value = node.value
+        if backend.arithmetic is not None:
+            value = backend.arithmetic.convert(value, node.text)
+        return lambda env: value
+    
+    if kind is Constant:
+        value = backend.constants[node.name]
+        return lambda env: value
+    
+    if kind is Register or kind is Variable:
+        name = node.name
+        return lambda env: env[name]
+    
+    if kind is UnaryOp:
+        operand = compile_node(node.operand, angle_mode, backend, shared)
+        if node.op == "-":
+            return lambda env: -operand(env)
+        if node.op == "%":
+            divide = backend.operators["/"]
+            return lambda env: divide(operand(env), 100)
+        return lambda env: +operand(env)
+    
+    if kind is FunctionCall:
+        argument = compile_node(node.argument, angle_mode, backend, shared)
+        func = _resolve_function(node.name, angle_mode, backend)
+        return lambda env: func(argument(env))
+    
+    if kind is BinaryOp:
+        group = _CHAIN_GROUPS.get(node.op)
+        if group is not None and type(node.left) is BinaryOp and node.left.op in group:
+            return _compile_chain(node, group, angle_mode, backend, shared)
+        left = compile_node(node.left, angle_mode, backend, shared)
+        if type(node.right) is Number:
+            if node.op == "^" and node.right.value == 2 and type(node.right.value) is int:
+                # Strength reduction: one multiplication instead of a pow() call
+                def square(env):
+                    value = left(env)
+                    return value * value
+                return square
+            value = node.right.value
+            if node.op in _BINARY_CONSTANT_BUILDERS:
+                return _BINARY_CONSTANT_BUILDERS[node.op](left, value)
+            func = backend.operators[node.op]
+            return lambda env: func(left(env), value)
+        right = compile_node(node.right, angle_mode, backend, shared)
+        if node.op in _BINARY_BUILDERS:
+            return _BINARY_BUILDERS[node.op](left, right)
+        func = backend.operators[node.op]
+        return lambda env: func(left(env), right(env))
+    
+    raise TypeError(f"Cannot compile node of type {kind.__name__}")
+
+
+def _compile_chain(node, group, angle_mode, backend, shared=None):
+    """
+    Compile a left-leaning chain of same-precedence operators as a loop.
+    
+    Long generated sums such as 1+1+...+1 would otherwise produce a
+    closure nested as deep as the expression is long.
+    
+    Args:
+        node (BinaryOp): Last operation of the chain
+        group (tuple): Operators of equal precedence that make up the chain
+        angle_mode (str): "DEG" or "RAD"
+        backend (Backend): Supplies constants and functions
+        shared (dict): Shared nodes, as for compile_node()
+        
+    Returns:
+        callable: Closure evaluating the chain left to right
+    """
+    steps = []
+    while type(node) is BinaryOp and node.op in group:
+        steps.append((backend.operators[node.op],
+                      compile_node(node.right, angle_mode, backend, shared)))
+        node = node.left
+    steps.reverse()
+    first = compile_node(node, angle_mode, backend, shared)
+    steps = tuple(steps)
+    
+    def chain(env):
+        value = first(env)
+        for func, operand in steps:
+            value = func(value, operand(env))
+        return value
+    return chain
+
+
+class CompiledExpression:
+    """
+    A compiled expression together with facts about its AST.
+    
+    Calling the object (or its run attribute, which skips one call layer)
+    with an environment evaluates the expression. Sub-terms that occur more
+    than once in the (hash-consed) tree are evaluated once per call.
+    """
+    __slots__ = ("run", "tree", "backend", "node_count", "has_power", "inputs", "input_uses",
+                 "static_digits")
+    
+    def __init__(self, tree, angle_mode="DEG", backend=EXACT_BACKEND, optimize=True):
+        """
+        Compile an AST.
+        
+        Args:
+            tree: Root AST node
+            angle_mode (str): "DEG" or "RAD"
+            backend (Backend): Supplies constants and functions
+            optimize (bool): Simplify the tree with optimize_tree() first
+        """
+        arithmetic = backend.arithmetic
+        if optimize:
+            if arithmetic is None:
+                tree = optimize_tree(tree, angle_mode, backend)
+            else:
+                with arithmetic.scope():
+                    tree = optimize_tree(tree, angle_mode, backend)
+        self.tree = tree
+        self.backend = backend
+        self.node_count = 0         # Unique nodes; shared sub-terms count once
+        self.has_power = False      # Only ^ can make integers grow explosively
+        self.input_uses = 0         # References to inputs, shared sub-terms once per use
+        self.static_digits = None   # Cached size estimate; see estimate()
+        inputs = set()              # Registers and variables, known only at run time
+        
+        seen = set()
+        shared = {}
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            kind = type(node)
+            if node in seen:
+                # Memoizing leaves would cost more than reading them again
+                if kind is BinaryOp or kind is UnaryOp or kind is FunctionCall:
+                    shared[node] = None
+                continue
+            seen.add(node)
+            self.node_count += 1
+            if kind is BinaryOp:
+                if node.op == "^":
+                    self.has_power = True
+                stack.append(node.left)
+                stack.append(node.right)
+            elif kind is UnaryOp:
+                stack.append(node.operand)
+            elif kind is FunctionCall:
+                stack.append(node.argument)
+            elif kind is Register or kind is Variable:
+                inputs.add(node.name)
+        self.inputs = tuple(inputs)
+        if inputs:
+            self.input_uses = _count_inputs(tree)
+        
+        if shared:
+            root = compile_node(tree, angle_mode, backend, shared)
+            # Memoized values live in a copy of the environment, so callers
+            # may reuse their environment dict between evaluations
+            self.run = lambda env: root(dict(env))
+        else:
+            self.run = compile_node(tree, angle_mode, backend)
+        if arithmetic is not None:
+            self.run = arithmetic.wrap(self.run)
+    
+    def __call__(self, env):
+        return self.run(env)
+    
+    def estimate(self, env):
+        """
+        Estimate the size of the numbers this expression produces.
+        
+        Only ^ grows sizes faster than adding them up, so without it the
+        estimate is computed once with every input at zero, and each use
+        of an input then adds at most the size of the largest input.
+        
+        Args:
+            env (dict): Register and variable values for this evaluation;
+                None when they are not known, which counts them as floats
+            
+        Returns:
+            float: Size in digits, an upper bound on what estimate_digits()
+            computes
+        """
+        inputs = self.inputs
+        if inputs and self.has_power:
+            return estimate_digits(self.tree, env, self.backend)
+        digits = self.static_digits
+        if digits is None:
+            digits = self.static_digits = estimate_digits(
+                self.tree, dict.fromkeys(inputs, 0), self.backend)
+        if inputs and env:
+            # Inexact inputs only grow estimates where reals are tracked
+            reals = self.backend.arithmetic is not None
+            largest = 0.0
+            for name in inputs:
+                exactness, size = _magnitude(env.get(name, 0.0))
+                if (exactness or reals) and size > largest:
+                    largest = size
+            digits += self.input_uses * largest
+        return digits
+
+
+def _count_inputs(tree):
+    """Count the register and variable references in a tree, a shared sub-term once per use."""
+    counts = {}
+    stack = [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        if node in counts:
+            continue
+        kind = type(node)
+        if kind is BinaryOp:
+            if visited:
+                counts[node] = counts[node.left] + counts[node.right]
+            else:
+                stack += [(node, True), (node.right, False), (node.left, False)]
+        elif kind is UnaryOp or kind is FunctionCall:
+            child = node.operand if kind is UnaryOp else node.argument
+            if visited:
+                counts[node] = counts[child]
+            else:
+                stack += [(node, True), (child, False)]
+        else:
+            counts[node] = 1 if kind is Register or kind is Variable else 0
+    return counts[tree]
+
+
+def compile_expression(expr, angle_mode="DEG", precision=None):
+    """
+    Tokenize, parse and compile an expression.
+    
+    Args:
+        expr (str): Raw mathematical expression
+        angle_mode (str): "DEG" or "RAD"
+        precision (int): Significant digits for Decimal arithmetic; None
+            for exact arithmetic
+        
+    Returns:
+        CompiledExpression: Callable with an environment to get the expression's value
+    """
+    return CompiledExpression(parse(expr), angle_mode, _select_backend(precision))
+
+
+_PYTHON_FUNCTIONS = {
+    "sin": "math.sin",
+    "cos": "math.cos",
+    "tan": "math.tan",
+    "sqrt": "math.sqrt",
+    "log": "math.log10",
+}
+_PYTHON_CONSTANTS = {
+    "π": "math.pi",
+    "pi": "math.pi",
+    "e": "math.e",
+}
+
+
+def _to_python_source(node, angle_mode="DEG"):
+    """
+    Render an AST node as fully parenthesized Python source.
+    
+    Args:
+        node: Root AST node
+        angle_mode (str): "DEG" wraps trigonometric arguments in math.radians
+        
+    Returns:
+        str: Python expression equivalent to the node
+    """
+    kind = type(node)
+    if kind is Number:
+        return repr(node.value)
+    if kind is Constant:
+        return _PYTHON_CONSTANTS[node.name]
+    if kind is Register or kind is Variable:
+        return node.name
+    if kind is UnaryOp:
+        operand = _to_python_source(node.operand, angle_mode)
+        if node.op == "%":
+            return f"({operand}/100)"
+        return f"({node.op}{operand})"
+    if kind is FunctionCall:
+        argument = _to_python_source(node.argument, angle_mode)
+        if node.name in TRIG_FUNCTIONS and angle_mode == "DEG":
+            argument = f"math.radians({argument})"
+        return f"{_PYTHON_FUNCTIONS[node.name]}({argument})"
+    op = "**" if node.op == "^" else node.op
+    left = _to_python_source(node.left, angle_mode)
+    right = _to_python_source(node.right, angle_mode)
+    return f"({left}{op}{right})"
+
+
+# Integers up to this many bits (about 4200 digits, under Python's default
+# int-to-str limit) are shown in full; larger ones in exponent notation
+_FULL_DISPLAY_BITS = 14000
+
+
+def _format_int(value):
+    """Format an int in full, or huge ones as 10 significant digits."""
+    if value.bit_length() <= _FULL_DISPLAY_BITS:
+        return str(value)
+    # str() is quadratic; the digits shown are found without converting
+    from utils.big_integers import LazyInteger
+    return LazyInteger(value).scientific()
+
+
+def _format_float(value):
+    """Format a float (or other real number) for display."""
+    if value == int(value):
+        # For values that are effectively integers
+        return str(int(value))
+    # For floating point values, limit decimal places
+    return f"{float(value):.10g}"
+
+
+def _format_fraction(value):
+    """Format a Fraction to 10 significant digits, even beyond the float range."""
+    if value.denominator == 1:
+        return str(value.numerator)
+    try:
+        number = float(value)
+    except OverflowError:
+        number = 0.0
+    if number and abs(number) < 1e16:
+        return _format_float(number)
+    # Beyond what a float shows faithfully: find the 10 leading digits exactly
+    magnitude = abs(value)
+    exponent = int(math.log10(magnitude.numerator) - math.log10(magnitude.denominator))
+    while True:
+        digits = round(magnitude / _Fraction(10) ** (exponent - 9))
+        if digits >= 10 ** 10:
+            exponent += 1
+        elif digits < 10 ** 9:
+            exponent -= 1
+        else:
+            break
+    mantissa = str(digits).rstrip("0")
+    if len(mantissa) > 1:
+        mantissa = mantissa[0] + "." + mantissa[1:]
+    sign = "-" if value < 0 else ""
+    return f"{sign}{mantissa}e{'+' if exponent >= 0 else '-'}{abs(exponent):02d}"
+
+
+# type -> display formatter; other types are formatted as floats
+_FORMATTERS = {int: _format_int, float: _format_float}
+
+
+def format_result(value):
+    """
+    Format a computed value for display.
+    
+    Args:
+        value: Number produced by evaluating an expression
+        
+    Returns:
+        str: Integers without a decimal point (huge ones in exponent
+            notation), other values to 10 significant digits
+    """
+    return _FORMATTERS.get(type(value), _format_float)(value)
+
+#-----------------------------------------------------------------------------
+# Optimizer
+#-----------------------------------------------------------------------------
+
+# Constant operations are folded with the same operators the compiled
+# closures use (the backend's for /, % and ^), so folding never changes
+# a result
+_FOLD_UNARY = {
+    "-": operator.neg,
+    "+": operator.pos,
+}
+
+
+# type -> finiteness test for inexact folding results other than floats;
+# types not listed (NumPy arrays, ...) are never folded
+_FINITE_CHECKS = {}
+
+
+def _fold(make, func, *args):
+    """
+    Compute a constant sub-expression, or return None to leave it unfolded.
+    
+    Errors (division by zero, domain errors, overflow) are left for run time
+    so they surface exactly as they would without the optimizer, and so are
+    results that are not finite real numbers or that would bloat the cached
+    tree with a huge integer.
+    """
+    try:
+        value = normalize_number(func(*args))
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+    exactness, digits = _magnitude(value)
+    if exactness:
+        return make(Number, value) if digits <= _FLOAT_DIGITS else None
+    if isinstance(value, float):
+        return make(Number, value) if math.isfinite(value) else None
+    is_finite = _FINITE_CHECKS.get(type(value))
+    if is_finite is not None and is_finite(value):
+        return make(Number, value)
+    return None
+
+
+def _is_int_literal(node, value):
+    """Whether node is the integer literal value (1.0 would turn ints into floats)."""
+    return type(node) is Number and type(node.value) is int and node.value == value
+
+
+def _simplify_binary(make, operators, op, left, right):
+    """Optimize a binary operation whose operands are already optimized."""
+    if type(left) is Number and type(right) is Number:
+        # Check the size of exact powers before computing them
+        if op != "^" or estimate_digits(BinaryOp(op, left, right)) <= _FLOAT_DIGITS + 1:
+            folded = _fold(make, operators[op], left.value, right.value)
+            if folded is not None:
+                return folded
+    
+    # Identity elimination: x+0, 0+x, x-0, x*1, 1*x, x^1
+    if op in ("+", "-", "*", "^"):
+        identity = 0 if op in ("+", "-") else 1
+        if _is_int_literal(right, identity):
+            return left
+        if op in ("+", "*") and _is_int_literal(left, identity):
+            return right
+    
+    # Strength reduction: x^0.5 is a square root (x^2 is handled by the compiler)
+    if op == "^" and type(right) is Number and right.value == 0.5:
+        return make(FunctionCall, "sqrt", left)
+    
+    return make(BinaryOp, op, left, right)
+
+
+def optimize_tree(tree, angle_mode="DEG", backend=EXACT_BACKEND):
+    """
+    Simplify an AST before it is compiled.
+    
+    Folds constant sub-expressions (2×π÷360, sqrt(2), 10^3) into literals,
+    removes identity operations (x×1, x+0, x^1) and rewrites x^0.5 as
+    sqrt(x). Trigonometric calls are folded with the given angle mode, so
+    the optimized tree is only valid for that mode, as compiled code is.
+    
+    Works bottom-up without recursion, so very long expressions are fine.
+    Shared subtrees are optimized once and the result is hash-consed
+    again, since simplifying can make different sub-terms identical
+    (sin(ANS+0) and sin(ANS)).
+    
+    Args:
+        tree: Root AST node from parse()
+        angle_mode (str): "DEG" or "RAD"
+        backend (Backend): Supplies constants and functions for folding
+        
+    Returns:
+        The root of the optimized tree; the input tree is not modified
+    """
+    make = NodeTable().make
+    operators = backend.operators
+    convert = backend.arithmetic and backend.arithmetic.convert
+    unary = dict(_FOLD_UNARY, **{"%": lambda value: operators["/"](value, 100)})
+    done = {}       # Input node -> optimized node
+    results = []
+    stack = [(tree, False)]
+    
+    while stack:
+        node, visited = stack.pop()
+        if not visited and node in done:
+            results.append(done[node])
+            continue
+        kind = type(node)
+        
+        if not visited and kind in (BinaryOp, UnaryOp, FunctionCall):
+            stack.append((node, True))
+            if kind is BinaryOp:
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            elif kind is UnaryOp:
+                stack.append((node.operand, False))
+            else:
+                stack.append((node.argument, False))
+            continue
+        
+        if kind is Number:
+            if convert is None:
+                result = make(Number, node.value, node.text)
+            else:
+                result = make(Number, convert(node.value, node.text))
+        elif kind is Constant:
+            result = make(Number, backend.constants[node.name])
+        elif kind is UnaryOp:
+            operand = results.pop()
+            if type(operand) is Number:
+                result = (_fold(make, unary[node.op], operand.value)
+                          or make(UnaryOp, node.op, operand))
+            elif node.op == "+":
+                result = operand
+            else:
+                result = make(UnaryOp, node.op, operand)
+        elif kind is FunctionCall:
+            argument = results.pop()
+            result = make(FunctionCall, node.name, argument)
+            # Reducing a huge trigonometric argument is left for run time,
+            # where the resource guard prices it
+            if type(argument) is Number and (node.name not in backend.trig_functions
+                                             or _magnitude(argument.value)[1] <= _FLOAT_DIGITS):
+                func = _resolve_function(node.name, angle_mode, backend)
+                result = _fold(make, func, argument.value) or result
+        elif kind is BinaryOp:
+            right = results.pop()
+            result = _simplify_binary(make, operators, node.op, results.pop(), right)
+        else:
+            result = make(kind, node.name)
+        done[node] = result
+        results.append(result)
+    
+    return results[0]
+
+#-----------------------------------------------------------------------------
+# Compiled Expression Cache
+#-----------------------------------------------------------------------------
+
+# Rough memory cost of one compiled AST node (function object plus closure cells)
+_BYTES_PER_NODE = 240
+
+
+def normalize_expression(expr):
+    """
+    Normalize an expression for use as a cache key.
+    
+    Args:
+        expr (str): Raw mathematical expression
+        
+    Returns:
+        str: The expression with all whitespace removed
+    """
+    return "".join(expr.split())
+
+
+class ExpressionCache:
+    """
+    Bounded LRU cache of compiled expressions.
+    
+    Entries are keyed by normalized expression, angle mode, variable names
+    and backend, and evicted least-recently-used first once either the
+    entry limit or the estimated memory limit is exceeded. Hit, miss and
+    eviction counters are kept for monitoring.
+    
+    The cache is safe to share between threads: bookkeeping happens under
+    a lock, and compiled expressions are immutable once built.
+    """
+    
+    def __init__(self, max_entries=1024, max_bytes=4 * 1024 * 1024):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            max_entries (int): Maximum number of compiled expressions kept
+            max_bytes (int): Maximum estimated memory used by cached entries
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("Cache limits must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (program, estimated size)
+        self._bytes = 0
+        self._lock = _thread.allocate_lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, expr, angle_mode="DEG", variables=frozenset(), backend=EXACT_BACKEND):
+        """
+        Return the compiled form of an expression, compiling it on a miss.
+        
+        Args:
+            expr (str): Raw mathematical expression
+            angle_mode (str): "DEG" or "RAD"
+            variables (frozenset): Names to accept as variables
+            backend (Backend): Numeric backend to compile for
+            
+        Returns:
+            CompiledExpression: The compiled expression
+            
+        Raises:
+            ExpressionSyntaxError: If the expression is invalid (nothing is cached)
+        """
+        key = (normalize_expression(expr), angle_mode, variables, backend.name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        
+        # Compile outside the lock so other threads are not held up by parsing
+        program = CompiledExpression(parse(key[0], variables), angle_mode, backend)
+        size = sys.getsizeof(key[0]) + program.node_count * _BYTES_PER_NODE
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Another thread compiled the same expression meanwhile
+                return entry[0]
+            self._entries[key] = (program, size)
+            self._bytes += size
+            self._evict()
+        return program
+    
+    def _evict(self):
+        """Drop least-recently-used entries until the cache is within its limits."""
+        entries = self._entries
+        while len(entries) > self.max_entries or (self._bytes > self.max_bytes and len(entries) > 1):
+            _, (_, size) = entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+    
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    def stats(self):
+        """
+        Report cache usage.
+        
+        Returns:
+            dict: Counters, current size and configured limits
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Cache shared by all evaluations and Calculator instances unless they are given their own
+expression_cache = ExpressionCache()
+
+#-----------------------------------------------------------------------------
+# Resource Guard
+#-----------------------------------------------------------------------------
+
+# Float results never exceed about 1.8e308, so they cost at most this many digits
+_FLOAT_DIGITS = 309
+_LOG10_2 = math.log10(2)
+
+
+class TooExpensiveError(ArithmeticError):
+    """
+    Raised instead of evaluating an expression that would cost too much.
+    
+    Attributes:
+        reason (str): What limit was hit
+        estimate (float): Estimated result size in digits, if known
+        limit (float): The limit that was exceeded
+    """
+    
+    def __init__(self, reason, estimate=None, limit=None):
+        super().__init__(f"Too expensive: {reason}")
+        self.reason = reason
+        self.estimate = estimate
+        self.limit = limit
+
+
+class ResourceLimits:
+    """
+    Limits applied by guarded evaluation.
+    
+    Expressions whose estimated integer size exceeds max_digits are
+    rejected before running. With use_subprocess enabled, expressions
+    estimated above heavy_digits run in a separate process that is
+    killed once the deadline passes; lighter expressions always run
+    in-process, where they are cheap by construction.
+    """
+    
+    def __init__(self, max_digits=1_000_000, heavy_digits=50_000, deadline=5.0,
+                 use_subprocess=False):
+        """
+        Initialize the limits.
+        
+        Args:
+            max_digits (int): Largest integer (in decimal digits) that may be
+                produced, estimated beforehand and checked on the result
+            heavy_digits (int): Estimated size above which an expression is
+                considered heavy
+            deadline (float): Wall-clock seconds a subprocess worker may run
+            use_subprocess (bool): Run heavy expressions in a killable worker
+        """
+        self.max_digits = max_digits
+        self.heavy_digits = heavy_digits
+        self.deadline = deadline
+        self.use_subprocess = use_subprocess
+
+
+# Limits used unless callers pass their own
+DEFAULT_LIMITS = ResourceLimits()
+
+
+# Exactness of a value in size estimates; anything exact is truthy
+_REAL = 0
+_INTEGER = 1
+_RATIONAL = 2
+
+
+def _int_magnitude(value):
+    return _INTEGER, math.log10(abs(value)) if value else 0.0
+
+
+def _fraction_magnitude(value):
+    # Numerator and denominator both cost digits
+    numerator = value.numerator
+    return _RATIONAL, (math.log10(abs(numerator)) if numerator else 0.0) + math.log10(value.denominator)
+
+
+def _decimal_magnitude(value):
+    # Outside the float range too, so measured: log10 of max(|value|, 1/|value|)
+    if not value or not value.is_finite():
+        return _REAL, 0.0
+    digits = value.as_tuple().digits
+    leading = int("".join(map(str, digits[:17])))
+    return _REAL, abs(value.adjusted() + math.log10(leading) - len(str(leading)) + 1)
+
+
+# type -> (exactness, log10 size); other types count as floats
+_MAGNITUDES = {int: _int_magnitude}
+
+
+def _magnitude(value):
+    """Return (exactness, log10 upper bound) for a runtime value."""
+    magnitude = _MAGNITUDES.get(type(value))
+    return (_REAL, _FLOAT_DIGITS) if magnitude is None else magnitude(value)
+
+
+def _real_digits(op, left, right):
+    """Size of a binary operation on reals whose sizes estimate_digits() tracks."""
+    if op == "^":
+        exponent = 10 ** right if right < 300 else math.inf
+        return left * exponent if left else 0.0
+    if op == "+" or op == "-":
+        # Cancellation can make a sum tiny; only the work it feeds is priced
+        return max(left, right) + _LOG10_2
+    return left + right
+
+
+def estimate_digits(tree, env=None, backend=None):
+    """
+    Estimate the largest integer an expression can produce, in digits.
+    
+    Works bottom-up on the AST, tracking an upper bound of log10 of each
+    exact intermediate (exponentiation multiplies the base's size by the
+    exponent's value; a fraction counts both its numerator and its
+    denominator). Anything that yields a float is bounded by the float
+    range, so only exact arithmetic can make the estimate large.
+    
+    Backends with context arithmetic (Decimal) have no such range, so
+    their reals are tracked the same way, by log10 of the larger of |x|
+    and 1/|x|. They are kept to the backend's precision, so they only
+    count as arguments of sin, cos and tan, whose reduction by π works
+    with as many digits as the argument has.
+    
+    Args:
+        tree: Root AST node
+        env (dict): Register and variable values; unknown inputs are
+            treated as floats
+        backend (Backend): Backend the expression runs on; None for
+            exact arithmetic
+            
+    Returns:
+        float: Upper bound on the digits of any integer intermediate, or
+        of any trigonometric argument
+    """
+    env = env or {}
+    arithmetic = backend and backend.arithmetic
+    trig_functions = backend.trig_functions if arithmetic else ()
+    largest = 0.0
+    results = []
+    stack = [(tree, False)]
+    
+    while stack:
+        node, visited = stack.pop()
+        kind = type(node)
+        
+        if not visited and kind in (BinaryOp, UnaryOp, FunctionCall):
+            stack.append((node, True))
+            if kind is BinaryOp:
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            elif kind is UnaryOp:
+                stack.append((node.operand, False))
+            else:
+                stack.append((node.argument, False))
+            continue
+        
+        if kind is Number:
+            result = _magnitude(node.value)
+        elif kind is Register or kind is Variable:
+            result = _magnitude(env.get(node.name, 0.0))
+        elif not arithmetic and (kind is Constant or kind is FunctionCall):
+            if kind is FunctionCall:
+                results.pop()
+            result = (_REAL, _FLOAT_DIGITS)
+        elif kind is Constant:
+            result = (_REAL, 1.0)
+        elif kind is FunctionCall:
+            size = results.pop()[1]
+            if node.name in trig_functions:
+                if size > largest:
+                    largest = size
+                # tan can get as close to a pole as the working precision allows
+                result = (_REAL, arithmetic.working.prec)
+            else:
+                # sqrt and log never move a value further from 1
+                result = (_REAL, size)
+        elif kind is UnaryOp:
+            exactness, size = results.pop()
+            if node.op != "%":
+                result = (exactness, size)
+            elif exactness or arithmetic:
+                result = (exactness and _RATIONAL, size + 2)
+            else:
+                result = (_REAL, _FLOAT_DIGITS)
+        else:
+            right_kind, right = results.pop()
+            left_kind, left = results.pop()
+            op = node.op
+            if not (left_kind and right_kind):
+                result = (_REAL, _real_digits(op, left, right) if arithmetic else _FLOAT_DIGITS)
+            elif op == "^":
+                exponent = 10 ** right if right < 300 else math.inf
+                result = (left_kind, left * exponent if left else 0.0)
+            elif op == "*":
+                result = (max(left_kind, right_kind), left + right)
+            elif op != "/" and left_kind == right_kind == _INTEGER:
+                result = (_INTEGER, max(left, right) + _LOG10_2)
+            else:
+                # Quotients and sums of fractions: a/b + c/d = (ad+bc)/bd
+                result = (_RATIONAL, left + right)
+        
+        if result[0] and result[1] > largest:
+            largest = result[1]
+        results.append(result)
+    
+    return largest + 1
+
+
+def _check_cost(program, env, limits):
+    """
+    Estimate a compiled expression's cost and reject it if over the limit.
+    
+    Args:
+        program (CompiledExpression): The expression to check
+        env (dict): Register and variable values for this evaluation
+        limits (ResourceLimits): Limits to apply
+        
+    Returns:
+        float: Estimated result size in digits
+        
+    Raises:
+        TooExpensiveError: If the estimate exceeds limits.max_digits
+    """
+    digits = program.estimate(env)
+    if digits > limits.max_digits:
+        raise TooExpensiveError(
+            f"result would have about {digits:.3g} digits (limit {limits.max_digits})",
+            digits, limits.max_digits)
+    return digits
+
+
+def _check_result(value, limits):
+    """Reject exact results larger than the configured limit."""
+    exactness, digits = _magnitude(value)
+    if exactness:
+        if digits > limits.max_digits:
+            raise TooExpensiveError(
+                f"result has about {digits:.3g} digits (limit {limits.max_digits})",
+                digits, limits.max_digits)
+
+
+def _worker_main(connection, expr, angle_mode, env, precision=None):
+    """Entry point of the subprocess worker: evaluate and send back the value."""
+    try:
+        connection.send(("ok", compile_expression(expr, angle_mode, precision).run(env)))
+    except Exception as e:
+        connection.send(("error", type(e).__name__, str(e)))
+    finally:
+        connection.close()
+
+
+def run_in_worker(expr, angle_mode, env, deadline, precision=None):
+    """
+    Evaluate an expression in a separate process with a wall-clock deadline.
+    
+    The worker is killed if it has not answered when the deadline passes,
+    so a runaway calculation cannot hold up the caller.
+    
+    Args:
+        expr (str): Raw mathematical expression
+        angle_mode (str): "DEG" or "RAD"
+        env (dict): Register and variable values
+        deadline (float): Seconds to wait for the result, including start-up
+        precision (int): Significant digits for Decimal arithmetic; None
+            for exact arithmetic
+        
+    Returns:
+        The computed value
+        
+    Raises:
+        TooExpensiveError: If the deadline passes
+        ArithmeticError: If evaluation failed in the worker (message preserved)
+    """
+    # Imported here so the common in-process path does not pay for it
+    import multiprocessing
+    
+    # "spawn" avoids forking a process that may be running other threads
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_worker_main, args=(sender, expr, angle_mode, env, precision),
+                              daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(deadline):
+            raise TooExpensiveError(f"evaluation exceeded the {deadline:g}s deadline", limit=deadline)
+        try:
+            reply = receiver.recv()
+        except EOFError:
+            raise ArithmeticError("evaluation worker exited without a result") from None
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    
+    if reply[0] == "ok":
+        return reply[1]
+    if reply[1] == "ZeroDivisionError":
+        raise ZeroDivisionError(reply[2])
+    raise ArithmeticError(reply[2])
+
+#-----------------------------------------------------------------------------
+# Phase Timing
+#-----------------------------------------------------------------------------
+
+# Phases of evaluate(), in order: backend and register setup, cache lookup
+# (tokenizing, parsing and compiling on a miss), running the program, and
+# formatting the result
+TIMING_PHASES = ("prepare", "compile", "execute", "format")
+
+# utils.timing.PhaseTimings while timing is enabled. evaluate() checks this
+# once per call, so disabled timing costs a single global lookup.
+_timings = None
+
+# File the timings are written to at exit; the exit hook is registered
+# when the first path is given
+_timings_dump_path = None
+
+
+def enable_timing(dump_path=None):
+    """
+    Start recording how long each phase of evaluate() takes.
+    
+    Timings are kept in log-linear histograms (see utils.timing), so
+    recording stays cheap and memory stays constant however many
+    evaluations run. Enabling again keeps the samples recorded so far.
+    
+    Args:
+        dump_path (str): If given, timing_stats() is written to this file
+            as JSON when the interpreter exits; a later path replaces it
+    """
+    global _timings, _timings_dump_path
+    if _timings is None:
+        from utils.timing import PhaseTimings
+        _timings = PhaseTimings(TIMING_PHASES)
+    if dump_path:
+        if _timings_dump_path is None:
+            import atexit
+            atexit.register(_dump_timings)
+        _timings_dump_path = dump_path
+
+
+def disable_timing():
+    """Stop recording phase timings and forget the samples."""
+    global _timings
+    _timings = None
+
+
+def timing_stats():
+    """
+    Summarize the phase timings recorded since timing was enabled.
+    
+    Returns:
+        dict: {"unit": "us", "errors": n, "phases": {phase: summary}} where
+            each summary has count, min, mean, max, p50, p90, p99 and
+            p99.9; None when timing is disabled
+    """
+    timings = _timings
+    return None if timings is None else timings.stats()
+
+
+def _dump_timings():
+    """Write phase timings to the dump file at exit, logging rather than raising."""
+    timings = _timings
+    path = _timings_dump_path
+    if timings is None:
+        return
+    try:
+        timings.dump(path)
+    except OSError as e:
+        logger.warning("Cannot write timings to %s: %s", path, e)
+
+
+def _evaluate_timed(expr, angle_mode, ans, memory, cache, limits, precision, named):
+    """
+    Body of evaluate() while timing is enabled, recording each phase.
+    
+    A failing evaluation records the phases it completed, including the
+    one that raised.
+    """
+    clock = time.perf_counter_ns
+    durations = []
+    failed = False
+    start = clock()
+    try:
+        backend = _select_backend(precision)
+        env = _make_env(backend, ans, memory, named)
+        names = frozenset(named or ())
+        now = clock()
+        durations.append(now - start)
+        start = now
+        program = cache.get(expr, angle_mode, names, backend)
+        now = clock()
+        durations.append(now - start)
+        start = now
+        value = execute(program, expr, angle_mode, env, limits)
+        now = clock()
+        durations.append(now - start)
+        start = now
+        formatted = format_result(value)
+        durations.append(clock() - start)
+        return EvaluationResult(True, formatted, "", value)
+    except Exception as e:
+        durations.append(clock() - start)
+        failed = True
+        return EvaluationResult(False, "Error", str(e), None, type(e).__name__)
+    finally:
+        timings = _timings
+        if timings is not None:
+            timings.record(durations, failed)
+
+
+if os.environ.get("CALC_TIMING"):
+    enable_timing(os.environ["CALC_TIMING"])
+
+#-----------------------------------------------------------------------------
+# Stateless Evaluation API
+#-----------------------------------------------------------------------------
+
+EvaluationResult = namedtuple(
+    "EvaluationResult", ["success", "formatted", "error", "value", "error_type"], defaults=[""])
+EvaluationResult.__doc__ = """
+Immutable outcome of evaluating an expression.
+
+Fields:
+    success (bool): Whether evaluation succeeded
+    formatted (str): Display string ("Error" on failure, "" for no input)
+    error (str): Error message, empty on success
+    value: The computed number, or None on failure
+    error_type (str): Exception class name on failure (e.g. "ZeroDivisionError",
+        "TooExpensiveError"), empty on success
+"""
+
+
+def execute(program, expr, angle_mode, env, limits):
+    """
+    Run a compiled expression, applying resource limits if given.
+    
+    Args:
+        program (CompiledExpression): The compiled expression
+        expr (str): The source expression, needed to hand it to a worker
+        angle_mode (str): "DEG" or "RAD"
+        env (dict): Register and variable values
+        limits (ResourceLimits): Limits to apply, or None to run unguarded
+        
+    Returns:
+        The computed value
+        
+    Raises:
+        TooExpensiveError: If the expression or its result is over the limits
+    """
+    if limits is None:
+        return normalize_number(program.run(env))
+    digits = _check_cost(program, env, limits)
+    if limits.use_subprocess and digits > limits.heavy_digits:
+        arithmetic = program.backend.arithmetic
+        value = run_in_worker(expr, angle_mode, env, limits.deadline,
+                              arithmetic and arithmetic.precision)
+    else:
+        value = program.run(env)
+    _check_result(value, limits)
+    return normalize_number(value)
+
+
+def evaluate(expr, *, angle_mode="DEG", ans=0, memory=0, cache=None, limits=DEFAULT_LIMITS,
+             precision=None, named=None):
+    """
+    Evaluate an expression without touching any calculator state.
+    
+    Safe to call from many threads at once; compiled expressions are
+    shared through the expression cache.
+    
+    Args:
+        expr (str): Raw mathematical expression
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        cache (ExpressionCache): Cache to compile through; defaults to the shared cache
+        limits (ResourceLimits): Resource guard settings; None disables the guard
+        precision (int): Significant digits for Decimal arithmetic; None
+            (the default) keeps results exact where possible
+        named (dict): Named memory slots (name -> value) the expression may use
+        
+    Returns:
+        EvaluationResult: The outcome of the evaluation
+    """
+    if not expr:
+        return EvaluationResult(False, "", "No expression to calculate", None)
+    if cache is None:
+        cache = expression_cache
+    if _timings is not None:
+        return _evaluate_timed(expr, angle_mode, ans, memory, cache, limits, precision, named)
+    
+    try:
+        backend = _select_backend(precision)
+        env = _make_env(backend, ans, memory, named)
+        program = cache.get(expr, angle_mode, frozenset(named or ()), backend)
+        value = execute(program, expr, angle_mode, env, limits)
+        return EvaluationResult(True, format_result(value), "", value)
+    except Exception as e:
+        return EvaluationResult(False, "Error", str(e), None, type(e).__name__)
+
+
+def evaluate_many(expressions, *, angle_mode="DEG", ans=0, memory=0, cache=None,
+                  limits=DEFAULT_LIMITS, dedupe_limit=65536, precision=None, named=None):
+    """
+    Evaluate an iterable of expressions lazily.
+    
+    All expressions see the same register values, so identical expressions
+    within a batch are evaluated once and their result is reused. Nothing
+    is logged per item.
+    
+    Args:
+        expressions (iterable): Raw mathematical expressions
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        cache (ExpressionCache): Cache to compile through; defaults to the shared cache
+        limits (ResourceLimits): Resource guard settings; None disables the guard
+        dedupe_limit (int): Maximum number of distinct results remembered at
+            once; the memo is reset when it fills up so memory stays bounded
+        precision (int): Significant digits for Decimal arithmetic; None
+            keeps results exact where possible
+        named (dict): Named memory slots (name -> value) the expressions may use
+        
+    Yields:
+        tuple: (success, result_string, error_message) for each expression
+    
+    Raises:
+        ValueError: If precision is out of range (when iteration starts)
+    """
+    if cache is None:
+        cache = expression_cache
+    get_program = cache.get
+    backend = _select_backend(precision)
+    env = _make_env(backend, ans, memory, named)
+    names = frozenset(named or ())
+    seen = {}
+    
+    for expr in expressions:
+        outcome = seen.get(expr)
+        if outcome is None:
+            if not expr:
+                outcome = (False, "", "No expression to calculate")
+            else:
+                try:
+                    program = get_program(expr, angle_mode, names, backend)
+                    outcome = (True, format_result(execute(program, expr, angle_mode, env, limits)), "")
+                except Exception as e:
+                    outcome = (False, "Error", str(e))
+            if len(seen) >= dedupe_limit:
+                seen.clear()
+            seen[expr] = outcome
+        yield outcome
+
+
+def check_name(name, kind="memory slot"):
+    """
+    Check that a name can be used for a variable or memory slot.
+    
+    Args:
+        name (str): Proposed name
+        kind (str): What the name is for, used in the error message
+        
+    Raises:
+        ValueError: If the name is not made of ASCII letters or clashes
+            with a constant, function or register
+    """
+    if (not name.isascii() or not name.isalpha() or name in CONSTANTS
+            or name in FUNCTIONS or name in TRIG_FUNCTIONS or name in REGISTERS):
+        raise ValueError(f"Invalid {kind} name: {name!r}")
+
+
+def _register_value(value):
+    """
+    Normalize a result before storing it in ANS or memory.
+    
+    Integral floats become ints, matching what the display shows, so
+    ANS-based integer arithmetic (e.g. ANS^100) stays exact.
+    """
+    if type(value) is float and value.is_integer():
+        return int(value)
+    return value
+
+
+def _exact_register(value):
+    """Convert a Decimal register value back to an exact int or Fraction."""
+    return normalize_number(_fraction_type()(value))
+
+
+def parse_number(text):
+    """
+    Convert a formatted number back to an int or float.
+    
+    Args:
+        text (str): A number as produced by format_result()
+        
+    Returns:
+        int | float: The parsed value
+    """
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+#-----------------------------------------------------------------------------
+# Decimal Precision
+#-----------------------------------------------------------------------------
+
+# Largest precision accepted for Decimal mode, in significant digits
+MAX_DECIMAL_DIGITS = 1000
+
+_decimal_backends = {}  # Precision -> Backend, built on first use
+
+
+def get_decimal_backend(precision):
+    """
+    Return the backend that evaluates with Decimals at a given precision.
+    
+    decimal and the kernels in utils.decimal_math are imported on first
+    use. π and e are computed once per precision, and each precision has
+    its own backend name, so compiled expressions are cached per precision.
+    
+    Args:
+        precision (int): Significant digits of results
+        
+    Returns:
+        Backend: Backend whose values are decimal.Decimal
+        
+    Raises:
+        ValueError: If precision is not an int from 1 to MAX_DECIMAL_DIGITS
+    """
+    backend = _decimal_backends.get(precision)
+    if backend is None:
+        if type(precision) is not int or not 1 <= precision <= MAX_DECIMAL_DIGITS:
+            raise ValueError(f"Precision must be 1 to {MAX_DECIMAL_DIGITS} digits")
+        from decimal import Decimal
+        from functools import partial
+        from utils import decimal_math
+        _FORMATTERS[Decimal] = decimal_math.format_decimal
+        _FINITE_CHECKS[Decimal] = Decimal.is_finite
+        _MAGNITUDES[Decimal] = _decimal_magnitude
+        
+        # Intermediate values keep guard digits; the result is rounded at the end
+        working = precision + decimal_math.GUARD_DIGITS
+        pi = decimal_math.pi(working)
+        backend = _decimal_backends[precision] = Backend(
+            f"decimal{precision}",
+            {"π": pi, "pi": pi, "e": decimal_math.e(working)},
+            {
+                "sqrt": partial(decimal_math.sqrt, precision=working),
+                "log": partial(decimal_math.log10, precision=working),
+            },
+            {
+                "sin": partial(decimal_math.sin, precision=working),
+                "cos": partial(decimal_math.cos, precision=working),
+                "tan": partial(decimal_math.tan, precision=working),
+            },
+            partial(decimal_math.radians, precision=working),
+            power=decimal_math.power,
+            arithmetic=decimal_math.DecimalArithmetic(precision),
+        )
+    return backend
+
+
+def _select_backend(precision):
+    """Return the backend for a precision; None selects exact arithmetic."""
+    return EXACT_BACKEND if precision is None else get_decimal_backend(precision)
+
+
+def _make_env(backend, ans, memory, named):
+    """Build the register environment, converting values for the backend."""
+    env = dict(named) if named else {}
+    env["ANS"] = ans
+    env["M"] = memory
+    arithmetic = backend.arithmetic
+    if arithmetic is not None:
+        env = {name: arithmetic.convert(value) for name, value in env.items()}
+    return env
+
+#-----------------------------------------------------------------------------
+# Vectorized Evaluation
+#-----------------------------------------------------------------------------
+
+_numpy_backend = None    # Built on first use; False when NumPy is not installed
+
+
+def get_numpy_backend():
+    """
+    Return the NumPy backend, importing NumPy on first use.
+    
+    Returns:
+        Backend: Backend using NumPy ufuncs, or None if NumPy is not installed
+    """
+    global _numpy_backend
+    if _numpy_backend is None:
+        try:
+            import numpy as np
+        except ImportError:
+            _numpy_backend = False
+        else:
+            _numpy_backend = Backend(
+                "numpy",
+                {"π": np.pi, "pi": np.pi, "e": np.e},
+                {"sqrt": np.sqrt, "log": np.log10},
+                {"sin": np.sin, "cos": np.cos, "tan": np.tan},
+                np.radians,
+            )
+    return _numpy_backend or None
+
+
+def _ieee_divide(a, b):
+    """Divide as NumPy does: by zero gives a signed inf, or nan for 0/0."""
+    try:
+        return exact_divide(a, b)
+    except ZeroDivisionError:
+        if not a or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+# Used by evaluate_array() without NumPy: exact arithmetic, but undefined
+# quotients become values as they would in a NumPy array
+_ELEMENTWISE_BACKEND = Backend("elementwise", CONSTANTS, FUNCTIONS, TRIG_FUNCTIONS, math.radians,
+                               _ieee_divide, exact_power)
+
+
+def evaluate_array(expr, variables, *, angle_mode="DEG", ans=0, memory=0, cache=None,
+                   limits=DEFAULT_LIMITS):
+    """
+    Evaluate one expression over arrays of variable values.
+    
+    The expression is compiled once. With NumPy installed it is built from
+    ufuncs so a single call processes whole arrays; otherwise it falls back
+    to evaluating element by element in pure Python. Undefined elements
+    (division by zero, domain errors) become inf or nan instead of raising.
+    
+    Args:
+        expr (str): Mathematical expression, e.g. "sin(x)^2 + sqrt(x)"
+        variables (dict): Variable name -> sequence (or array) of values
+        angle_mode (str): "DEG" or "RAD"
+        ans (int | float): Value of the ANS register
+        memory (int | float): Value of the M register
+        cache (ExpressionCache): Cache to compile through; defaults to the shared cache
+        limits (ResourceLimits): Bounds integer work on constant parts of the
+            expression (variables are floats); None disables the check
+        
+    Returns:
+        numpy.ndarray | list: Float results, one per element (a list when
+            NumPy is not installed)
+            
+    Raises:
+        ExpressionSyntaxError: If the expression is invalid
+        ValueError: If a variable name clashes with a built-in name, or the
+            value sequences differ in length (pure-Python fallback)
+        TooExpensiveError: If constant parts of the expression are over the limits
+    """
+    if cache is None:
+        cache = expression_cache
+    names = frozenset(variables)
+    for name in names:
+        check_name(name, "variable")
+    
+    backend = get_numpy_backend()
+    if backend is not None:
+        import numpy as np
+        program = cache.get(expr, angle_mode, names, backend)
+        if limits is not None:
+            _check_cost(program, None, limits)
+        env = {name: np.asarray(values, dtype=float) for name, values in variables.items()}
+        shape = np.broadcast_shapes(*(array.shape for array in env.values()))
+        env["ANS"] = ans
+        env["M"] = memory
+        with np.errstate(all="ignore"):
+            result = program(env)
+        return np.broadcast_to(np.asarray(result, dtype=float), shape).copy()
+    
+    # Pure-Python fallback: run the float compilation once per element
+    program = cache.get(expr, angle_mode, names, _ELEMENTWISE_BACKEND)
+    if limits is not None:
+        _check_cost(program, None, limits)
+    keys = list(variables)
+    columns = [list(variables[name]) for name in keys]
+    if len({len(column) for column in columns}) > 1:
+        raise ValueError("Variable value sequences must have the same length")
+    results = []
+    append = results.append
+    env = {"ANS": ans, "M": memory}
+    for row in zip(*columns):
+        # Values are floats, as they would be in a NumPy array
+        env.update(zip(keys, map(float, row)))
+        try:
+            append(float(program(env)))
+        except ZeroDivisionError:
+            # Zero to a negative power
+            append(math.inf)
+        except (ArithmeticError, ValueError, TypeError):
+            append(math.nan)
+    return results
+
+#-----------------------------------------------------------------------------
+# Incremental Parsing
+#-----------------------------------------------------------------------------
+
+# Largest integer (in digits) the live preview will compute; bigger
+# results are left to calculate() and its resource guard
+PREVIEW_MAX_DIGITS = 10_000
+
+# Characters that can extend a number or name still being typed
+_LEXEME_CHARS = frozenset("0123456789.abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+# Operator stack entries: (kind, right binding power, payload)
+_PREFIX = "prefix"
+_INFIX = "infix"
+_OPEN = "open"     # "(" or a function call; reductions stop here
+
+_EXPECT_OPERAND = 1
+_EXPECT_VALUE_OR_OPERATOR = 0
+_EXPECT_PAREN = 2   # After a function name
+
+ParseState = namedtuple("ParseState", ["values", "ops", "expect", "depth", "pending", "error"])
+ParseState.__doc__ = """
+Immutable state of an incremental parse after some prefix of the input.
+
+The value and operator stacks are linked lists of (item, rest) pairs, so
+deriving the next state shares everything below the top and old states
+stay valid when the input is edited back to them.
+
+Fields:
+    values: Stack of operand values
+    ops: Stack of pending operators (kind, right binding, payload)
+    expect (int): Whether an operand, an operator or "(" comes next
+    depth (int): Open parentheses, including function calls
+    pending (str): Trailing characters of a number or name still being typed
+    error (str): Why the prefix cannot be valid, or "" if it can
+"""
+
+
+class IncrementalParser:
+    """
+    Operator-precedence parser that consumes an expression one edit at a time.
+    
+    Each state is derived from the previous one in amortized constant time,
+    applying operators as soon as precedence allows, so states hold values
+    rather than trees. The grammar, binding powers and arithmetic match
+    parse() and the compiler exactly: the live preview shows what
+    calculate() would return.
+    """
+    
+    __slots__ = ("context", "functions", "registers", "names")
+    
+    def __init__(self, angle_mode="DEG", ans=0, memory=0, named=None):
+        """
+        Initialize the parser for one evaluation context.
+        
+        Args:
+            angle_mode (str): "DEG" or "RAD"
+            ans (int | float): Value of the ANS register
+            memory (int | float): Value of the M register
+            named (dict): Named memory slots (name -> value)
+        """
+        named = dict(named or ())
+        self.context = (angle_mode, ans, memory, named)
+        self.names = frozenset(named)
+        self.registers = dict(named, ANS=ans, M=memory)
+        self.functions = dict(FUNCTIONS)
+        for name, func in TRIG_FUNCTIONS.items():
+            self.functions[name] = _degrees(func, math.radians) if angle_mode == "DEG" else func
+    
+    def start(self):
+        """Return the state for empty input."""
+        return ParseState(None, None, _EXPECT_OPERAND, 0, "", "")
+    
+    def advance(self, state, text):
+        """
+        Consume one editing token (a character or a function like "sin(").
+        
+        Args:
+            state (ParseState): State before the token
+            text (str): The token
+            
+        Returns:
+            ParseState: State after the token
+        """
+        if state.error:
+            return state
+        pending = state.pending
+        if pending and self._extends(pending, text):
+            return state._replace(pending=pending + text)
+        try:
+            if pending:
+                state = self._feed_text(state._replace(pending=""), pending)
+            if text in _LEXEME_CHARS or text == "*":
+                return state._replace(pending=text)
+            return self._feed_text(state, text)
+        except (ExpressionSyntaxError, ArithmeticError, ValueError, TypeError) as e:
+            return state._replace(pending="", error=str(e) or type(e).__name__)
+    
+    @staticmethod
+    def _extends(pending, text):
+        """Whether text continues the number, name or ** being typed."""
+        if pending == "*":
+            return text == "*"
+        if text in _LEXEME_CHARS:
+            return pending[0] != "*"
+        # The sign of an exponent, as in 2e-5
+        return text in "+-" and pending[-1] in "eE" and pending[0] in "0123456789."
+    
+    def finish(self, state):
+        """
+        Evaluate the input consumed so far, closing open parentheses.
+        
+        Args:
+            state (ParseState): State after the last token
+            
+        Returns:
+            The value, or None if the input is incomplete or invalid
+        """
+        try:
+            if state.pending:
+                state = self._feed_text(state._replace(pending=""), state.pending)
+            if state.error or state.expect != _EXPECT_VALUE_OR_OPERATOR:
+                return None
+            values, ops = state.values, state.ops
+            while ops is not None:
+                values, ops = self._reduce(values, ops)
+            value = normalize_number(values[0])
+            exactness, digits = _magnitude(value)
+            if exactness:
+                return value if digits <= PREVIEW_MAX_DIGITS else None
+            # Complex, infinite and NaN results are errors for calculate() too
+            return value if type(value) is float and math.isfinite(value) else None
+        except (ExpressionSyntaxError, ArithmeticError, ValueError, TypeError):
+            return None
+    
+    def _feed_text(self, state, text):
+        """Tokenize complete text and feed its tokens."""
+        for token in tokenize(text, self.names):
+            if token.kind == END:
+                break
+            state = self._feed(state, token)
+        return state
+    
+    def _feed(self, state, token):
+        """Consume one lexical token, mirroring Parser.expression()."""
+        values, ops, expect, depth = state.values, state.ops, state.expect, state.depth
+        kind, value = token.kind, token.value
+        
+        if expect == _EXPECT_PAREN:
+            if kind != LPAREN:
+                raise ExpressionSyntaxError(f"Syntax error: expected '(' after {ops[0][2]}")
+            return ParseState(values, ops, _EXPECT_OPERAND, depth + 1, "", "")
+        
+        if expect == _EXPECT_OPERAND:
+            if kind == NUMBER:
+                return ParseState((value, values), ops, _EXPECT_VALUE_OR_OPERATOR, depth, "", "")
+            if kind == NAME:
+                if value in CONSTANTS:
+                    operand = CONSTANTS[value]
+                elif value in self.registers:
+                    operand = self.registers[value]
+                else:
+                    call = (_OPEN, -1, value)
+                    return ParseState(values, (call, ops), _EXPECT_PAREN, depth, "", "")
+                return ParseState((operand, values), ops, _EXPECT_VALUE_OR_OPERATOR, depth, "", "")
+            if kind == LPAREN:
+                return ParseState(values, ((_OPEN, -1, None), ops), expect, depth + 1, "", "")
+            if kind == OPERATOR and value in ("+", "-"):
+                return ParseState(values, ((_PREFIX, PREFIX_BINDING, value), ops), expect, depth, "", "")
+            raise ExpressionSyntaxError(f"Syntax error: unexpected {value!r}")
+        
+        # An operand is complete: an operator or ")" must follow
+        if kind == OPERATOR:
+            binding = PERCENT_BINDING if value == "%" else INFIX_BINDING[value]
+            while ops is not None and ops[0][1] >= binding:
+                values, ops = self._reduce(values, ops)
+            if value == "%":
+                return ParseState((exact_divide(values[0], 100), values[1]), ops, expect, depth, "", "")
+            right_binding = binding - 1 if value == "^" else binding
+            return ParseState(values, ((_INFIX, right_binding, value), ops),
+                              _EXPECT_OPERAND, depth, "", "")
+        if kind == RPAREN:
+            while ops is not None and ops[0][0] != _OPEN:
+                values, ops = self._reduce(values, ops)
+            if ops is None:
+                raise ExpressionSyntaxError("Syntax error: unmatched ')'")
+            values, ops = self._reduce(values, ops)
+            return ParseState(values, ops, expect, depth - 1, "", "")
+        raise ExpressionSyntaxError(f"Syntax error: unexpected {value!r}")
+    
+    def _reduce(self, values, ops):
+        """Apply the operator on top of the stack to the values below it."""
+        (kind, _, payload), ops = ops
+        if kind == _OPEN:
+            if payload is not None:
+                values = (self.functions[payload](values[0]), values[1])
+            return values, ops
+        if kind == _PREFIX:
+            operand = values[0]
+            return (-operand if payload == "-" else +operand, values[1]), ops
+        right, (left, values) = values[0], values[1]
+        if payload == "^":
+            exactness, size = _magnitude(left)
+            if exactness and type(right) is int and size * abs(right) > PREVIEW_MAX_DIGITS:
+                raise TooExpensiveError("preview limit", None, PREVIEW_MAX_DIGITS)
+            # The optimizer turns x^0.5 into sqrt(x), which also takes huge ints
+            result = self.functions["sqrt"](left) if right == 0.5 else exact_power(left, right)
+        else:
+            result = EXACT_BACKEND.operators[payload](left, right)
+        return (result, values), ops
+
+
+#-----------------------------------------------------------------------------
+# Expression Buffer
+#-----------------------------------------------------------------------------
+
+# Function tokens inserted and deleted as single units, e.g. "sin("
+FUNCTION_TOKENS = frozenset(name + "(" for name in (*TRIG_FUNCTIONS, *FUNCTIONS))
+_LONGEST_FUNCTION = max(map(len, FUNCTION_TOKENS))
+
+
+def split_tokens(text):
+    """
+    Split text into editing units: function tokens like "sin(" and single characters.
+    
+    Args:
+        text (str): Text to split
+        
+    Returns:
+        list: The units, which join back to text
+    """
+    units = []
+    i, n = 0, len(text)
+    while i < n:
+        for size in range(min(_LONGEST_FUNCTION, n - i), 1, -1):
+            if text[i:i + size] in FUNCTION_TOKENS:
+                units.append(text[i:i + size])
+                i += size
+                break
+        else:
+            units.append(text[i])
+            i += 1
+    return units
+
+
+class ExpressionBuffer:
+    """
+    Editable expression made of tokens around a cursor.
+    
+    The tokens left of the cursor form a linked list whose head is the token
+    nearest the cursor, and likewise for the tokens to the right. Inserting
+    or deleting at the cursor and moving it by one token are O(1), so
+    editing long expressions never copies them. Nodes are immutable tuples
+    (token, rest, chars, state), where chars counts the characters from that
+    node to the far end of its list, so lengths are known without walking.
+    
+    With a parser attached, each node left of the cursor also records the
+    IncrementalParser state after its token. Typing at the cursor advances
+    the state of the node before it, and backspace simply returns to that
+    node, so nothing is ever re-parsed from the start.
+    
+    The display string is rendered lazily and then kept up to date by each
+    edit at the cursor; tail() and window() render only the part around
+    the cursor.
+    """
+    
+    __slots__ = ("before", "after", "parser", "_text", "allocated")
+    
+    def __init__(self, text="", parser=None):
+        """
+        Initialize the buffer with the cursor at the end of text.
+        
+        Args:
+            text (str): Initial expression
+            parser (IncrementalParser): Parser whose state to track, if any
+        """
+        self.before = None
+        self.after = None
+        self.parser = parser
+        self._text = None if text else ""  # Rendered on first use
+        self.allocated = 0               # Nodes created since take_allocated()
+        if text:
+            self.insert(text)
+    
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Rebuild a buffer from snapshot(), sharing its nodes.
+        
+        Args:
+            snapshot (tuple): Value returned by snapshot()
+            
+        Returns:
+            ExpressionBuffer: A buffer with the captured tokens and cursor
+        """
+        buffer = cls(parser=snapshot[2])
+        buffer.before, buffer.after = snapshot[0], snapshot[1]
+        buffer._text = None
+        return buffer
+    
+    def __len__(self):
+        return self.cursor + (self.after[2] if self.after else 0)
+    
+    def __str__(self):
+        return self.text()
+    
+    @property
+    def cursor(self):
+        """int: Number of characters left of the cursor."""
+        return self.before[2] if self.before else 0
+    
+    @property
+    def at_end(self):
+        """bool: Whether the cursor is after the last token."""
+        return self.after is None
+    
+    @property
+    def state(self):
+        """ParseState: Parser state at the cursor, or None without a parser."""
+        if self.parser is None:
+            return None
+        return self.before[3] if self.before else self.parser.start()
+    
+    @property
+    def depth(self):
+        """int: Parentheses left open before the cursor (0 without a parser)."""
+        return self.before[3].depth if self.before and self.parser else 0
+    
+    def snapshot(self):
+        """
+        Capture the tokens and cursor in O(1).
+        
+        Nodes are never modified, so the snapshot shares them with the
+        buffer and later edits cannot change it.
+        
+        Returns:
+            tuple: (before, after, parser), for from_snapshot()
+        """
+        return self.before, self.after, self.parser
+    
+    def take_allocated(self):
+        """
+        Return the number of nodes created since the last call, and reset it.
+        
+        Returns:
+            int: Nodes created by edits and cursor moves
+        """
+        allocated, self.allocated = self.allocated, 0
+        return allocated
+    
+    def set_parser(self, parser):
+        """
+        Attach a parser, recomputing the states left of the cursor.
+        
+        Needed when the evaluation context (angle mode, ANS, memory)
+        changes; costs O(n) once.
+        
+        Args:
+            parser (IncrementalParser): The new parser, or None
+        """
+        tokens = []
+        node = self.before
+        while node is not None:
+            tokens.append(node[0])
+            node = node[1]
+        self.parser = parser
+        self.before = None
+        text = self._text
+        self._text = None
+        for token in reversed(tokens):
+            self.push(token)
+        self._text = text
+    
+    def preview(self):
+        """
+        Evaluate the whole expression from the state at the cursor.
+        
+        Only the tokens right of the cursor are parsed, so with the cursor
+        at the end this costs about as much as one keystroke.
+        
+        Returns:
+            The value, or None if there is no parser or the expression is
+            incomplete, invalid or too large to preview
+        """
+        parser = self.parser
+        if parser is None:
+            return None
+        state = self.state
+        node = self.after
+        while node is not None:
+            state = parser.advance(state, node[0])
+            node = node[1]
+        return parser.finish(state)
+    
+    #-------------------------------------------------------------------------
+    # Editing
+    #-------------------------------------------------------------------------
+    
+    def push(self, token):
+        """Insert a single token at the cursor."""
+        before = self.before
+        parser = self.parser
+        state = None
+        if parser is not None:
+            state = parser.advance(before[3] if before else parser.start(), token)
+        cursor = before[2] if before else 0
+        self.before = (token, before, len(token) + cursor, state)
+        text = self._text
+        if text is not None:
+            # Splicing the cached rendering copies it once, which is far
+            # cheaper than joining every token again on the next text()
+            self._text = text + token if self.after is None else text[:cursor] + token + text[cursor:]
+        self.allocated += 1
+    
+    def insert(self, text):
+        """
+        Insert text at the cursor, keeping function names as single tokens.
+        
+        A "(" that completes a function name typed letter by letter (s, i,
+        n, then "(") is merged with it, so backspace removes it whole.
+        
+        Args:
+            text (str): Text to insert
+        """
+        for token in split_tokens(text):
+            if token == "(":
+                token = self._merge_function(token)
+            self.push(token)
+    
+    def _merge_function(self, token):
+        """Absorb preceding single letters that spell a function name."""
+        node = self.before
+        for _ in range(_LONGEST_FUNCTION - 1):
+            if node is None or len(node[0]) != 1:
+                break
+            token = node[0] + token
+            node = node[1]
+            if token in FUNCTION_TOKENS:
+                # The letters stay in the rendering; push() adds them back
+                text = self._text
+                if text is not None:
+                    start = node[2] if node else 0
+                    self._text = text[:start] + text[start + len(token) - 1:]
+                self.before = node
+                return token
+        return "("
+    
+    def delete_before(self):
+        """
+        Delete the token left of the cursor (backspace).
+        
+        Returns:
+            str: The deleted token, or "" at the start
+        """
+        if self.before is None:
+            return ""
+        token, self.before = self.before[0], self.before[1]
+        text = self._text
+        if text is not None:
+            cursor = self.cursor
+            self._text = text[:cursor] + text[cursor + len(token):]
+        return token
+    
+    def delete_after(self):
+        """
+        Delete the token right of the cursor (delete).
+        
+        Returns:
+            str: The deleted token, or "" at the end
+        """
+        if self.after is None:
+            return ""
+        token, self.after = self.after[0], self.after[1]
+        text = self._text
+        if text is not None:
+            cursor = self.cursor
+            self._text = text[:cursor] + text[cursor + len(token):]
+        return token
+    
+    def clear(self):
+        """Remove every token."""
+        self.before = self.after = None
+        self._text = ""
+    
+    def move_left(self, count=1):
+        """
+        Move the cursor left by up to count tokens.
+        
+        Returns:
+            int: Number of tokens moved over
+        """
+        moved = 0
+        while moved < count and self.before is not None:
+            token, self.before = self.before[0], self.before[1]
+            after = self.after
+            self.after = (token, after, len(token) + (after[2] if after else 0), None)
+            moved += 1
+        self.allocated += moved
+        return moved
+    
+    def move_right(self, count=1):
+        """
+        Move the cursor right by up to count tokens.
+        
+        Returns:
+            int: Number of tokens moved over
+        """
+        text = self._text
+        self._text = None
+        moved = 0
+        while moved < count and self.after is not None:
+            token, self.after = self.after[0], self.after[1]
+            self.push(token)
+            moved += 1
+        # Moving does not change the text, so the rendering stays valid
+        self._text = text
+        return moved
+    
+    def move_to_start(self):
+        """Move the cursor before the first token."""
+        return self.move_left(len(self))
+    
+    def move_to_end(self):
+        """Move the cursor after the last token."""
+        return self.move_right(len(self))
+    
+    #-------------------------------------------------------------------------
+    # Rendering
+    #-------------------------------------------------------------------------
+    
+    def tokens(self):
+        """
+        List the tokens from left to right.
+        
+        Returns:
+            list: Every token in order
+        """
+        left = []
+        node = self.before
+        while node is not None:
+            left.append(node[0])
+            node = node[1]
+        left.reverse()
+        node = self.after
+        while node is not None:
+            left.append(node[0])
+            node = node[1]
+        return left
+    
+    def text(self):
+        """
+        Render the whole expression.
+        
+        Returns:
+            str: The expression, cached and updated by later edits
+        """
+        if self._text is None:
+            self._text = "".join(self.tokens())
+        return self._text
+    
+    def tail(self, limit):
+        """
+        Render at most limit characters ending at the cursor.
+        
+        Only the tokens needed are visited, so this costs O(limit)
+        however long the expression is.
+        
+        Args:
+            limit (int): Maximum number of characters
+            
+        Returns:
+            str: The text just left of the cursor
+        """
+        parts = []
+        size = 0
+        node = self.before
+        while node is not None and size < limit:
+            parts.append(node[0])
+            size += len(node[0])
+            node = node[1]
+        parts.reverse()
+        text = "".join(parts)
+        return text[-limit:] if size > limit else text
+    
+    def head(self, limit):
+        """
+        Render at most limit characters starting at the cursor.
+        
+        Args:
+            limit (int): Maximum number of characters
+            
+        Returns:
+            str: The text just right of the cursor
+        """
+        parts = []
+        size = 0
+        node = self.after
+        while node is not None and size < limit:
+            parts.append(node[0])
+            size += len(node[0])
+            node = node[1]
+        return "".join(parts)[:limit]
+    
+    def window(self, limit, marker="|"):
+        """
+        Render the part of the expression around the cursor for display.
+        
+        With the cursor at the end this is the last limit characters; otherwise
+        text on both sides of the cursor is shown with marker between them.
+        
+        Args:
+            limit (int): Maximum number of expression characters
+            marker (str): Cursor marker used when the cursor is not at the end
+            
+        Returns:
+            str: Display text
+        """
+        if self.after is None:
+            return self.tail(limit)
+        right = self.head(limit // 2)
+        return self.tail(limit - len(right)) + marker + right
+
+#-----------------------------------------------------------------------------
+# Undo History
+#-----------------------------------------------------------------------------
+
+# Estimated memory used by the undo steps of a calculator, unless it sets its own
+DEFAULT_UNDO_BYTES = 1024 * 1024
+
+# Rough memory cost of one undo step (state tuple and ring slot) and of one
+# expression buffer node (tuple, token and parser state)
+_UNDO_STEP_BYTES = 160
+_UNDO_NODE_BYTES = 200
+
+UndoState = namedtuple(
+    "UndoState", ["expression", "result_value", "ans", "memory", "named", "result_shown"])
+UndoState.__doc__ = """
+Immutable snapshot of the calculator state that undo restores.
+
+Fields:
+    expression: The expression string, or an ExpressionBuffer snapshot
+    result_value: The last result, None if none
+    ans: The ANS register
+    memory: The M register
+    named (dict): Named memory slots, or None; never modified once captured
+    result_shown (bool): Whether the result was on display
+"""
+
+
+def _same_state(a, b):
+    """Tell whether two UndoStates hold the very same objects (O(1), values are not compared)."""
+    x, y = a[0], b[0]
+    if x is not y and (type(x) is not tuple or type(y) is not tuple
+                       or x[0] is not y[0] or x[1] is not y[1] or x[2] is not y[2]):
+        return False
+    return (a[1] is b[1] and a[2] is b[2] and a[3] is b[3] and a[4] is b[4]
+            and a[5] is b[5])
+
+
+class UndoHistory:
+    """
+    Bounded undo and redo stacks of calculator states.
+    
+    States share structure instead of copying it. The expression is
+    captured as the buffer's two linked lists, whose nodes are never
+    modified, and the registers are numbers or dicts that are replaced
+    rather than changed. A step therefore costs a fixed overhead plus the
+    buffer nodes created since the previous step: the size of the change,
+    not of the expression.
+    
+    Undo steps form a ring buffer: once their estimated memory exceeds
+    max_bytes the oldest steps are evicted, so a long session keeps its
+    most recent history in bounded memory.
+    """
+    
+    __slots__ = ("undo_steps", "redo_steps", "max_bytes", "bytes")
+    
+    def __init__(self, max_bytes=DEFAULT_UNDO_BYTES):
+        """
+        Initialize empty stacks.
+        
+        Args:
+            max_bytes (int): Most estimated memory kept in undo and redo steps
+        """
+        self.undo_steps = deque()        # (UndoState, cost), oldest first
+        self.redo_steps = []             # (UndoState, cost), next redo last
+        self.max_bytes = max_bytes
+        self.bytes = 0
+    
+    def __len__(self):
+        return len(self.undo_steps)
+    
+    @property
+    def can_redo(self):
+        """bool: Whether there is an undone step to redo."""
+        return bool(self.redo_steps)
+    
+    @staticmethod
+    def _cost(state, nodes, neighbour):
+        """Estimate the memory a state adds next to the state it is stacked on."""
+        cost = _UNDO_STEP_BYTES + nodes * _UNDO_NODE_BYTES
+        expression = state.expression
+        if type(expression) is str and (neighbour is None or neighbour[0].expression is not expression):
+            cost += sys.getsizeof(expression)
+        return cost
+    
+    def _push(self, steps, state, nodes):
+        """Stack a state on the undo or redo steps."""
+        cost = self._cost(state, nodes, steps[-1] if steps else None)
+        steps.append((state, cost))
+        self.bytes += cost
+    
+    def _evict(self):
+        """Drop the oldest undo steps while over the memory limit."""
+        steps = self.undo_steps
+        while self.bytes > self.max_bytes and len(steps) > 1:
+            self.bytes -= steps.popleft()[1]
+    
+    def record(self, state, nodes=0):
+        """
+        Record the state before a change, and forget the undone steps.
+        
+        A state identical to the last one recorded is skipped, so
+        operations that turn out to change nothing leave no step.
+        
+        Args:
+            state (UndoState): The current state
+            nodes (int): Buffer nodes created since the previous step
+        """
+        steps = self.undo_steps
+        if steps and _same_state(steps[-1][0], state):
+            return
+        if self.redo_steps:
+            for _, cost in self.redo_steps:
+                self.bytes -= cost
+            self.redo_steps.clear()
+        if type(state[0]) is str:
+            cost = self._cost(state, nodes, steps[-1] if steps else None)
+        else:
+            cost = _UNDO_STEP_BYTES + nodes * _UNDO_NODE_BYTES
+        steps.append((state, cost))
+        self.bytes += cost
+        if self.bytes > self.max_bytes:
+            self._evict()
+    
+    def undo(self, current, nodes=0):
+        """
+        Step back, keeping the current state for redo.
+        
+        Args:
+            current (UndoState): The state being left
+            nodes (int): Buffer nodes created since the previous step
+            
+        Returns:
+            UndoState: The state to restore, or None if there is none
+        """
+        return self._step(self.undo_steps, self.redo_steps, current, nodes)
+    
+    def redo(self, current, nodes=0):
+        """
+        Step forward again after undo().
+        
+        Args:
+            current (UndoState): The state being left
+            nodes (int): Buffer nodes created since the previous step
+            
+        Returns:
+            UndoState: The state to restore, or None if there is none
+        """
+        return self._step(self.redo_steps, self.undo_steps, current, nodes)
+    
+    def _step(self, source, target, current, nodes):
+        """Move from the current state to the last one on source."""
+        # Skip states recorded by operations that changed nothing
+        while source and _same_state(source[-1][0], current):
+            self.bytes -= source.pop()[1]
+        if not source:
+            return None
+        state, cost = source.pop()
+        self.bytes -= cost
+        self._push(target, current, nodes)
+        self._evict()
+        return state
+
 
 class Calculator:
     """
@@ -15,27 +2962,173 @@ class Calculator:
     
     This class manages the calculator's state and handles all mathematical
     operations, expression parsing, and result formatting.
+    
+    Instances use __slots__ and keep ANS, memory, the named memory slots
+    and the last result as numbers, so a service can hold hundreds of
+    thousands of them. Expressions refer to registers and slots by name;
+    the string views (last_answer, memory_value, result) are properties.
     """
     
-    def __init__(self):
+    __slots__ = ("expression", "result_value", "ans", "memory", "named", "angle_mode",
+                 "precision", "result_shown", "power_on", "cache", "limits", "history",
+                 "undo_history")
+    
+    # Shared module logger; binds to the logging module only when needed
+    logger = logger
+    
+    # Estimated memory for undo steps; 0 disables undo (service sessions)
+    undo_limit = DEFAULT_UNDO_BYTES
+    
+    def __init__(self, cache=None, limits=DEFAULT_LIMITS, history=None):
         """
         Initialize calculator state and settings.
         
-        Sets up initial values for all calculator properties and configures logging.
+        Sets up initial values for all calculator properties.
+        
+        Args:
+            cache (ExpressionCache): Compiled expression cache to use; defaults
+                to the module-level cache shared by all calculators
+            limits (ResourceLimits): Resource guard applied to calculations,
+                so inputs like 9^9^9 fail fast instead of hanging
+            history (HistoryStore): Where to record each calculation; None
+                keeps no history
         """
-        # Set up logging for this class
-        self.logger = logging.getLogger(__name__)
         self.logger.info("Calculator logic initialized")
         
         # Calculator state variables
-        self.current_expression = ""     # The expression being built
-        self.result = ""                 # The last calculated result
-        self.last_answer = "0"           # Store last calculated value for ANS functionality
-        self.memory_value = "0"          # Memory storage for M+/M- functionality
+        self.expression = ""             # The expression being built (str or ExpressionBuffer)
+        self.result_value = None         # The last calculated result (None if none)
+        self.ans = 0                     # Last calculated value for ANS functionality
+        self.memory = 0                  # Memory storage for M+/M- functionality
+        self.named = None                # Named memory slots (name -> value), made on first store
         self.angle_mode = "DEG"          # Angle mode: DEG (degrees) or RAD (radians)
+        self.precision = None            # Decimal digits, or None for exact arithmetic
         self.result_shown = False        # Flag indicating if result is currently displayed
         self.power_on = False            # Power state of the calculator
         
+        # Compiled expressions, reused when the same expression is evaluated again
+        self.cache = cache if cache is not None else expression_cache
+        self.limits = limits
+        self.history = history
+        self.undo_history = None         # UndoHistory, made on the first change
+        
+    #-------------------------------------------------------------------------
+    # Display Values
+    #-------------------------------------------------------------------------
+    
+    @property
+    def current_expression(self):
+        """str: The expression being built."""
+        expression = self.expression
+        return expression if type(expression) is str else expression.text()
+    
+    @current_expression.setter
+    def current_expression(self, text):
+        # Kept as a plain string until it is edited key by key
+        self.expression = text
+    
+    def editor(self):
+        """
+        Return the expression as an editable buffer, converting it if needed.
+        
+        Expressions assigned as strings (by scripts, the CLI or the service)
+        stay strings; the buffer is only built once keypress editing starts.
+        
+        Returns:
+            ExpressionBuffer: The buffer holding the expression
+        """
+        context = (self.angle_mode, self.ans, self.memory, self.named or {})
+        expression = self.expression
+        if type(expression) is str:
+            expression = self.expression = ExpressionBuffer(expression, IncrementalParser(*context))
+        elif expression.parser.context != context:
+            expression.set_parser(IncrementalParser(*context))
+        return expression
+    
+    def preview(self):
+        """
+        Compute a live preview of the expression being typed.
+        
+        Uses the incremental parse state kept in the expression buffer, so
+        the cost per keystroke does not grow with the expression length.
+        
+        Returns:
+            str: The value calculate() would show, or "" if the expression is
+                incomplete, invalid or too large to preview (or in Decimal
+                mode, which the incremental parser does not compute in)
+        """
+        if (not self.power_on or self.result_shown or type(self.expression) is str
+                or self.precision is not None):
+            return ""
+        value = self.editor().preview()
+        if value is None:
+            return ""
+        return format_result(value)
+    
+    def display_expression(self, limit, marker="|"):
+        """
+        Render the part of the expression around the cursor.
+        
+        Args:
+            limit (int): Maximum number of expression characters
+            marker (str): Cursor marker shown when the cursor is not at the end
+            
+        Returns:
+            str: Display text; its cost depends on limit, not on the expression length
+        """
+        expression = self.expression
+        if type(expression) is str:
+            return expression[-limit:]
+        return expression.window(limit, marker)
+    
+    @property
+    def result(self):
+        """str: The last calculated result as displayed, "" if there is none."""
+        return "" if self.result_value is None else format_result(self.result_value)
+    
+    @result.setter
+    def result(self, text):
+        self.result_value = parse_number(text) if text else None
+    
+    def result_chunks(self, chunk_size=65536):
+        """
+        Yield the last result in full, piece by piece.
+        
+        The display shows huge integers in exponent notation; this renders
+        every digit (for copying or saving) without building one giant
+        string up front through the quadratic str().
+        
+        Args:
+            chunk_size (int): Characters per piece
+            
+        Yields:
+            str: Consecutive pieces of the result; nothing if there is none
+        """
+        value = self.result_value
+        if type(value) is int and value.bit_length() > _FULL_DISPLAY_BITS:
+            from utils.big_integers import LazyInteger
+            yield from LazyInteger(value).chunks(chunk_size)
+        elif value is not None:
+            yield format_result(value)
+    
+    @property
+    def last_answer(self):
+        """str: The ANS register as displayed."""
+        return format_result(self.ans)
+    
+    @last_answer.setter
+    def last_answer(self, text):
+        self.ans = parse_number(text)
+    
+    @property
+    def memory_value(self):
+        """str: The memory register as displayed."""
+        return format_result(self.memory)
+    
+    @memory_value.setter
+    def memory_value(self, text):
+        self.memory = parse_number(text)
+    
     #-------------------------------------------------------------------------
     # Input Handling Methods
     #-------------------------------------------------------------------------
@@ -56,25 +3149,21 @@ class Calculator:
         # Do nothing if calculator is powered off
         if not self.power_on:
             return self.current_expression
+        self.checkpoint()
         
         # Handle special case: when result is shown and user inputs something new
         if self.result_shown:
             # For digits and decimal point, start a new expression
             if text in "0123456789.":
-                self.current_expression = ""
-            # For operators, use the previous result as the first operand
+                self.expression = ""
+            # For operators, continue from the previous result through ANS,
+            # which holds its exact value rather than the rounded display
             else:
-                self.current_expression = self.result
+                self.expression = "ANS"
             self.result_shown = False
         
-        # Handle special mathematical constants
-        if text == "π":
-            self.current_expression += "π"
-        elif text == "e":
-            self.current_expression += "e"
-        else:
-            self.current_expression += text
-            
+        # Constants like π and e are single tokens like any other text
+        self.editor().insert(text)
         return self.current_expression
     
     def insert_function(self, func):
@@ -92,13 +3181,37 @@ class Calculator:
         # Do nothing if calculator is powered off
         if not self.power_on:
             return self.current_expression
+        self.checkpoint()
         
         # Handle special case: when result is shown and user inputs a function
         if self.result_shown:
-            self.current_expression = ""
+            self.expression = ""
             self.result_shown = False
             
-        self.current_expression += func
+        self.editor().insert(func)
+        return self.current_expression
+    
+    def insert_expression(self, text):
+        """
+        Add a whole expression, such as one recalled from the history.
+        
+        Unlike insert_text(), which handles one key at a time, a shown
+        result is always replaced: the recalled expression starts a new
+        calculation rather than continuing from the result.
+        
+        Args:
+            text (str): Expression to insert at the cursor
+            
+        Returns:
+            str: The updated expression
+        """
+        if not self.power_on:
+            return self.current_expression
+        self.checkpoint()
+        if self.result_shown:
+            self.expression = ""
+            self.result_shown = False
+        self.editor().insert(text)
         return self.current_expression
     
     #-------------------------------------------------------------------------
@@ -112,8 +3225,9 @@ class Calculator:
         Returns:
             str: Empty string
         """
-        self.current_expression = ""
-        return self.current_expression
+        self.checkpoint()
+        self.expression = ""
+        return ""
         
     def all_clear(self):
         """
@@ -122,38 +3236,63 @@ class Calculator:
         Returns:
             tuple: (empty expression, "0" result)
         """
-        self.current_expression = ""
-        self.result = ""
-        self.last_answer = "0"
+        self.checkpoint()
+        self.expression = ""
+        self.result_value = None
+        self.ans = 0
         self.result_shown = False
-        return self.current_expression, "0"
+        return "", "0"
         
     def backspace(self):
         """
-        Remove the last character from the expression.
+        Remove the token before the cursor.
         
-        Intelligently handles functions - removes the entire function name
-        rather than just one character.
+        Functions like "sin(" are single tokens, so they are removed whole
+        rather than one character at a time.
         
         Returns:
-            str: Updated expression after removing last character
+            str: The updated expression
         """
+        editor = self.editor()
         # Do nothing if calculator is powered off or showing result
-        if not self.power_on or self.result_shown:
-            return self.current_expression
-            
-        if self.current_expression:
-            # Check for functions to remove them completely
-            functions = ["sin(", "cos(", "tan(", "sqrt(", "log("]
-            for func in functions:
-                if self.current_expression.endswith(func):
-                    self.current_expression = self.current_expression[:-len(func)]
-                    return self.current_expression
+        if self.power_on and not self.result_shown:
+            self.checkpoint()
+            editor.delete_before()
+        return editor.text()
+    
+    def move_cursor(self, steps):
+        """
+        Move the editing cursor by whole tokens.
+        
+        Args:
+            steps (int): Tokens to move; negative moves left
             
-            # Regular backspace - remove last character
-            self.current_expression = self.current_expression[:-1]
+        Returns:
+            int: The cursor position in characters
+        """
+        editor = self.editor()
+        if steps < 0:
+            editor.move_left(-steps)
+        else:
+            editor.move_right(steps)
+        return editor.cursor
+    
+    def move_cursor_to(self, end):
+        """
+        Move the editing cursor to the start or end of the expression.
+        
+        Args:
+            end (bool): True for the end, False for the start
             
-        return self.current_expression
+        Returns:
+            int: The cursor position in characters
+        """
+        editor = self.editor()
+        if end:
+            editor.move_to_end()
+        else:
+            editor.move_to_start()
+        return editor.cursor
     
     def set_angle_mode(self, mode):
         """
@@ -167,9 +3306,45 @@ class Calculator:
         """
         if mode in ["DEG", "RAD"]:
             self.angle_mode = mode
-            self.logger.info(f"Angle mode set to {mode}")
+            self.logger.info("Angle mode set to %s", mode)
         return self.angle_mode
     
+    def set_precision(self, digits):
+        """
+        Switch between exact arithmetic and Decimal mode.
+        
+        ANS and memory (named slots too) are converted so later calculations and memory
+        operations work with one kind of number: to Decimals when entering
+        Decimal mode, back to exact ints and fractions when leaving it.
+        
+        Args:
+            digits (int): Significant digits (1 to MAX_DECIMAL_DIGITS), or
+                None for exact arithmetic
+            
+        Returns:
+            int: The current precision, None in exact mode
+            
+        Raises:
+            ValueError: If digits is out of range
+        """
+        if digits is None:
+            if self.precision is None:
+                return None
+            convert = _exact_register
+        else:
+            convert = get_decimal_backend(digits).arithmetic.convert
+        self.ans = convert(self.ans)
+        self.memory = convert(self.memory)
+        if self.result_value is not None:
+            self.result_value = convert(self.result_value)
+        if self.named:
+            self.named = {name: convert(value) for name, value in self.named.items()}
+        self.precision = digits
+        # Undo steps hold registers of the other kind of number
+        self.undo_history = None
+        self.logger.info("Precision set to %s", digits or "exact")
+        return self.precision
+    
     def toggle_power(self):
         """
         Toggle the calculator's power state.
@@ -180,41 +3355,159 @@ class Calculator:
             bool: The new power state
         """
         self.power_on = not self.power_on
-        self.logger.info(f"Power toggled: {self.power_on}")
+        self.logger.info("Power toggled: %s", self.power_on)
         
         # Clear state when powering off
         if not self.power_on:
-            self.current_expression = ""
-            self.result = ""
+            self.checkpoint()
+            self.expression = ""
+            self.result_value = None
             
         return self.power_on
     
+    #-------------------------------------------------------------------------
+    # Undo and Redo
+    #-------------------------------------------------------------------------
+    
+    def _undo_state(self):
+        """Return (UndoState, buffer nodes created since the last step)."""
+        expression = self.expression
+        nodes = 0
+        if type(expression) is not str:
+            nodes = expression.take_allocated()
+            expression = expression.snapshot()
+        return UndoState(expression, self.result_value, self.ans, self.memory, self.named,
+                         self.result_shown), nodes
+    
+    def _restore(self, state):
+        """Put a captured state back."""
+        expression = state.expression
+        if type(expression) is not str:
+            expression = ExpressionBuffer.from_snapshot(expression)
+        self.expression = expression
+        self.result_value = state.result_value
+        self.ans = state.ans
+        self.memory = state.memory
+        self.named = state.named
+        self.result_shown = state.result_shown
+    
+    def checkpoint(self):
+        """
+        Record the current state as an undo step, before changing it.
+        
+        Every state-changing operation calls this; cursor moves do not,
+        but the cursor position is part of the next step.
+        """
+        if not self.undo_limit:
+            return
+        if self.undo_history is None:
+            self.undo_history = UndoHistory(self.undo_limit)
+        self.undo_history.record(*self._undo_state())
+    
+    def undo(self):
+        """
+        Undo the last change to the expression, result or registers.
+        
+        Returns:
+            bool: True if a change was undone
+        """
+        if self.undo_history is None:
+            return False
+        state = self.undo_history.undo(*self._undo_state())
+        if state is None:
+            return False
+        self._restore(state)
+        return True
+    
+    def redo(self):
+        """
+        Redo the last undone change.
+        
+        Returns:
+            bool: True if a change was redone
+        """
+        if self.undo_history is None:
+            return False
+        state = self.undo_history.redo(*self._undo_state())
+        if state is None:
+            return False
+        self._restore(state)
+        return True
+    
     #-------------------------------------------------------------------------
     # Memory Operations
     #-------------------------------------------------------------------------
     
-    def memory_clear(self):
+    def memory_clear(self, name=None):
         """
-        Clear the memory value.
+        Clear the memory value, or remove a named memory slot.
         
-        Sets memory to "0".
+        Args:
+            name (str): Slot to remove; None sets M to 0
         """
-        self.memory_value = "0"
-        self.logger.info("Memory cleared")
+        self.checkpoint()
+        if name is None:
+            self.memory = 0
+        elif self.named and name in self.named:
+            # Replaced rather than changed, so undo steps can share slot dicts
+            self.named = {key: value for key, value in self.named.items() if key != name}
+        self.logger.info("Memory cleared: %s", name or "M")
         
-    def memory_recall(self):
+    def memory_recall(self, name=None):
         """
-        Recall the memory value and add it to the expression.
+        Add a reference to the memory (or a named slot) to the expression.
         
+        The register's name is inserted rather than its formatted value,
+        so nothing is rounded to the display and no number is re-parsed;
+        the value is read when the expression is evaluated.
+        
+        Args:
+            name (str): Named slot to recall; None recalls M
+            
         Returns:
             str: The updated expression
+            
+        Raises:
+            KeyError: If there is no slot with that name
         """
+        if name is not None and name not in (self.named or ()):
+            raise KeyError(f"No memory slot named {name!r}")
+        self.checkpoint()
         if self.result_shown:
-            self.current_expression = ""
+            self.expression = ""
             self.result_shown = False
             
-        self.current_expression += self.memory_value
+        self.editor().insert(name or "M")
         return self.current_expression
+    
+    def memory_store(self, name):
+        """
+        Store the last result (or ANS when none is shown) in a named slot.
+        
+        Args:
+            name (str): Slot name, letters only, e.g. "rate"
+            
+        Returns:
+            str: The stored value as displayed
+            
+        Raises:
+            ValueError: If the name clashes with a built-in name
+        """
+        check_name(name)
+        value = self.ans if self.result_value is None else self.result_value
+        self.checkpoint()
+        self.named = {**(self.named or {}), name: value}
+        self.logger.info("Stored in %s: %s", name, value)
+        return format_result(value)
+    
+    def memory_slots(self):
+        """
+        Return the named memory slots as displayed.
+        
+        Returns:
+            dict: Slot name -> formatted value, in the order they were stored
+        """
+        return {name: format_result(value) for name, value in (self.named or {}).items()}
         
     def memory_add(self):
         """
@@ -223,14 +3516,10 @@ class Calculator:
         Returns:
             str: The new memory value
         """
-        if self.result:
-            try:
-                memory = float(self.memory_value)
-                current = float(self.result)
-                self.memory_value = str(memory + current)
-                self.logger.info(f"Added to memory: {self.memory_value}")
-            except ValueError:
-                self.logger.error("Memory add failed: invalid values")
+        if self.result_value is not None:
+            self.checkpoint()
+            self._update_memory(self.result_value, subtract=False)
+            self.logger.info("Added to memory: %s", self.memory)
         return self.memory_value
                 
     def memory_subtract(self):
@@ -240,74 +3529,51 @@ class Calculator:
         Returns:
             str: The new memory value
         """
-        if self.result:
-            try:
-                memory = float(self.memory_value)
-                current = float(self.result)
-                self.memory_value = str(memory - current)
-                self.logger.info(f"Subtracted from memory: {self.memory_value}")
-            except ValueError:
-                self.logger.error("Memory subtract failed: invalid values")
+        if self.result_value is not None:
+            self.checkpoint()
+            self._update_memory(self.result_value, subtract=True)
+            self.logger.info("Subtracted from memory: %s", self.memory)
         return self.memory_value
     
+    def _update_memory(self, value, subtract):
+        """Add or subtract a value from memory in the current arithmetic mode."""
+        if self.precision is None:
+            total = self.memory - value if subtract else self.memory + value
+            self.memory = _register_value(total)
+        else:
+            # Round to the precision rather than decimal's default 28 digits
+            context = get_decimal_backend(self.precision).arithmetic.result
+            self.memory = (context.subtract if subtract else context.add)(self.memory, value)
+    
     #-------------------------------------------------------------------------
     # Expression Evaluation Methods
     #-------------------------------------------------------------------------
     
     def prepare_expression(self, expr):
         """
-        Prepare the expression for evaluation by converting mathematical 
-        notation to Python code.
+        Convert an expression to equivalent Python source code.
         
-        Handles conversions like × to *, π to math.pi, etc., and properly
-        formats trigonometric functions based on the current angle mode.
+        The expression is parsed by the expression engine and rendered back
+        as Python (× to *, π to math.pi, trigonometric functions wrapped in
+        math.radians in DEG mode, and so on). calculate() does not use this
+        output; it is kept for debugging and for callers that want to see how
+        an expression is understood.
         
         Args:
             expr (str): Raw mathematical expression
             
         Returns:
-            str: Python-compatible expression ready for evaluation
+            str: Python-compatible expression
         """
-        # Replace mathematical symbols with Python operators
-        expr = expr.replace("×", "*")        # Multiplication symbol
-        expr = expr.replace("÷", "/")        # Division symbol
-        expr = expr.replace("^", "**")       # Exponentiation
-        expr = expr.replace("π", "math.pi")  # Pi constant
-        expr = expr.replace("e", "math.e")   # Euler's number
-        
-        # Handle percentage calculations
-        expr = expr.replace("%", "/100")
-        
-        # Handle trigonometric functions based on angle mode
-        if self.angle_mode == "DEG":
-            # In degrees mode, convert degrees to radians before applying trig functions
-            expr = expr.replace("sin(", "math.sin(math.radians(")
-            expr = expr.replace("cos(", "math.cos(math.radians(")
-            expr = expr.replace("tan(", "math.tan(math.radians(")
-            
-            # Count special function occurrences to add closing parentheses later
-            count_sin = expr.count("math.sin(math.radians(")
-            count_cos = expr.count("math.cos(math.radians(")
-            count_tan = expr.count("math.tan(math.radians(")
-            expr = expr + ")" * (count_sin + count_cos + count_tan)
-        else:
-            # In radians mode, use trig functions directly
-            expr = expr.replace("sin(", "math.sin(")
-            expr = expr.replace("cos(", "math.cos(")
-            expr = expr.replace("tan(", "math.tan(")
-        
-        # Handle other mathematical functions
-        expr = expr.replace("sqrt(", "math.sqrt(")
-        expr = expr.replace("log(", "math.log10(")
-        
-        return expr
+        return _to_python_source(parse(expr, frozenset(self.named or ())), self.angle_mode)
     
     def calculate(self):
         """
         Evaluate the current expression and return the result.
         
-        Handles expression preparation, evaluation, error handling,
-        and result formatting.
+        The expression is compiled by the expression engine and executed
+        directly; input is never passed to eval(). Compiled forms are kept
+        in the expression cache, so repeating a calculation skips parsing.
         
         Returns:
             tuple: (success, result_string, error_message)
@@ -316,36 +3582,121 @@ class Calculator:
         if not self.power_on or not self.current_expression:
             return False, "", "No expression to calculate"
         
-        try:
-            # Prepare the expression for evaluation
-            expr = self.prepare_expression(self.current_expression)
-            
-            # Add proper closing parentheses if needed
-            open_parens = expr.count("(")
-            close_parens = expr.count(")")
-            if open_parens > close_parens:
-                expr += ")" * (open_parens - close_parens)
-            
-            # Evaluate the expression using Python's eval function
-            self.logger.debug(f"Evaluating: {expr}")
-            result = eval(expr)
-            
-            # Format the result
-            if isinstance(result, int) or result == int(result):
-                # For integers or values that are effectively integers
-                formatted_result = str(int(result))
-            else:
-                # For floating point values, limit decimal places
-                formatted_result = f"{result:.10g}"
+        self.logger.debug("Evaluating: %s", self.current_expression)
+        started = time.perf_counter()
+        outcome = evaluate(
+            self.current_expression,
+            angle_mode=self.angle_mode,
+            ans=self.ans,
+            memory=self.memory,
+            cache=self.cache,
+            limits=self.limits,
+            precision=self.precision,
+            named=self.named,
+        )
+        return self.apply_result(outcome, time.perf_counter() - started)
+    
+    def calculate_async(self, executor):
+        """
+        Start evaluating the current expression on an executor.
+        
+        The calculator's inputs are captured now and evaluation runs on the
+        executor without touching calculator state; pass the finished
+        EvaluationResult to apply_result() from the owning thread.
+        
+        Args:
+            executor (concurrent.futures.Executor): Where to run the evaluation
             
-            # Update calculator state
-            self.result = formatted_result
-            self.last_answer = formatted_result
-            self.result_shown = True
+        Returns:
+            Future: Resolves to an EvaluationResult, or None if there is
+                nothing to calculate
+        """
+        if not self.power_on or not self.current_expression:
+            return None
+        
+        self.logger.debug("Evaluating in background: %s", self.current_expression)
+        return executor.submit(
+            evaluate,
+            self.current_expression,
+            angle_mode=self.angle_mode,
+            ans=self.ans,
+            memory=self.memory,
+            cache=self.cache,
+            limits=self.limits,
+            precision=self.precision,
+            named=dict(self.named) if self.named else None,
+        )
+    
+    def evaluate_many(self, expressions, angle_mode=None):
+        """
+        Evaluate many expressions without changing calculator state.
+        
+        Uses the calculator's angle mode, precision, ANS and memory values, but unlike
+        calculate() it does not require power, update the result or log
+        each item.
+        
+        Args:
+            expressions (iterable): Raw mathematical expressions
+            angle_mode (str): "DEG" or "RAD"; defaults to the current mode
             
-            return True, formatted_result, ""
+        Returns:
+            generator: Yields (success, result_string, error_message) per expression
+        """
+        return evaluate_many(
+            expressions,
+            angle_mode=angle_mode or self.angle_mode,
+            ans=self.ans,
+            memory=self.memory,
+            cache=self.cache,
+            limits=self.limits,
+            precision=self.precision,
+            named=self.named,
+        )
+    
+    def stats(self):
+        """
+        Report evaluation performance.
+        
+        Phase timings are process-wide, like the shared expression cache;
+        they are only recorded while enable_timing() is in effect.
+        
+        Returns:
+            dict: {"phases": timing_stats() (None while timing is disabled),
+                "cache": the expression cache's stats()}
+        """
+        return {"phases": timing_stats(), "cache": self.cache.stats()}
+    
+    def apply_result(self, outcome, latency=0.0):
+        """
+        Update calculator state from an evaluation result.
+        
+        The calculation is also recorded in the history, if there is one;
+        recording only queues the entry, so it never waits for the disk.
+        
+        Args:
+            outcome (EvaluationResult): Result returned by evaluate()
+            latency (float): Seconds the evaluation took, for the history
             
-        except Exception as e:
+        Returns:
+            tuple: (success, result_string, error_message)
+        """
+        if self.history is not None:
+            self.history.record_outcome(self.current_expression, outcome, self.angle_mode, latency)
+        if outcome.success:
+            # Update calculator state
+            self.checkpoint()
+            self.result_value = self.ans = _register_value(outcome.value)
+            self.result_shown = True
+        else:
             # Handle any errors during evaluation
-            self.logger.error(f"Calculation error: {e}")
-            return False, "Error", str(e)
\ No newline at end of file
+            self.logger.error("Calculation error: %s", outcome.error)
+        return outcome.success, outcome.formatted, outcome.error
+
+
+# Running the core module directly starts the headless command line interface
+if __name__ == "__main__":
+    # Register this module under its real name so cli reuses it instead of
+    # importing (and compiling) the whole file a second time
+    sys.modules.setdefault("calculator", sys.modules[__name__])
+    from cli import main
+    sys.exit(main())
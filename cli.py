@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Game-Style Calculator - Command Line Interface
+Headless entry point for scripted use. It never imports tkinter, so it runs
+in containers without a display server.
+
+Usage:
+    python -m cli "2+3×4"             Evaluate one expression
+    python -m cli                     Interactive REPL (stdin is a terminal)
+    python -m cli < expressions.txt   Evaluate one expression per input line
+    python -m cli --rad "sin(π/2)"    Use radians instead of degrees
+    python -m cli --digits 50 "1/3"   Decimal arithmetic to 50 significant digits
+
+Besides expressions, the REPL and stdin modes accept the calculator's
+button commands: DEG, RAD, AC, MC, MR, M+ and M-, plus "STO name", which
+stores the last result in a named memory slot that later expressions can
+use by name.
+"""
+
+# Standard library imports
+import sys
+
+# Local application imports
+from calculator import MAX_DECIMAL_DIGITS, Calculator, parse_number
+
+USAGE = """usage: python -m cli [--deg | --rad] [--digits N] [--ans VALUE] [--memory VALUE] [-v]
+                     [EXPRESSION]
+
+Evaluate EXPRESSION, or read expressions from stdin (one per line), or start
+a REPL when stdin is a terminal.
+
+options:
+  --deg           trigonometric functions take degrees (default)
+  --rad           trigonometric functions take radians
+  --digits N      compute with N significant decimal digits (default: exact)
+  --ans VALUE     initial value of ANS
+  --memory VALUE  initial value of the memory register M
+  -v, --verbose   show calculator log messages on stderr
+  -h, --help      show this help and exit
+"""
+
+PROMPT = "calc> "
+
+#-----------------------------------------------------------------------------
+# Argument Handling
+#-----------------------------------------------------------------------------
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+
+    A small hand-written parser keeps start-up fast (argparse costs several
+    milliseconds to import).
+
+    Args:
+        argv (list): Arguments without the program name
+
+    Returns:
+        dict: Parsed options (angle_mode, digits, ans, memory, verbose,
+            expression, help)
+
+    Raises:
+        ValueError: On unknown options or missing/invalid option values
+    """
+    options = {
+        "angle_mode": "DEG",
+        "digits": None,
+        "ans": "0",
+        "memory": "0",
+        "verbose": False,
+        "expression": None,
+        "help": False,
+    }
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg in ("-h", "--help"):
+            options["help"] = True
+        elif arg == "--deg":
+            options["angle_mode"] = "DEG"
+        elif arg == "--rad":
+            options["angle_mode"] = "RAD"
+        elif arg in ("-v", "--verbose"):
+            options["verbose"] = True
+        elif arg == "--digits":
+            if not args:
+                raise ValueError(f"{arg} needs a value")
+            value = args.pop(0)
+            if not value.isdigit() or not 1 <= int(value) <= MAX_DECIMAL_DIGITS:
+                raise ValueError(f"{arg} must be 1 to {MAX_DECIMAL_DIGITS}")
+            options["digits"] = int(value)
+        elif arg in ("--ans", "--memory"):
+            if not args:
+                raise ValueError(f"{arg} needs a value")
+            value = args.pop(0)
+            parse_number(value)  # Validate now rather than on first use
+            options[arg[2:]] = value
+        elif arg == "--":
+            if args:
+                options["expression"] = " ".join(args)
+            break
+        elif arg.startswith("--") or (arg.startswith("-") and arg[1:].isalpha()):
+            raise ValueError(f"unknown option: {arg}")
+        else:
+            # Anything else (including negative numbers like -5+3) is the expression
+            options["expression"] = " ".join([arg] + args)
+            break
+    return options
+
+
+def make_calculator(options):
+    """
+    Create a powered-on calculator configured from the options.
+
+    Args:
+        options (dict): Result of parse_args()
+
+    Returns:
+        Calculator: Ready-to-use calculator
+    """
+    calculator = Calculator()
+    calculator.logger.disabled = not options["verbose"]
+    calculator.power_on = True
+    calculator.set_angle_mode(options["angle_mode"])
+    calculator.last_answer = options["ans"]
+    calculator.memory_value = options["memory"]
+    if options["digits"] is not None:
+        calculator.set_precision(options["digits"])
+    return calculator
+
+#-----------------------------------------------------------------------------
+# Evaluation
+#-----------------------------------------------------------------------------
+
+def run_line(calculator, line):
+    """
+    Handle one line of input: a button command or an expression.
+
+    Args:
+        calculator (Calculator): Calculator holding the session state
+        line (str): Input line without its newline
+
+    Returns:
+        tuple: (success, output text)
+    """
+    command = line.strip()
+    upper = command.upper()
+
+    if upper in ("DEG", "RAD"):
+        return True, calculator.set_angle_mode(upper)
+    if upper == "AC":
+        calculator.all_clear()
+        return True, "0"
+    if upper == "MC":
+        calculator.memory_clear()
+        return True, calculator.memory_value
+    if upper == "MR":
+        return True, calculator.memory_value
+    if upper == "M+":
+        return True, calculator.memory_add()
+    if upper == "M-":
+        return True, calculator.memory_subtract()
+    if upper.startswith("STO "):
+        try:
+            return True, calculator.memory_store(command[4:].strip())
+        except ValueError as e:
+            return False, f"Error: {e}"
+
+    calculator.current_expression = command
+    success, result, error = calculator.calculate()
+    # Each line is a fresh expression, never a continuation of the last result
+    calculator.result_shown = False
+    if success:
+        return True, result
+    return False, f"Error: {error}"
+
+
+def run_stream(calculator, stdin, stdout):
+    """
+    Evaluate every line of a stream, writing one output line per input line.
+
+    Blank input lines produce blank output lines so results stay aligned
+    with their inputs.
+
+    Args:
+        calculator (Calculator): Calculator holding the session state
+        stdin: Text stream to read
+        stdout: Text stream to write
+
+    Returns:
+        int: Exit code, 1 if any line failed
+    """
+    write = stdout.write
+    exit_code = 0
+    for line in stdin:
+        if not line.strip():
+            write("\n")
+            continue
+        success, output = run_line(calculator, line)
+        if not success:
+            exit_code = 1
+        write(output + "\n")
+    stdout.flush()
+    return exit_code
+
+
+def run_repl(calculator, stdin, stdout):
+    """
+    Run an interactive read-eval-print loop until EOF or "exit".
+
+    Args:
+        calculator (Calculator): Calculator holding the session state
+        stdin: Text stream to read
+        stdout: Text stream to write
+
+    Returns:
+        int: Exit code (always 0)
+    """
+    stdout.write(f"Game Calc - {calculator.angle_mode} mode. Type 'exit' to quit.\n")
+    while True:
+        stdout.write(PROMPT)
+        stdout.flush()
+        line = stdin.readline()
+        if not line:
+            stdout.write("\n")
+            break
+        if line.strip().lower() in ("exit", "quit"):
+            break
+        if line.strip():
+            stdout.write(run_line(calculator, line)[1] + "\n")
+    stdout.flush()
+    return 0
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    """
+    Run the command line interface.
+
+    Args:
+        argv (list): Arguments without the program name; defaults to sys.argv[1:]
+        stdin, stdout, stderr: Streams to use; default to the sys streams
+
+    Returns:
+        int: Process exit code (0 success, 1 calculation error, 2 usage error)
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    try:
+        options = parse_args(argv)
+    except ValueError as e:
+        stderr.write(f"{USAGE}\nerror: {e}\n")
+        return 2
+    if options["help"]:
+        stdout.write(USAGE)
+        return 0
+
+    calculator = make_calculator(options)
+
+    if options["expression"] is not None:
+        success, output = run_line(calculator, options["expression"])
+        (stdout if success else stderr).write(output + "\n")
+        return 0 if success else 1
+
+    if stdin.isatty():
+        return run_repl(calculator, stdin, stdout)
+    return run_stream(calculator, stdin, stdout)
+
+
+# Standard Python idiom to only run the main function when executed as a script
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+Game-Style Calculator - History Module
+This module keeps every calculation in a searchable SQLite database
+"""
+
+# Import history classes for easy access
+from .store import HistoryEntry, HistoryStore, default_history_path, numeric_value
@@ -0,0 +1,428 @@
+"""
+Game-Style Calculator - History Store
+Keeps every calculation in an SQLite database and searches it by time,
+expression prefix and numeric result.
+
+Recording never waits for the disk: record() only puts a row on a queue.
+A writer thread with its own connection takes whatever rows have piled up
+and inserts them in one transaction, so under load the batches grow and
+the cost per row falls. The database is in WAL mode, so searches on the
+reading connection run while the writer commits.
+"""
+
+# Standard library imports
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# Most rows inserted in one transaction, and the longest a row waits for
+# others to share its transaction
+DEFAULT_BATCH_SIZE = 4096
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Rows returned by a search unless asked otherwise
+DEFAULT_SEARCH_LIMIT = 100
+
+HistoryEntry = namedtuple(
+    "HistoryEntry",
+    ["id", "timestamp", "expression", "result", "value", "angle_mode", "latency", "success"])
+HistoryEntry.__doc__ = """
+One recorded calculation.
+
+Fields:
+    id (int): Position in the history, counting from 1
+    timestamp (float): When it was calculated, in seconds since the epoch
+    expression (str): The expression as entered
+    result (str): Display text of the result, or the error message
+    value (float): Numeric result, None for errors
+    angle_mode (str): "DEG" or "RAD"
+    latency (float): Seconds the calculation took
+    success (bool): Whether the calculation succeeded
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    value REAL,
+    angle_mode TEXT NOT NULL,
+    latency REAL NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS history_expression ON history (expression);
+CREATE INDEX IF NOT EXISTS history_value ON history (value);
+CREATE INDEX IF NOT EXISTS history_day_value ON history (CAST(timestamp / 86400 AS INTEGER), value);
+"""
+
+# Value ranges within a time range seek the (day, value) index once per day
+# of the range; longer ranges use the value index alone
+_DAY = 86400
+_DAY_EXPRESSION = "CAST(timestamp / 86400 AS INTEGER)"
+_MAX_DAY_SEEKS = 1000
+
+_INSERT = ("INSERT INTO history (timestamp, expression, result, value, angle_mode, latency, success) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+_COLUMNS = "id, timestamp, expression, result, value, angle_mode, latency, success"
+
+# Queue item that stops the writer thread
+_STOP = object()
+
+#-----------------------------------------------------------------------------
+# Helpers
+#-----------------------------------------------------------------------------
+
+def default_history_path():
+    """
+    Return where the application keeps its history database.
+
+    Returns:
+        str: Path under the user's home directory
+    """
+    return os.path.join(os.path.expanduser("~"), ".calc_arcade", "history.db")
+
+
+def numeric_value(value):
+    """
+    Convert a result to the float stored for range searches.
+
+    Results too large for a float are stored as ±inf, so they still sort
+    above every finite value; results without a numeric value give None.
+
+    Args:
+        value: Result number (int, float, Fraction, Decimal) or None
+
+    Returns:
+        float: The value, or None
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+    except (TypeError, ValueError):
+        return None
+
+
+def _prefix_upper_bound(prefix):
+    """Return the smallest string greater than every string starting with prefix."""
+    # Strings with the prefix sort in [prefix, prefix + U+10FFFF), which
+    # lets the expression index answer prefix searches (LIKE cannot use it
+    # without case-sensitive LIKE)
+    return prefix + "\U0010ffff"
+
+
+def _connect(path):
+    """Open a connection to the history database in WAL mode."""
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL still survives application crashes; only a power
+    # failure can lose the last transactions
+    connection.execute("PRAGMA synchronous=NORMAL")
+    # 64 MiB of page cache keeps the index pages hot as the history grows
+    connection.execute("PRAGMA cache_size=-65536")
+    return connection
+
+#-----------------------------------------------------------------------------
+# History Store
+#-----------------------------------------------------------------------------
+
+class HistoryStore:
+    """
+    Persistent, searchable log of calculations.
+
+    Writes are asynchronous and batched; reads go through a separate
+    connection and see every row flushed so far. Timestamps, expressions
+    and numeric results are indexed, so searches over millions of rows
+    touch only the rows they return.
+
+    The store is safe to use from several threads. Call close() on exit to
+    write the rows still queued.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 clock=time.time):
+        """
+        Open (or create) a history database.
+
+        Args:
+            path (str): Database file; its directory is created if needed
+            batch_size (int): Most rows inserted in one transaction
+            flush_interval (float): Most seconds a row waits to be batched
+            clock (callable): Time source for timestamps, replaceable in tests
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+
+        self._reader = _connect(path)
+        self._reader.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+        # Ids start again from 1 after clear(), so readers that remember
+        # ids compare this count of clears to tell
+        self.generation = 0
+
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._closed = False
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    #-------------------------------------------------------------------------
+    # Writing
+    #-------------------------------------------------------------------------
+
+    def record(self, expression, result, value=None, angle_mode="DEG", latency=0.0,
+               success=True, timestamp=None):
+        """
+        Queue a calculation for writing; returns immediately.
+
+        Args:
+            expression (str): The expression as entered
+            result (str): Display text of the result, or the error message
+            value: Numeric result (any number type), None for errors
+            angle_mode (str): "DEG" or "RAD"
+            latency (float): Seconds the calculation took
+            success (bool): Whether the calculation succeeded
+            timestamp (float): Seconds since the epoch; defaults to now
+
+        Raises:
+            RuntimeError: If the store is closed
+        """
+        if self._closed:
+            raise RuntimeError("history store is closed")
+        if timestamp is None:
+            timestamp = self.clock()
+        self._queue.put((timestamp, expression, result, numeric_value(value),
+                         angle_mode, latency, int(success)))
+
+    def record_outcome(self, expression, outcome, angle_mode="DEG", latency=0.0):
+        """
+        Queue the outcome of a calculation for writing.
+
+        Args:
+            expression (str): The expression as entered
+            outcome (EvaluationResult): Result returned by evaluate()
+            angle_mode (str): "DEG" or "RAD"
+            latency (float): Seconds the calculation took
+        """
+        if outcome.success:
+            self.record(expression, outcome.formatted, outcome.value, angle_mode, latency)
+        else:
+            self.record(expression, outcome.error, None, angle_mode, latency, success=False)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every row queued so far is committed.
+
+        Args:
+            timeout (float): Most seconds to wait; None waits as long as needed
+
+        Returns:
+            bool: True if the rows were committed in time
+        """
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Write the queued rows and close the database. Safe to call twice."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        with self._read_lock:
+            try:
+                # Keeps the planner's statistics current for range searches
+                self._reader.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            self._reader.close()
+
+    def _write_loop(self):
+        """Writer thread: insert queued rows in batches until stopped."""
+        connection = _connect(self.path)
+        get = self._queue.get
+        batch_size = self.batch_size
+        running = True
+        while running:
+            # Block for the first item, then gather rows until the batch is
+            # full or the interval is over; flush() and close() end a batch
+            rows = []
+            events = []
+            item = get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    running = False
+                    break
+                if type(item) is not tuple:
+                    events.append(item)
+                    break
+                rows.append(item)
+                if len(rows) >= batch_size:
+                    break
+                try:
+                    item = get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    with connection:
+                        connection.execute("BEGIN")
+                        connection.executemany(_INSERT, rows)
+                except sqlite3.Error:
+                    # History is best effort; a full disk must not stop the app
+                    pass
+            for event in events:
+                event.set()
+        connection.close()
+
+    #-------------------------------------------------------------------------
+    # Reading
+    #-------------------------------------------------------------------------
+
+    def _query(self, sql, parameters=()):
+        """Run a query on the reading connection and return all rows."""
+        with self._read_lock:
+            return self._reader.execute(sql, parameters).fetchall()
+
+    def count(self):
+        """
+        Return the number of rows committed.
+
+        Rows are only ever appended (or all cleared), so ids are contiguous
+        and the count comes from the primary key in O(log n) rather than a
+        full scan.
+
+        Returns:
+            int: Number of recorded calculations
+        """
+        low, high = self._query("SELECT min(id), max(id) FROM history")[0]
+        return 0 if high is None else high - low + 1
+
+    def last_id(self):
+        """
+        Return the id of the newest committed row.
+
+        Returns:
+            int: The id, or 0 for an empty history
+        """
+        return self._query("SELECT max(id) FROM history")[0][0] or 0
+
+    def entries(self, first_id, last_id):
+        """
+        Return the rows with ids in a range, oldest first.
+
+        This is a primary key range read, so any page of the history costs
+        the same however long the history is.
+
+        Args:
+            first_id (int): Lowest id, inclusive
+            last_id (int): Highest id, inclusive
+
+        Returns:
+            list: HistoryEntry tuples
+        """
+        rows = self._query(f"SELECT {_COLUMNS} FROM history WHERE id BETWEEN ? AND ? ORDER BY id",
+                           (first_id, last_id))
+        return [HistoryEntry(*row[:7], bool(row[7])) for row in rows]
+
+    def search(self, prefix=None, min_value=None, max_value=None, since=None, until=None,
+               limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Find calculations, newest first.
+
+        Every criterion is optional and they combine with AND. Only
+        successful calculations have a value, so a value range excludes
+        errors.
+
+        A value range alone, or a time range alone, is one index range
+        scan. Together they would scan every row matching either range, so
+        instead the (day, value) index is sought once per day of the time
+        range: a value range over the last week reads only the rows it
+        returns, however long the history is.
+
+        Args:
+            prefix (str): Expressions starting with this text
+            min_value (float): Smallest numeric result, inclusive
+            max_value (float): Largest numeric result, inclusive
+            since (float): Earliest timestamp, inclusive
+            until (float): Latest timestamp, exclusive
+            limit (int): Most entries returned; None for all
+
+        Returns:
+            list: HistoryEntry tuples
+        """
+        clauses = []
+        parameters = []
+        if prefix:
+            clauses.append("expression >= ? AND expression < ?")
+            parameters += [prefix, _prefix_upper_bound(prefix)]
+        has_value_range = min_value is not None or max_value is not None
+        if has_value_range and since is not None:
+            end = until if until is not None else self.clock()
+            # One extra day covers clock adjustments since the rows were written
+            days = range(int(since // _DAY), int(end // _DAY) + 2)
+            if len(days) <= _MAX_DAY_SEEKS:
+                clauses.append(f"{_DAY_EXPRESSION} IN ({', '.join('?' * len(days))})")
+                parameters += days
+        if min_value is not None:
+            clauses.append("value >= ?")
+            parameters.append(min_value)
+        if max_value is not None:
+            clauses.append("value <= ?")
+            parameters.append(max_value)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            parameters.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            parameters.append(until)
+
+        sql = f"SELECT {_COLUMNS} FROM history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return [HistoryEntry(*row[:7], bool(row[7])) for row in self._query(sql, parameters)]
+
+    def recent(self, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Return the latest calculations, newest first.
+
+        Args:
+            limit (int): Most entries returned
+
+        Returns:
+            list: HistoryEntry tuples
+        """
+        return self.search(limit=limit)
+
+    def clear(self):
+        """Delete every recorded calculation, including rows still queued."""
+        self.flush()
+        with self._read_lock:
+            self._reader.execute("DELETE FROM history")
+            self.generation += 1
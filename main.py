@@ -11,6 +11,7 @@ import logging        # For application logging
 
 # Local application imports
 from calculator import Calculator  # Import the calculator logic module
+from history import HistoryStore, default_history_path  # Import the calculation history store
 from ui import CalculatorUI        # Import the user interface module
 
 def setup_logging():
@@ -36,6 +37,27 @@ def setup_logging():
     
     return logger
 
+def open_history(logger):
+    """
+    Open the calculation history database.
+    
+    History is a convenience, so a database that cannot be opened (a
+    read-only home directory, a corrupt file) is logged and the calculator
+    runs without it.
+    
+    Args:
+        logger: Logger for reporting a failure
+        
+    Returns:
+        HistoryStore: The open store, or None
+    """
+    path = default_history_path()
+    try:
+        return HistoryStore(path)
+    except Exception as e:
+        logger.warning("History disabled, cannot open %s: %s", path, e)
+        return None
+
 def main():
     """
     Main function to run the calculator application.
@@ -50,9 +72,12 @@ def main():
     root = tk.Tk()
     root.title("Game-Style Calculator")  # Set the window title
     
+    # Open the history database every calculation is recorded in
+    history = open_history(logger)
+    
     # Create calculator logic instance
     # This handles all mathematical operations and calculator state
-    calculator = Calculator()
+    calculator = Calculator(history=history)
     
     # Create UI with the calculator logic
     # This builds the arcade-style interface and connects it to the calculator logic
@@ -63,6 +88,9 @@ def main():
     root.mainloop()  # This will block until the window is closed
     
     # This code will execute when the window is closed
+    # Write the calculations still queued for the history
+    if history is not None:
+        history.close()
     logger.info("Application closed")
 
 # Standard Python idiom to only run the main function when executed as a script
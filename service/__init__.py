@@ -0,0 +1,8 @@
+"""
+Game-Style Calculator - Service Module
+This module serves calculations to other programs over a local socket or HTTP
+"""
+
+# Import service classes for easy access
+from .server import CalculatorService
+from .sessions import SessionCalculator, SessionStore
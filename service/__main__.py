@@ -0,0 +1,76 @@
+"""
+Game-Style Calculator - Service Command Line
+Runs the calculation service until interrupted.
+
+Usage:
+    python -m service                      Listen on 127.0.0.1:8765
+    python -m service --port 9000 -j 4     Other port, four pool workers
+    python -m service --unix /tmp/calc.sock
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import sys
+
+# Local application imports
+from calculator import logger
+from service.server import CalculatorService
+from service.sessions import DEFAULT_MAX_SESSIONS, DEFAULT_SESSION_TTL
+
+
+def build_parser():
+    """
+    Build the argument parser for the service command.
+    
+    Returns:
+        argparse.ArgumentParser: The configured parser
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m service", description="Serve calculations over TCP/HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765)")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes for heavy expressions (default: one per CPU)")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS,
+                        help="sessions kept before the least recently used is evicted")
+    parser.add_argument("--session-ttl", type=float, default=DEFAULT_SESSION_TTL,
+                        help="seconds before an idle session is dropped")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log calculator messages")
+    return parser
+
+
+async def serve(args):
+    """Start the service and run until cancelled."""
+    service = CalculatorService(workers=args.workers, max_sessions=args.max_sessions,
+                                session_ttl=args.session_ttl)
+    server = await service.start(args.host, args.port, args.unix)
+    sys.stderr.write(f"Calculation service listening on {service.address(server)}\n")
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    """
+    Run the service command.
+    
+    Args:
+        argv (list): Arguments without the program name; defaults to sys.argv[1:]
+        
+    Returns:
+        int: Process exit code
+    """
+    args = build_parser().parse_args(argv)
+    logger.disabled = not args.verbose
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Game-Style Calculator - Service Load Generator
+Measures throughput and latency percentiles of a running calculation
+service over the line protocol.
+
+Usage:
+    python -m service.loadgen --port 8765 --connections 8 --requests 20000 --pipeline 32
+
+Each connection keeps up to --pipeline requests in flight. Latency is
+measured per request, from sending its line to reading its response.
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import namedtuple
+
+# Expressions cycled through by the generator
+DEFAULT_EXPRESSIONS = ("1+2×3", "sin(30)+cos(60)", "ANS+1", "(4+5)×(6-7)÷8", "2^64", "sqrt(2)")
+
+
+LoadReport = namedtuple("LoadReport", ["requests", "errors", "seconds", "latencies"])
+LoadReport.__doc__ = """
+Outcome of a load run.
+
+Fields:
+    requests (int): Requests answered
+    errors (int): Responses with "ok": false
+    seconds (float): Wall-clock duration of the run
+    latencies (list): Sorted per-request latencies in seconds
+"""
+
+
+def percentile(sorted_values, fraction):
+    """
+    Return a percentile of already sorted values (nearest-rank).
+    
+    Args:
+        sorted_values (list): Values in ascending order
+        fraction (float): Percentile as a fraction, e.g. 0.99
+        
+    Returns:
+        float: The percentile, or 0.0 for no values
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def format_report(report):
+    """
+    Describe a load run in a few lines.
+    
+    Returns:
+        str: Throughput and latency percentiles in milliseconds
+    """
+    values = report.latencies
+    millis = [percentile(values, p) * 1000 for p in (0.5, 0.9, 0.99, 0.999)]
+    throughput = report.requests / report.seconds if report.seconds else 0.0
+    return (f"{report.requests:,} requests ({report.errors:,} errors) in {report.seconds:.2f} s: "
+            f"{throughput:,.0f} req/sec\n"
+            f"latency ms  p50 {millis[0]:.3f}  p90 {millis[1]:.3f}  p99 {millis[2]:.3f}  "
+            f"p99.9 {millis[3]:.3f}  max {(values[-1] if values else 0.0) * 1000:.3f}")
+
+
+async def _run_connection(host, port, path, count, pipeline, expressions, offset):
+    """Send `count` requests over one connection; return (latencies, errors)."""
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    errors = 0
+    sent_at = {}
+    in_flight = asyncio.Semaphore(pipeline)
+    
+    async def send():
+        for request_id in range(count):
+            await in_flight.acquire()
+            expression = expressions[(offset + request_id) % len(expressions)]
+            line = json.dumps({"id": request_id, "expression": expression}) + "\n"
+            sent_at[request_id] = time.perf_counter()
+            writer.write(line.encode("utf-8"))
+            await writer.drain()
+    
+    sender = asyncio.ensure_future(send())
+    try:
+        for _ in range(count):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+            if not response["ok"]:
+                errors += 1
+            in_flight.release()
+        await sender
+    finally:
+        sender.cancel()
+        writer.close()
+    return latencies, errors
+
+
+async def run_load(host="127.0.0.1", port=8765, path=None, connections=8, requests=10000,
+                   pipeline=16, expressions=DEFAULT_EXPRESSIONS):
+    """
+    Drive a calculation service and measure it.
+    
+    Args:
+        host (str): Service host
+        port (int): Service TCP port
+        path (str): Unix socket path, used instead of host and port
+        connections (int): Concurrent connections
+        requests (int): Total requests, split evenly between connections
+        pipeline (int): Requests in flight per connection
+        expressions (sequence): Expressions to cycle through
+        
+    Returns:
+        LoadReport: Totals and sorted latencies
+    """
+    per_connection = [requests // connections + (i < requests % connections)
+                      for i in range(connections)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        _run_connection(host, port, path, count, pipeline, expressions, i)
+        for i, count in enumerate(per_connection) if count))
+    seconds = time.perf_counter() - start
+    latencies = sorted(value for values, _ in results for value in values)
+    return LoadReport(len(latencies), sum(errors for _, errors in results), seconds, latencies)
+
+
+def main(argv=None):
+    """
+    Run the load generator.
+    
+    Args:
+        argv (list): Arguments without the program name; defaults to sys.argv[1:]
+        
+    Returns:
+        int: Process exit code (1 if any request failed)
+    """
+    parser = argparse.ArgumentParser(prog="python -m service.loadgen",
+                                     description="Load test a calculation service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead")
+    parser.add_argument("-c", "--connections", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=10000)
+    parser.add_argument("-p", "--pipeline", type=int, default=16,
+                        help="requests in flight per connection")
+    args = parser.parse_args(argv)
+    
+    report = asyncio.run(run_load(args.host, args.port, args.unix, args.connections,
+                                  args.requests, args.pipeline))
+    print(format_report(report))
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
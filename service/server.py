@@ -0,0 +1,409 @@
+"""
+Game-Style Calculator - Calculation Service
+An asyncio server that evaluates expressions for other programs, so they
+share one warm process (and compiled-expression cache) instead of each
+embedding a Calculator.
+
+Protocol:
+    Clients connect over TCP or a Unix socket and send one request per line.
+    A line holding a JSON object is a structured request:
+
+        {"id": 1, "session": "alice", "expression": "ANS×2"}
+        {"id": 2, "session": "alice", "command": "RAD"}
+
+    and is answered with one JSON object per line:
+
+        {"id": 1, "ok": true, "result": "84", "error": ""}
+
+    Any other line is evaluated as a bare expression and answered with the
+    result, or "Error: <message>", as plain text (handy with netcat).
+
+    Requests may be pipelined: clients can send many lines without waiting,
+    and responses come back in request order.
+
+    The same port also speaks minimal HTTP/1.1 with keep-alive:
+    POST /evaluate takes a JSON request as its body, GET /health reports
+    status.
+
+Sessions:
+    Each session has its own ANS, memory and angle mode, kept as a compact
+    record in an LRU store that also expires idle sessions; one shared
+    calculator runs the requests. Requests name their session; those that
+    do not share one session per connection.
+"""
+
+# Standard library imports
+import asyncio
+import itertools
+import json
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Local application imports
+from calculator import (
+    DEFAULT_LIMITS, EvaluationResult, _make_env, _select_backend, evaluate, logger
+)
+from service.sessions import DEFAULT_MAX_SESSIONS, DEFAULT_SESSION_TTL, SessionStore
+
+# Commands accepted in the "command" field of a request
+COMMANDS = ("AC", "MC", "MR", "M+", "M-", "DEG", "RAD")
+
+# Longest request line or HTTP body accepted, in bytes
+MAX_REQUEST_SIZE = 1 << 20
+
+# HTTP methods recognised on the first line of a connection
+HTTP_METHODS = (b"GET ", b"POST ", b"HEAD ", b"PUT ", b"DELETE ", b"OPTIONS ")
+
+# Reason phrases for the HTTP status codes the service sends
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large"}
+
+
+class CalculatorService:
+    """
+    Asyncio calculation server with per-session state and a worker pool.
+    
+    Cheap expressions run inline on the event loop, where they take
+    microseconds. Expressions whose estimated result exceeds
+    limits.heavy_digits are sent to a process pool so they cannot stall
+    other clients.
+    """
+    
+    def __init__(self, limits=DEFAULT_LIMITS, workers=None, cache=None,
+                 max_sessions=DEFAULT_MAX_SESSIONS, session_ttl=DEFAULT_SESSION_TTL):
+        """
+        Initialize the service.
+        
+        Args:
+            limits (ResourceLimits): Resource guard for every evaluation;
+                heavy_digits decides what goes to the worker pool and
+                deadline bounds how long a client waits for it
+            workers (int): Size of the worker pool; None for one per CPU,
+                0 to evaluate heavy expressions inline
+            cache (ExpressionCache): Cache shared by all sessions; defaults
+                to the module-level cache
+            max_sessions (int): Most sessions kept; the least recently used
+                session is evicted beyond this
+            session_ttl (float): Seconds before an idle session is dropped
+        """
+        self.limits = limits
+        self.workers = workers
+        self.cache = cache
+        self.sessions = SessionStore(max_sessions, session_ttl, cache, limits)
+        self.locks = {}                         # Session name -> [lock, users]
+        self.servers = []
+        self.pool = None
+        self.offloaded = 0                      # Evaluations sent to the pool
+        self._connection_ids = itertools.count(1)
+    
+    #-------------------------------------------------------------------------
+    # Server Lifecycle
+    #-------------------------------------------------------------------------
+    
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Start listening on a TCP port, or on a Unix socket if path is given.
+        
+        Args:
+            host (str): Interface to bind; keep the default to stay local
+            port (int): TCP port, 0 to pick a free one
+            path (str): Unix socket path, used instead of host and port
+            
+        Returns:
+            asyncio.Server: The listening server
+        """
+        if path:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path, limit=MAX_REQUEST_SIZE)
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection, host, port, limit=MAX_REQUEST_SIZE)
+        self.servers.append(server)
+        logger.info("Calculation service listening on %s", self.address(server))
+        return server
+    
+    @staticmethod
+    def address(server):
+        """Describe where a server is listening, e.g. "127.0.0.1:8765"."""
+        name = server.sockets[0].getsockname()
+        return name if isinstance(name, str) else f"{name[0]}:{name[1]}"
+    
+    async def close(self):
+        """Stop listening and shut down the worker pool."""
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.pool is not None:
+            self.stop_pool(self.pool)
+    
+    def get_pool(self):
+        """Return the worker pool, creating it on first use."""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers)
+        return self.pool
+    
+    def stop_pool(self, pool):
+        """
+        Shut down a worker pool and kill its processes.
+        
+        Cancelling a future does not stop a worker that is already running
+        it, so a pool whose evaluation overran is replaced: the next heavy
+        request starts a new one. Evaluations still running in the old
+        pool fail with BrokenProcessPool.
+        
+        Args:
+            pool (ProcessPoolExecutor): The pool; self.pool is only cleared
+                if it is still this pool
+        """
+        if self.pool is pool:
+            self.pool = None
+        # Taken before shutdown, which lets the pool forget its processes
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+    
+    @asynccontextmanager
+    async def session_lock(self, name):
+        """
+        Serialize requests for one session.
+        
+        Keeps a heavy expression running in the worker pool from being
+        overtaken by a later request that reads ANS. Locks only exist while
+        a session has requests in flight, so idle sessions carry none.
+        """
+        entry = self.locks.get(name)
+        if entry is None:
+            entry = self.locks[name] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[name]
+    
+    #-------------------------------------------------------------------------
+    # Request Handling
+    #-------------------------------------------------------------------------
+    
+    async def evaluate(self, name, expression):
+        """
+        Evaluate an expression in a session and update its state.
+        
+        Args:
+            name (str): Session whose ANS, memory and mode apply
+            expression (str): Raw mathematical expression
+            
+        Returns:
+            tuple: (success, result_string, error_message)
+        """
+        async with self.session_lock(name):
+            with self.sessions.use(name) as calculator:
+                calculator.current_expression = expression
+                if self.workers == 0 or not self.is_heavy(calculator, expression):
+                    return calculator.calculate()
+                # The calculator serves other sessions while the pool works,
+                # so the evaluation takes copies of this session's registers
+                pool = self.get_pool()
+                future = pool.submit(
+                    evaluate, expression,
+                    angle_mode=calculator.angle_mode,
+                    ans=calculator.ans,
+                    memory=calculator.memory,
+                    limits=self.limits,
+                    precision=calculator.precision,
+                    named=dict(calculator.named) if calculator.named else None)
+            
+            self.offloaded += 1
+            try:
+                outcome = await asyncio.wait_for(
+                    asyncio.wrap_future(future), self.limits.deadline)
+            except asyncio.TimeoutError:
+                self.stop_pool(pool)
+                outcome = EvaluationResult(
+                    False, "Error", f"evaluation exceeded {self.limits.deadline:g} s", None,
+                    "TimeoutError")
+            except BrokenProcessPool:
+                self.stop_pool(pool)
+                outcome = EvaluationResult(
+                    False, "Error", "evaluation worker stopped", None, "BrokenProcessPool")
+            with self.sessions.use(name) as calculator:
+                calculator.current_expression = expression
+                return calculator.apply_result(outcome)
+    
+    def is_heavy(self, calculator, expression):
+        """
+        Whether an expression is estimated to be too slow to run inline.
+        
+        Compiles with the session's backend, so the program cached here is
+        the one the evaluation uses and the estimate sees its arithmetic.
+        """
+        try:
+            backend = _select_backend(calculator.precision)
+            program = calculator.cache.get(expression, calculator.angle_mode,
+                                           frozenset(calculator.named or ()), backend)
+        except Exception:
+            # Syntax errors are reported by the inline evaluation
+            return False
+        env = _make_env(backend, calculator.ans, calculator.memory, calculator.named)
+        return program.estimate(env) > self.limits.heavy_digits
+    
+    async def run_command(self, name, command):
+        """
+        Apply a calculator button command to a session.
+        
+        Returns:
+            tuple: (success, result_string, error_message)
+        """
+        async with self.session_lock(name):
+            with self.sessions.use(name) as calculator:
+                if command in ("DEG", "RAD"):
+                    return True, calculator.set_angle_mode(command), ""
+                if command == "AC":
+                    calculator.all_clear()
+                    return True, "0", ""
+                if command == "MC":
+                    calculator.memory_clear()
+                elif command == "M+":
+                    calculator.memory_add()
+                elif command == "M-":
+                    calculator.memory_subtract()
+                return True, calculator.memory_value, ""
+    
+    async def handle_request(self, request, default_session):
+        """
+        Answer one structured request.
+        
+        Args:
+            request (dict): Decoded JSON request
+            default_session (str): Session used when the request names none
+            
+        Returns:
+            dict: JSON-ready response
+        """
+        response = {"id": request.get("id")}
+        session = str(request.get("session") or default_session)
+        command = request.get("command")
+        expression = request.get("expression")
+        
+        if command is not None:
+            command = str(command).upper()
+            if command not in COMMANDS:
+                success, result, error = False, "Error", f"Unknown command: {command}"
+            else:
+                success, result, error = await self.run_command(session, command)
+        elif isinstance(expression, str):
+            success, result, error = await self.evaluate(session, expression)
+        else:
+            success, result, error = False, "Error", "Request needs an expression or a command"
+        
+        response.update(ok=success, result=result if success else "", error=error)
+        return response
+    
+    async def handle_line(self, line, default_session):
+        """
+        Answer one line of the line protocol.
+        
+        Returns:
+            str: Response line without its newline
+        """
+        text = line.strip()
+        if text.startswith("{"):
+            try:
+                request = json.loads(text)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {"id": None, "ok": False, "result": "",
+                            "error": f"Invalid request: {e}"}
+            else:
+                response = await self.handle_request(request, default_session)
+            return json.dumps(response, ensure_ascii=False)
+        
+        success, result, error = await self.evaluate(default_session, text)
+        return result if success else f"Error: {error}"
+    
+    async def handle_connection(self, reader, writer):
+        """Serve one client connection until it closes."""
+        default_session = f"connection-{next(self._connection_ids)}"
+        try:
+            first = await reader.readline()
+            if first.startswith(HTTP_METHODS):
+                await self.serve_http(first, reader, writer, default_session)
+            else:
+                await self.serve_lines(first, reader, writer, default_session)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ValueError):
+            pass
+        finally:
+            self.sessions.pop(default_session)
+            writer.close()
+    
+    async def serve_lines(self, line, reader, writer, default_session):
+        """Answer line protocol requests in order until EOF."""
+        while line:
+            if line.strip():
+                response = await self.handle_line(line.decode("utf-8", "replace"), default_session)
+                writer.write(response.encode("utf-8") + b"\n")
+                await writer.drain()
+            line = await reader.readline()
+    
+    async def serve_http(self, request_line, reader, writer, default_session):
+        """Answer HTTP/1.1 requests in order until the client closes."""
+        while request_line:
+            method, _, rest = request_line.decode("latin-1").partition(" ")
+            target, _, version = rest.strip().partition(" ")
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_REQUEST_SIZE:
+                status, body = 413, {"ok": False, "error": "Request body too large"}
+            else:
+                body_bytes = await reader.readexactly(length) if length else b""
+                status, body = await self.route_http(method, target, body_bytes, default_session)
+            
+            keep_alive = (version.upper() != "HTTP/1.0"
+                          and headers.get("connection", "").lower() != "close")
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+            request_line = await reader.readline()
+    
+    async def route_http(self, method, target, body, default_session):
+        """
+        Dispatch one HTTP request.
+        
+        Returns:
+            tuple: (status code, JSON-ready body)
+        """
+        path = target.split("?", 1)[0]
+        if path == "/health":
+            return 200, dict(self.sessions.stats(), ok=True)
+        if path != "/evaluate":
+            return 404, {"ok": False, "error": f"Not found: {path}"}
+        if method != "POST":
+            return 405, {"ok": False, "error": "Use POST /evaluate"}
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return 400, {"ok": False, "error": f"Invalid request: {e}"}
+        return 200, await self.handle_request(request, default_session)
@@ -0,0 +1,252 @@
+"""
+Game-Style Calculator - Session Store
+Keeps each client session's registers, bounded by count and idle time, and
+runs requests for all of them on one shared calculator.
+"""
+
+# Standard library imports
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Local application imports
+from calculator import DEFAULT_LIMITS, Calculator
+
+# Default bounds for a SessionStore
+DEFAULT_MAX_SESSIONS = 500_000
+DEFAULT_SESSION_TTL = 3600.0
+
+# Idle expiry is checked to within this fraction of the TTL
+EXPIRY_STEPS = 16
+
+# Registers of a session that has not calculated anything:
+# (ans, result_value, memory, angle_mode, precision, named)
+NEW_SESSION = (0, None, 0, "DEG", None, None)
+
+
+class SessionCalculator(Calculator):
+    """
+    A powered-on calculator that runs requests for many sessions in turn.
+    
+    A session is stored as a state record of its registers: a tuple laid
+    out like NEW_SESSION, or, in the usual state after a calculation (the
+    result is ANS and everything else has its default), just that number.
+    load() makes a record current and save() takes it out again.
+    """
+    
+    __slots__ = ()
+    
+    # Clients send whole expressions, so there is nothing to undo
+    undo_limit = 0
+    
+    def __init__(self, cache=None, limits=DEFAULT_LIMITS):
+        super().__init__(cache, limits)
+        self.power_on = True
+    
+    def load(self, state):
+        """
+        Make a session's registers current, with no expression or result shown.
+        
+        Args:
+            state: State record returned by save(), or NEW_SESSION
+        """
+        if type(state) is tuple:
+            (self.ans, self.result_value, self.memory, self.angle_mode, self.precision,
+             self.named) = state
+        else:
+            self.ans = self.result_value = state
+            self.memory = 0
+            self.angle_mode = "DEG"
+            self.precision = None
+            self.named = None
+        self.expression = ""
+        self.result_shown = False
+    
+    def save(self):
+        """
+        Return the current registers as a state record.
+        
+        Returns:
+            The result number when it is ANS and the other registers have
+            their defaults, otherwise a tuple laid out like NEW_SESSION
+        """
+        ans = self.ans
+        memory = self.memory
+        if (self.result_value is ans and type(memory) is int and not memory
+                and self.angle_mode == "DEG" and self.precision is None and self.named is None):
+            return ans
+        state = (ans, self.result_value, memory, self.angle_mode, self.precision, self.named)
+        return NEW_SESSION if state == NEW_SESSION else state
+
+
+class SessionStore:
+    """
+    LRU mapping of session names to state records with idle expiry.
+    
+    Sessions are kept in least-recently-used order, so both limits are
+    enforced from the front: the oldest session is evicted when the store
+    is full, and idle sessions are expired as new lookups arrive. Instead
+    of a timestamp per session, a time mark is put into that order at most
+    once per resolution: everything in front of a mark was last used at or
+    before its time. Sessions are therefore dropped once they have been
+    idle for longer than the TTL, and at most one resolution later. Each
+    lookup does O(1) amortized work and no background task is needed.
+    
+    Requests run on the store's one SessionCalculator; use() loads a
+    session into it and stores the session's registers back afterwards.
+    """
+    
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, ttl=DEFAULT_SESSION_TTL,
+                 cache=None, limits=DEFAULT_LIMITS, clock=time.monotonic, resolution=None):
+        """
+        Initialize the store.
+        
+        Args:
+            max_sessions (int): Most sessions kept at once
+            ttl (float): Seconds a session may stay idle; None to never expire
+            cache (ExpressionCache): Cache used by the shared calculator
+            limits (ResourceLimits): Resource guard used by the shared calculator
+            clock (callable): Time source, replaceable in tests
+            resolution (float): Seconds between time marks; defaults to
+                ttl / EXPIRY_STEPS
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.resolution = (ttl or 0) / EXPIRY_STEPS if resolution is None else resolution
+        self.clock = clock
+        self.calculator = SessionCalculator(cache, limits)
+        self.sessions = OrderedDict()   # Name -> state record, and time mark -> None
+        self.marks = deque()            # Times of the marks in self.sessions, oldest first
+        self.count = 0                  # Sessions in self.sessions (marks excluded)
+        self.last_used = None           # When the newest session was used
+        self.window = float("-inf")     # When the newest mark's time window began
+        self.evictions = 0      # Sessions dropped because the store was full
+        self.expirations = 0    # Sessions dropped for being idle too long
+    
+    def __len__(self):
+        return self.count
+    
+    def __contains__(self, name):
+        return self.sessions.get(name) is not None
+    
+    def __iter__(self):
+        return (name for name, state in self.sessions.items() if state is not None)
+    
+    def get(self, name):
+        """
+        Return the named session's state record, creating the session if
+        needed, and mark it used.
+        
+        Args:
+            name (str): Session name
+            
+        Returns:
+            The state record (see SessionCalculator)
+        """
+        now = self.clock()
+        sessions = self.sessions
+        if self.ttl is not None:
+            self.expire(now)
+            if now >= self.window + self.resolution:
+                # Close the sessions used since the last mark with a new mark
+                last_used = self.last_used
+                if last_used is not None and (not self.marks or last_used > self.marks[-1]):
+                    sessions[last_used] = None
+                    self.marks.append(last_used)
+                self.window = now
+        
+        state = sessions.get(name)
+        if state is None:
+            state = sessions[name] = NEW_SESSION
+            self.count += 1
+            if self.count > self.max_sessions:
+                self.evict()
+        else:
+            sessions.move_to_end(name)
+        self.last_used = now
+        return state
+    
+    @contextmanager
+    def use(self, name):
+        """
+        Load a session into the shared calculator for the length of a block.
+        
+        The session's registers are stored back when the block ends. The
+        calculator is shared, so the block must not await.
+        
+        Args:
+            name (str): Session name
+            
+        Yields:
+            SessionCalculator: The shared calculator, holding the session
+        """
+        calculator = self.calculator
+        calculator.load(self.get(name))
+        yield calculator
+        self.sessions[name] = calculator.save()
+    
+    def pop(self, name):
+        """Remove a session if present; return its state record or None."""
+        state = self.sessions.get(name)
+        if state is None:
+            return None
+        del self.sessions[name]
+        self.count -= 1
+        return state
+    
+    def evict(self):
+        """Drop the least recently used session."""
+        sessions = self.sessions
+        while True:
+            key, state = sessions.popitem(last=False)
+            if state is not None:
+                break
+            self.marks.popleft()
+        self.count -= 1
+        self.evictions += 1
+    
+    def expire(self, now=None):
+        """
+        Drop sessions that have been idle for longer than the TTL.
+        
+        Args:
+            now (float): Current time; defaults to the store's clock
+            
+        Returns:
+            int: Number of sessions dropped
+        """
+        if self.ttl is None:
+            return 0
+        cutoff = (self.clock() if now is None else now) - self.ttl
+        sessions = self.sessions
+        marks = self.marks
+        dropped = 0
+        while marks and marks[0] < cutoff:
+            marks.popleft()
+            # Pop up to and including the mark
+            while sessions.popitem(last=False)[1] is not None:
+                dropped += 1
+        if self.last_used is not None and self.last_used < cutoff:
+            # Even the newest session is idle
+            dropped += len(sessions) - len(marks)
+            sessions.clear()
+            marks.clear()
+            self.last_used = None
+        self.count -= dropped
+        self.expirations += dropped
+        return dropped
+    
+    def stats(self):
+        """
+        Report store usage.
+        
+        Returns:
+            dict: sessions, max_sessions, ttl, evictions and expirations
+        """
+        return {
+            "sessions": self.count,
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -15,7 +15,14 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import test modules
 from tests.test_calculator import TestCalculator
-from tests.test_ui import TestCalculatorFace, TestStylesConfiguration, TestUIIntegration
+from tests.test_cli import TestCommandLine
+from tests.test_batch import TestStreamingBatch, TestParallelBatch
+from tests.test_service import TestCalculatorService, TestSessionStore
+from tests.test_history import TestHistoryStore
+from tests.test_ui import (
+    TestCalculatorFace, TestStylesConfiguration, TestUIIntegration, TestAsyncCalculation,
+    TestHistoryPanel
+)
 
 
 class ColoredTextTestResult(unittest.TextTestResult):
@@ -86,7 +93,15 @@ def main():
         (TestCalculator, "Calculator Logic"),
         (TestCalculatorFace, "Calculator Face UI"),
         (TestStylesConfiguration, "Styles Configuration"),
-        (TestUIIntegration, "UI Integration")
+        (TestUIIntegration, "UI Integration"),
+        (TestAsyncCalculation, "Async Calculation"),
+        (TestHistoryPanel, "History Panel"),
+        (TestCommandLine, "Command Line"),
+        (TestStreamingBatch, "Streaming Batch"),
+        (TestParallelBatch, "Parallel Batch"),
+        (TestCalculatorService, "Calculation Service"),
+        (TestSessionStore, "Session Store"),
+        (TestHistoryStore, "History Store")
     ]
     
     # Run each test suite
@@ -0,0 +1,165 @@
+"""
+Unit tests for the streaming batch evaluator
+Tests chunked and memory-mapped line reading, output formats and statistics
+"""
+
+import unittest
+import sys
+import os
+import io
+import json
+import tempfile
+from unittest.mock import patch
+
+# Add the parent directory to the path to import the batch package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import (
+    evaluate_file, evaluate_file_parallel, evaluate_lines, evaluate_parallel, iter_lines
+)
+from batch.__main__ import build_parser
+from batch.parallel import split_file
+from calculator import evaluate_many
+
+
+class TestStreamingBatch(unittest.TestCase):
+    """Test cases for batch.stream."""
+    
+    def setUp(self):
+        """Create a small expression file."""
+        handle, self.path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(handle, "wb") as f:
+            f.write("1+1\n\n2×3\r\n1÷0\ncos(60)".encode("utf-8"))
+    
+    def tearDown(self):
+        """Remove the expression file."""
+        os.remove(self.path)
+    
+    def read_lines(self, **kwargs):
+        """Read the test file with iter_lines()."""
+        with open(self.path, "rb") as f:
+            return list(iter_lines(f, **kwargs))
+    
+    def test_iter_lines(self):
+        """Test line numbering, CRLF handling and a missing final newline."""
+        expected = [(1, "1+1"), (2, ""), (3, "2×3"), (4, "1÷0"), (5, "cos(60)")]
+        self.assertEqual(self.read_lines(), expected)
+        self.assertEqual(self.read_lines(use_mmap=False), expected)
+    
+    def test_iter_lines_small_chunks(self):
+        """Test lines and multi-byte characters that straddle chunk boundaries."""
+        expected = self.read_lines()
+        for chunk_size in (1, 2, 3, 7):
+            self.assertEqual(self.read_lines(chunk_size=chunk_size, use_mmap=False), expected)
+        # Mapped chunks are rounded up to whole pages
+        self.assertEqual(self.read_lines(chunk_size=1), expected)
+    
+    def test_iter_lines_empty_input(self):
+        """Test that empty files and streams yield nothing."""
+        self.assertEqual(list(iter_lines(io.BytesIO(b""))), [])
+        with open(self.path, "wb"):
+            pass
+        self.assertEqual(self.read_lines(), [])
+    
+    def test_evaluate_lines(self):
+        """Test that blank lines are skipped and errors get their own column."""
+        records = list(evaluate_lines([(1, "2^3"), (2, ""), (3, "ANS+M"), (4, "1÷0")],
+                                      ans=4, memory=5))
+        self.assertEqual(records, [(1, "2^3", "8", ""), (3, "ANS+M", "9", ""),
+                                   (4, "1÷0", "", "division by zero")])
+    
+    def test_text_output(self):
+        """Test plain text output and the returned statistics."""
+        output = io.StringIO()
+        stats = evaluate_file(self.path, output)
+        self.assertEqual(output.getvalue(),
+                         "1\t2\n3\t6\n4\tError: division by zero\n5\t0.5\n")
+        self.assertEqual((stats.lines, stats.errors), (4, 1))
+        self.assertEqual(stats.bytes, os.path.getsize(self.path))
+        self.assertIn("4 lines (1 errors)", stats.summary())
+    
+    def test_csv_output(self):
+        """Test CSV output with a header and small write batches."""
+        output = io.StringIO()
+        evaluate_file(self.path, output, fmt="csv", batch_size=1)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "line,expression,result,error", "1,1+1,2,", "3,2×3,6,",
+            "4,1÷0,,division by zero", "5,cos(60),0.5,"])
+    
+    def test_jsonl_output(self):
+        """Test JSON Lines output in radians."""
+        output = io.StringIO()
+        evaluate_file(self.path, output, fmt="jsonl", angle_mode="RAD")
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(records[0], {"line": 1, "expression": "1+1", "result": "2", "error": ""})
+        self.assertEqual(records[3]["line"], 5)
+        self.assertNotEqual(records[3]["result"], "0.5")
+    
+    def test_unknown_format(self):
+        """Test that an unknown output format is rejected."""
+        with self.assertRaises(ValueError):
+            evaluate_file(self.path, io.StringIO(), fmt="xml")
+
+
+
+class TestParallelBatch(unittest.TestCase):
+    """Test cases for batch.parallel."""
+    
+    def setUp(self):
+        """Create an expression file spanning several shards."""
+        handle, self.path = tempfile.mkstemp(suffix=".txt")
+        self.expressions = [f"{i}×2+sin(30)" if i % 7 else f"{i}÷0" for i in range(200)]
+        self.expressions[10] = ""
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.expressions) + "\n")
+    
+    def tearDown(self):
+        """Remove the expression file."""
+        os.remove(self.path)
+    
+    def test_split_file(self):
+        """Test that shards are newline-aligned, contiguous and numbered."""
+        shards = list(split_file(self.path, shard_size=100))
+        self.assertGreater(len(shards), 5)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], os.path.getsize(self.path))
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for (start, end, line), following in zip(shards, shards[1:]):
+            self.assertEqual(end, following[0])
+            self.assertEqual(data[end - 1:end], b"\n")
+            self.assertEqual(following[2], line + data[start:end].count(b"\n"))
+    
+    def test_non_positive_sizes_are_rejected(self):
+        """Test that sizes below one are refused instead of looping forever."""
+        for size in (0, -1):
+            with self.assertRaises(ValueError):
+                list(split_file(self.path, shard_size=size))
+            with self.assertRaises(ValueError):
+                evaluate_file_parallel(self.path, io.StringIO(), workers=2, shard_size=size)
+            with self.assertRaises(ValueError):
+                list(evaluate_parallel(self.expressions, workers=2, shard_lines=size))
+        parser = build_parser()
+        with open(os.devnull, "w") as devnull, patch("sys.stderr", devnull):
+            for option in ("--shard-size", "--chunk-size", "--batch-size"):
+                with self.assertRaises(SystemExit):
+                    parser.parse_args([self.path, option, "0"])
+        self.assertEqual(parser.parse_args([self.path, "--shard-size", "64"]).shard_size, 64)
+    
+    def test_file_output_matches_stream(self):
+        """Test that parallel output is identical to the single-process output."""
+        for fmt in ("text", "csv", "jsonl"):
+            expected, actual = io.StringIO(), io.StringIO()
+            evaluate_file(self.path, expected, fmt=fmt)
+            stats = evaluate_file_parallel(self.path, actual, fmt=fmt, workers=2, shard_size=128)
+            self.assertEqual(actual.getvalue(), expected.getvalue())
+            self.assertEqual((stats.lines, stats.errors), (199, 29))
+    
+    def test_evaluate_parallel_order(self):
+        """Test that results of an iterable come back in input order."""
+        results = list(evaluate_parallel(iter(self.expressions), workers=2, shard_lines=16))
+        self.assertEqual(results, list(evaluate_many(self.expressions)))
+
+
+if __name__ == '__main__':
+    unittest.main()
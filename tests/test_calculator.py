@@ -7,11 +7,23 @@ import unittest
 import sys
 import os
 import math
+import subprocess
+import time
+from decimal import Decimal
+from fractions import Fraction
+from unittest.mock import patch
 
 # Add the parent directory to the path to import the calculator module
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from calculator import Calculator
+from calculator import (
+    Calculator, CompiledExpression, ExpressionBuffer, ExpressionCache, ExpressionSyntaxError, IncrementalParser,
+    EvaluationResult, ResourceLimits, TooExpensiveError, UndoHistory, UndoState, BinaryOp, FunctionCall, Number, Register,
+    tokenize, parse, optimize_tree, evaluate, evaluate_many, evaluate_array, estimate_digits,
+    get_decimal_backend, get_numpy_backend, enable_timing, disable_timing, timing_stats
+)
+from utils.timing import Histogram, bucket_bounds, bucket_index
+from utils import decimal_math
 
 
 class TestCalculator(unittest.TestCase):
@@ -286,7 +298,1006 @@ class TestCalculator(unittest.TestCase):
         self.assertTrue(success)
         # Should auto-close the missing parenthesis
         self.assertEqual(result, "20")
-
+    
+    # -------------------------------------------------------------------------
+    # Expression Engine Tests
+    # -------------------------------------------------------------------------
+    
+    def test_tokenize_normalizes_operators(self):
+        """Test that the tokenizer maps display symbols to operators."""
+        kinds = [(token.kind, token.value) for token in tokenize("6×7÷2")]
+        self.assertEqual(kinds, [("number", 6), ("operator", "*"), ("number", 7),
+                                 ("operator", "/"), ("number", 2), ("end", None)])
+        
+    def test_tokenize_rejects_unknown_names(self):
+        """Test that unknown names are syntax errors rather than evaluated."""
+        with self.assertRaises(ExpressionSyntaxError):
+            tokenize("sec(30)")
+            
+    def test_e_inside_expression(self):
+        """Test that e is only recognized as a standalone constant."""
+        self.calc.current_expression = "e^2-e"
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success)
+        self.assertAlmostEqual(float(result), math.e ** 2 - math.e, places=5)
+        
+    def test_scientific_notation(self):
+        """Test numbers written with an exponent, as produced for large results."""
+        self.calc.current_expression = "1.5e3+1"
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success)
+        self.assertEqual(result, "1501")
+        
+    def test_trig_followed_by_operation_degrees(self):
+        """Test that operations after a trig call are not pulled into its argument."""
+        self.calc.angle_mode = "DEG"
+        self.calc.current_expression = "sin(30)+1"
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success)
+        self.assertAlmostEqual(float(result), 1.5, places=5)
+        
+    def test_power_associativity_and_sign(self):
+        """Test that ^ is right-associative and binds tighter than unary minus."""
+        self.assertEqual(evaluate("2^3^2").value, 512)
+        self.assertEqual(evaluate("-2^2").value, -4)
+        self.assertEqual(evaluate("2^-1").value, 0.5)
+        
+    def test_percentage_in_sum(self):
+        """Test percentage applied to the last operand."""
+        self.calc.current_expression = "2+50%"
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success)
+        self.assertEqual(result, "2.5")
+        
+    def test_unmatched_closing_parenthesis(self):
+        """Test that an extra closing parenthesis is a syntax error."""
+        self.calc.current_expression = "(1+2))"
+        success, result, error = self.calc.calculate()
+        self.assertFalse(success)
+        self.assertIn("syntax", error.lower())
+        
+    def test_long_generated_expression(self):
+        """Test that long flat expressions do not exhaust the recursion limit."""
+        self.calc.current_expression = "1" + "+1" * 20000
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success)
+        self.assertEqual(result, "20001")
+        
+    def test_prepare_expression_renders_python(self):
+        """Test the Python rendering of a parsed expression."""
+        self.calc.angle_mode = "DEG"
+        source = self.calc.prepare_expression("sin(30)+e")
+        self.assertEqual(source, "(math.sin(math.radians(30))+math.e)")
+        self.assertIsNotNone(parse("2×π"))
+    
+    # -------------------------------------------------------------------------
+    # Optimizer Tests
+    # -------------------------------------------------------------------------
+    
+    def test_constant_folding(self):
+        """Test that constant sub-expressions are computed once, at compile time."""
+        tree = optimize_tree(parse("ANS×(2×π÷360)"))
+        self.assertIsInstance(tree.left, Register)
+        self.assertEqual(tree.right.value, 2 * math.pi / 360)
+        folded = optimize_tree(parse("sqrt(2)+10^3-(4)%"))
+        self.assertIsInstance(folded, Number)
+        self.assertEqual(folded.value, math.sqrt(2) + 1000 - 0.04)
+        self.assertEqual(optimize_tree(parse("1" + "+1" * 20000)).value, 20001)
+    
+    def test_identity_elimination(self):
+        """Test that x×1, x+0, x^1 and +x reduce to x, but x×1.0 does not."""
+        for expression in ("ANS×1", "1×ANS", "ANS+0", "0+ANS", "ANS-0", "ANS^1", "+ANS", "(ANS+0)×(3-2)"):
+            self.assertIsInstance(optimize_tree(parse(expression)), Register, expression)
+        self.assertIsInstance(optimize_tree(parse("ANS×1.0")), BinaryOp)
+        self.assertEqual(evaluate("ANS×1", ans=7).formatted, "7")
+    
+    def test_strength_reduction(self):
+        """Test that x^0.5 becomes sqrt(x) and x^2 keeps its value."""
+        tree = optimize_tree(parse("M^0.5"))
+        self.assertIsInstance(tree, FunctionCall)
+        self.assertEqual(tree.name, "sqrt")
+        self.assertEqual(evaluate("M^(1÷2)", memory=2.25).value, 1.5)
+        self.assertEqual(evaluate("ANS^2", ans=1.5).value, 2.25)
+        self.assertEqual(evaluate("ANS^2", ans=10**20).value, 10**40)
+    
+    def test_folding_respects_angle_mode(self):
+        """Test that trigonometric constants fold according to the angle mode."""
+        self.assertAlmostEqual(optimize_tree(parse("sin(30)"), "DEG").value, 0.5)
+        self.assertAlmostEqual(optimize_tree(parse("sin(30)"), "RAD").value, math.sin(30))
+        cache = ExpressionCache()
+        self.assertNotEqual(cache.get("sin(30)×ANS", "DEG")({"ANS": 1}),
+                            cache.get("sin(30)×ANS", "RAD")({"ANS": 1}))
+    
+    def test_folding_leaves_errors_and_huge_powers(self):
+        """Test that errors still happen at run time and the guard still applies."""
+        self.assertIsInstance(optimize_tree(parse("1÷0")), BinaryOp)
+        self.assertEqual(evaluate("ANS+1÷0").error_type, "ZeroDivisionError")
+        self.assertEqual(evaluate("sqrt(-1)").error_type, "ValueError")
+        self.assertIsInstance(optimize_tree(parse("9^9^9")), BinaryOp)
+        self.assertEqual(evaluate("9^9^9").error_type, "TooExpensiveError")
+    
+    def test_parser_shares_identical_subtrees(self):
+        """Test that repeated sub-terms are parsed into one shared node."""
+        tree = parse("sin(ANS)×cos(ANS)+sin(ANS)^2")
+        self.assertIs(tree.left.left, tree.right.left)
+        self.assertIs(tree.left.left.argument, tree.left.right.argument)
+        # Equal values of different types are different literals
+        tree = parse("1+1.0")
+        self.assertIsNot(tree.left, tree.right)
+        self.assertEqual(CompiledExpression(parse("(ANS+1)×(ANS+1)")).node_count, 4)
+    
+    def test_shared_subterms_evaluated_once(self):
+        """Test that a repeated sub-term runs once per evaluation, with fresh values."""
+        calls = []
+        def counting_sin(x):
+            calls.append(x)
+            return math.sin(x)
+        with patch.dict("calculator.TRIG_FUNCTIONS", {"sin": counting_sin}):
+            program = CompiledExpression(parse("sin(ANS)×sin(ANS)+sin(ANS)"), "RAD")
+        env = {"ANS": 1.0, "M": 0}
+        for ans in (1.0, 2.0):
+            env["ANS"] = ans
+            self.assertEqual(program(env), math.sin(ans) ** 2 + math.sin(ans))
+        self.assertEqual(calls, [1.0, 2.0])
+    
+    def test_optimized_programs_are_smaller(self):
+        """Test that cached programs have fewer nodes and the same results."""
+        expression = "ANS×(2×π÷360)+sqrt(2)×M^1+0"
+        plain = CompiledExpression(parse(expression), optimize=False)
+        optimized = CompiledExpression(parse(expression))
+        self.assertLessEqual(optimized.node_count, plain.node_count // 2)
+        env = {"ANS": 90, "M": 3}
+        self.assertEqual(optimized(env), plain(env))
+    
+    # -------------------------------------------------------------------------
+    # Expression Cache Tests
+    # -------------------------------------------------------------------------
+    
+    def test_cache_hit_on_repeat(self):
+        """Test that repeating a calculation reuses the compiled expression."""
+        cache = ExpressionCache()
+        self.calc.cache = cache
+        for _ in range(3):
+            self.calc.current_expression = "2+3"
+            self.calc.calculate()
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+        
+    def test_cache_key_includes_angle_mode(self):
+        """Test that DEG and RAD compile separately."""
+        cache = ExpressionCache()
+        deg = evaluate("sin(90)", angle_mode="DEG", cache=cache)
+        rad = evaluate("sin(90)", angle_mode="RAD", cache=cache)
+        self.assertAlmostEqual(deg.value, 1.0, places=5)
+        self.assertAlmostEqual(rad.value, math.sin(90), places=5)
+        self.assertEqual(len(cache), 2)
+        
+    def test_cache_ignores_whitespace(self):
+        """Test that expressions differing only in spacing share an entry."""
+        cache = ExpressionCache()
+        cache.get("1 + 2")
+        cache.get("1+2")
+        self.assertEqual(cache.stats()["hits"], 1)
+        
+    def test_cache_evicts_least_recently_used(self):
+        """Test entry-count eviction order."""
+        cache = ExpressionCache(max_entries=2)
+        cache.get("1+1")
+        cache.get("2+2")
+        cache.get("1+1")
+        cache.get("3+3")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.get("1+1")
+        self.assertEqual(cache.stats()["hits"], 2)  # 1+1 survived, 2+2 did not
+        
+    def test_cache_memory_limit(self):
+        """Test that the byte limit bounds the cache."""
+        cache = ExpressionCache(max_bytes=2000)
+        for i in range(50):
+            cache.get(f"{i}+{i}×{i}")
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 2000)
+        self.assertGreater(stats["evictions"], 0)
+        
+    def test_cache_does_not_store_errors(self):
+        """Test that invalid expressions raise and leave the cache unchanged."""
+        cache = ExpressionCache()
+        with self.assertRaises(ExpressionSyntaxError):
+            cache.get("2++")
+        self.assertEqual(len(cache), 0)
+    
+    # -------------------------------------------------------------------------
+    # Stateless Evaluation Tests
+    # -------------------------------------------------------------------------
+    
+    def test_evaluate_returns_immutable_result(self):
+        """Test the result object returned by evaluate()."""
+        outcome = evaluate("6×7")
+        self.assertIsInstance(outcome, EvaluationResult)
+        self.assertEqual(outcome, (True, "42", "", 42, ""))
+        with self.assertRaises(AttributeError):
+            outcome.value = 0
+            
+    def test_evaluate_registers(self):
+        """Test that ANS and M are read from the arguments."""
+        outcome = evaluate("ANS+M×2", ans=10, memory=3)
+        self.assertEqual(outcome.formatted, "16")
+        
+    def test_evaluate_error(self):
+        """Test that errors are reported in the result, not raised."""
+        outcome = evaluate("1÷0")
+        self.assertFalse(outcome.success)
+        self.assertEqual(outcome.formatted, "Error")
+        self.assertIsNone(outcome.value)
+        
+    def test_evaluate_does_not_touch_calculator(self):
+        """Test that evaluate() leaves calculator state alone."""
+        self.calc.current_expression = "1+1"
+        evaluate("2+2")
+        self.assertEqual(self.calc.current_expression, "1+1")
+        self.assertEqual(self.calc.result, "")
+        
+    def test_calculator_uses_last_answer(self):
+        """Test that ANS in an expression refers to the previous result."""
+        self.calc.current_expression = "20+1"
+        self.calc.calculate()
+        self.calc.current_expression = "ANS×2"
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success)
+        self.assertEqual(result, "42")
+        
+    def test_evaluate_concurrently(self):
+        """Test evaluation from many threads sharing one cache."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        cache = ExpressionCache(max_entries=8)
+        expressions = [f"{i}×{i}+ANS" for i in range(20)] * 50
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda e: evaluate(e, ans=1, cache=cache), expressions))
+        for expr, outcome in zip(expressions, results):
+            i = int(expr.split("×")[0])
+            self.assertEqual(outcome.value, i * i + 1)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], len(expressions))
+        self.assertLessEqual(stats["entries"], 8)
+    
+    # -------------------------------------------------------------------------
+    # Batch Evaluation Tests
+    # -------------------------------------------------------------------------
+    
+    def test_evaluate_many_results(self):
+        """Test per-item results, including errors, in input order."""
+        results = list(self.calc.evaluate_many(["1+1", "1÷0", "", "sin(30)"]))
+        self.assertEqual(results[0], (True, "2", ""))
+        self.assertEqual(results[1][:2], (False, "Error"))
+        self.assertEqual(results[2], (False, "", "No expression to calculate"))
+        self.assertAlmostEqual(float(results[3][1]), 0.5, places=5)
+        
+    def test_evaluate_many_is_lazy(self):
+        """Test that items are evaluated only as they are consumed."""
+        def source():
+            yield "1+1"
+            raise AssertionError("batch consumed too eagerly")
+        
+        results = self.calc.evaluate_many(source())
+        self.assertEqual(next(results), (True, "2", ""))
+        
+    def test_evaluate_many_dedupes(self):
+        """Test that repeated expressions are compiled and run once."""
+        cache = ExpressionCache()
+        self.calc.cache = cache
+        results = list(self.calc.evaluate_many(["2^10"] * 100 + ["3^3"]))
+        self.assertEqual(results[99], (True, "1024", ""))
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+        
+    def test_evaluate_many_leaves_state(self):
+        """Test that batch evaluation does not change calculator state."""
+        self.calc.current_expression = "5"
+        list(self.calc.evaluate_many(["cos(0)"], angle_mode="RAD"))
+        self.assertEqual(self.calc.current_expression, "5")
+        self.assertEqual(self.calc.angle_mode, "DEG")
+        self.assertFalse(self.calc.result_shown)
+    
+    # -------------------------------------------------------------------------
+    # Vectorized Evaluation Tests
+    # -------------------------------------------------------------------------
+    
+    def test_variables_must_be_declared(self):
+        """Test that variable names are only accepted when declared."""
+        with self.assertRaises(ExpressionSyntaxError):
+            parse("x+1")
+        self.assertIsNotNone(parse("x+1", frozenset({"x"})))
+        
+    def test_evaluate_array(self):
+        """Test evaluating one formula over many values."""
+        values = [0, 30, 90, 180]
+        result = evaluate_array("sin(x)^2 + sqrt(x) + 50%", {"x": values}, angle_mode="DEG")
+        expected = [math.sin(math.radians(v)) ** 2 + math.sqrt(v) + 0.5 for v in values]
+        for got, want in zip(result, expected):
+            self.assertAlmostEqual(float(got), want, places=9)
+            
+    def test_evaluate_array_radians_and_constants(self):
+        """Test RAD mode, π and e in vectorized evaluation."""
+        result = evaluate_array("cos(x×π)+e^y", {"x": [0, 1], "y": [0, 1]}, angle_mode="RAD")
+        self.assertAlmostEqual(float(result[0]), 2.0, places=9)
+        self.assertAlmostEqual(float(result[1]), -1 + math.e, places=9)
+        
+    def test_evaluate_array_fallback(self):
+        """Test the pure-Python path used when NumPy is not installed."""
+        with patch("calculator._numpy_backend", False):
+            self.assertIsNone(get_numpy_backend())
+            result = evaluate_array("1÷x+x^2", {"x": [1, 2, 0]})
+        self.assertEqual(result[:2], [2.0, 4.5])
+        self.assertTrue(math.isinf(result[2]))
+        
+    def test_evaluate_array_fallback_division_by_zero(self):
+        """Test that the fallback gives nan for 0÷0 and a signed inf otherwise, like NumPy."""
+        variables = {"x": [0, 1, -1, 2, 0], "y": [0, 0, 0, -0.0, 1]}
+        with patch("calculator._numpy_backend", False):
+            result = evaluate_array("x÷y", variables)
+        self.assertTrue(math.isnan(result[0]))
+        self.assertEqual(result[1:], [math.inf, -math.inf, -math.inf, 0.0])
+        if get_numpy_backend() is not None:
+            numpy_result = evaluate_array("x÷y", variables)
+            self.assertTrue(math.isnan(numpy_result[0]))
+            self.assertEqual(list(numpy_result[1:]), result[1:])
+        
+    def test_evaluate_array_rejects_reserved_names(self):
+        """Test that variables cannot shadow built-in names."""
+        with self.assertRaises(ValueError):
+            evaluate_array("e+1", {"e": [1, 2]})
+    
+    # -------------------------------------------------------------------------
+    # Resource Guard Tests
+    # -------------------------------------------------------------------------
+    
+    def test_estimate_digits(self):
+        """Test the static size estimate for integer powers."""
+        self.assertLess(estimate_digits(parse("2+3×4")), 5)
+        self.assertAlmostEqual(estimate_digits(parse("10^100")), 101, delta=1)
+        self.assertGreater(estimate_digits(parse("9^9^9")), 3e8)
+        # Floats are bounded by the float range
+        self.assertLess(estimate_digits(parse("2.0^1000000")), 10)
+        
+    def test_runaway_power_fails_fast(self):
+        """Test that 9^9^9 is rejected instead of hanging."""
+        self.calc.current_expression = "9^9^9"
+        start = time.perf_counter()
+        success, result, error = self.calc.calculate()
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertFalse(success)
+        self.assertEqual(result, "Error")
+        self.assertIn("Too expensive", error)
+        
+    def test_guard_uses_register_values(self):
+        """Test that the estimate accounts for the current ANS value."""
+        outcome = evaluate("ANS^ANS", ans=10**7)
+        self.assertEqual(outcome.error_type, "TooExpensiveError")
+        self.assertTrue(evaluate("ANS^ANS", ans=5).success)
+        
+    def test_guard_without_powers(self):
+        """Test that the estimate is checked for expressions without ^."""
+        outcome = evaluate("ANS×ANS", ans=10**600000)
+        self.assertEqual(outcome.error_type, "TooExpensiveError")
+        self.assertTrue(evaluate("ANS×ANS", ans=10**6000).success)
+        # Shared sub-terms count once per use
+        outcome = evaluate("(ANS×ANS)×(ANS×ANS)", ans=10**300000)
+        self.assertEqual(outcome.error_type, "TooExpensiveError")
+        
+    def test_decimal_trig_arguments_are_guarded(self):
+        """Test that Decimal sin, cos and tan are priced by their argument's size."""
+        backend = get_decimal_backend(20)
+        self.assertAlmostEqual(estimate_digits(parse("sin(ANS)"), {"ANS": Decimal("1e500")}, backend),
+                               501, delta=1)
+        self.assertLess(estimate_digits(parse("sqrt(ANS)×e"), {"ANS": Decimal("1e500")}, backend), 2)
+        limits = ResourceLimits(max_digits=10_000)
+        for expression in ("sin(1e15000)", "cos(10^15000)", "tan(ANS)"):
+            outcome = evaluate(expression, angle_mode="RAD", ans=10**12000, precision=20,
+                               limits=limits)
+            self.assertEqual(outcome.error_type, "TooExpensiveError", expression)
+        
+    def test_decimal_heavy_expression_in_worker(self):
+        """Test that the worker evaluates heavy Decimal expressions at their precision."""
+        limits = ResourceLimits(heavy_digits=100, use_subprocess=True, deadline=30.0)
+        inline = evaluate("sin(1e500)", angle_mode="RAD", precision=30)
+        outcome = evaluate("sin(1e500)", angle_mode="RAD", precision=30, limits=limits)
+        self.assertEqual(outcome.formatted, inline.formatted)
+        self.assertEqual(type(outcome.value), Decimal)
+        
+    def test_result_size_cap(self):
+        """Test that results over the digit limit are rejected."""
+        outcome = evaluate("2^400", limits=ResourceLimits(max_digits=50))
+        self.assertFalse(outcome.success)
+        self.assertEqual(outcome.error_type, "TooExpensiveError")
+        self.assertTrue(evaluate("2^400", limits=None).success)
+        
+    def test_too_expensive_error_details(self):
+        """Test the structured fields of the too-expensive error."""
+        with self.assertRaises(TooExpensiveError) as context:
+            evaluate_array("x+9^9^9", {"x": [1.0]})
+        self.assertGreater(context.exception.estimate, context.exception.limit)
+        
+    def test_subprocess_deadline(self):
+        """Test that a heavy expression in the worker is killed at the deadline."""
+        limits = ResourceLimits(max_digits=10**9, heavy_digits=1000,
+                                deadline=0.5, use_subprocess=True)
+        start = time.perf_counter()
+        outcome = evaluate("3^(2^26)", limits=limits)
+        self.assertLess(time.perf_counter() - start, 5.0)
+        self.assertEqual(outcome.error_type, "TooExpensiveError")
+        self.assertIn("deadline", outcome.error)
+    
+    # -------------------------------------------------------------------------
+    # Compact State Tests
+    # -------------------------------------------------------------------------
+    
+    def test_calculator_has_no_instance_dict(self):
+        """Test that calculators use __slots__ and share one logger."""
+        self.assertFalse(hasattr(self.calc, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.calc.unknown_attribute = 1
+        self.assertIs(self.calc.logger, Calculator().logger)
+    
+    def test_registers_are_numeric(self):
+        """Test that ANS, memory and the result are stored as numbers."""
+        self.calc.current_expression = "2^62×4"
+        self.calc.calculate()
+        self.assertEqual(self.calc.ans, 2 ** 64)
+        self.assertEqual(self.calc.result_value, 2 ** 64)
+        self.assertEqual(self.calc.last_answer, str(2 ** 64))
+        self.calc.memory_add()
+        self.calc.memory_add()
+        self.assertEqual(self.calc.memory, 2 ** 65)
+        self.assertEqual(self.calc.memory_value, str(2 ** 65))
+    
+    def test_integral_results_stay_exact(self):
+        """Test that an integral float result feeds ANS as an int."""
+        self.calc.current_expression = "10÷2"
+        self.calc.calculate()
+        self.assertIs(type(self.calc.ans), int)
+        self.calc.current_expression = "ANS^30"
+        self.assertEqual(self.calc.calculate()[1], str(5 ** 30))
+    
+    # -------------------------------------------------------------------------
+    # Numeric Tower Tests
+    # -------------------------------------------------------------------------
+    
+    def test_integers_stay_exact_past_float_precision(self):
+        """Test that integer arithmetic beyond 2^53 is not rounded through floats."""
+        self.assertEqual(evaluate("2^53+1").formatted, "9007199254740993")
+        self.assertEqual(evaluate("(2^60+1)÷1").value, 2 ** 60 + 1)
+        self.assertEqual(evaluate("(10^30+3)×(10^30-3)÷(10^30+3)").value, 10 ** 30 - 3)
+    
+    def test_division_promotes_to_fraction(self):
+        """Test that inexact integer division gives an exact Fraction."""
+        self.assertEqual(evaluate("7÷2").value, Fraction(7, 2))
+        self.assertEqual(evaluate("7÷2").formatted, "3.5")
+        self.assertIs(type(evaluate("1÷3×3").value), int)
+        self.assertIs(type(evaluate("2÷3+1÷3").value), int)
+        self.assertEqual(evaluate("2^-3").value, Fraction(1, 8))
+        self.assertEqual(evaluate("50+10%").value, Fraction(501, 10))
+        self.assertEqual(evaluate("1÷0").error, "division by zero")
+    
+    def test_floats_only_from_inexact_operations(self):
+        """Test that transcendental functions and decimals still produce floats."""
+        for expression in ("sin(1÷2)", "sqrt(1÷4)", "2^0.5", "1.5÷3", "π÷2"):
+            self.assertIs(type(evaluate(expression).value), float, expression)
+    
+    def test_rationals_feed_registers_exactly(self):
+        """Test that ANS keeps a Fraction, so later steps stay exact."""
+        self.calc.current_expression = "1÷3"
+        self.assertEqual(self.calc.calculate()[1], "0.3333333333")
+        self.calc.current_expression = "ANS×3"
+        self.assertEqual(self.calc.calculate()[1], "1")
+        self.assertIs(type(self.calc.ans), int)
+    
+    def test_huge_rationals_format_and_are_guarded(self):
+        """Test rationals beyond the float range and runaway rational powers."""
+        self.assertEqual(evaluate("10^400÷3").formatted, "3.333333333e+399")
+        self.assertEqual(evaluate("-(1÷3)^2000").formatted, "-5.721245195e-955")
+        self.assertEqual(evaluate("(1÷3)^(10^9)").error_type, "TooExpensiveError")
+    
+    def test_array_backend_keeps_float_division(self):
+        """Test that vectorized evaluation divides in floats, not Fractions."""
+        result = evaluate_array("x÷3+1÷3", {"x": [1, 2]})
+        self.assertEqual([round(value, 12) for value in result], [round(2 / 3, 12), 1.0])
+    
+    def test_fractions_imported_lazily(self):
+        """Test that importing the calculator does not import fractions (start-up time)."""
+        script = "import sys, calculator; print('fractions' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(output.stdout.strip(), "False")
+    
+    def test_register_string_views(self):
+        """Test that the string properties parse and format the registers."""
+        self.calc.last_answer = "2.5"
+        self.calc.memory_value = "7"
+        self.calc.result = "4"
+        self.assertEqual((self.calc.ans, self.calc.memory, self.calc.result_value), (2.5, 7, 4))
+        self.calc.result = ""
+        self.assertIsNone(self.calc.result_value)
+        self.calc.memory_subtract()
+        self.assertEqual(self.calc.memory_value, "7")
+    
+    def test_huge_integers_render_lazily(self):
+        """Test that huge integer results display quickly, past Python's str() digit limit."""
+        start = time.perf_counter()
+        result = evaluate("2^1000000")
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(result.formatted, "9.900656229e+301029")
+        self.assertEqual(result.value, 2 ** 1000000)
+        self.assertEqual(evaluate("-(10^5000-1)").formatted, "-1e+5000")
+        self.assertEqual(evaluate("2^100").formatted, str(2 ** 100))
+    
+    def test_continue_from_huge_result(self):
+        """Test that a huge result's abbreviated display is never parsed back as input."""
+        self.calc.current_expression = "2^20000"
+        self.assertEqual(self.calc.calculate()[1], "3.98027684e+6020")
+        self.calc.insert_text("+")
+        self.calc.insert_text("1")
+        self.assertEqual(self.calc.current_expression, "ANS+1")
+        success, result, error = self.calc.calculate()
+        self.assertTrue(success, error)
+        self.assertEqual(self.calc.result_value, 2 ** 20000 + 1)
+    
+    def test_lazy_integer_digits(self):
+        """Test digit count, leading/trailing digits and chunked full conversion."""
+        from utils.big_integers import LazyInteger
+        value = 3 ** 8900 * 10 ** 7
+        expected = str(3 ** 8900) + "0" * 7     # Past the full display, under the str() limit
+        lazy = LazyInteger(-value)
+        self.assertEqual(lazy.digit_count, len(expected))
+        self.assertEqual(lazy.leading(12), expected[:12])
+        self.assertEqual(lazy.trailing(9), expected[-9:])
+        self.assertEqual("".join(lazy.chunks(1000)), "-" + expected)
+        self.assertEqual(LazyInteger(10 ** 400).digit_count, 401)
+        self.assertEqual(LazyInteger(10 ** 400 - 1).scientific(), "1e+400")
+        
+        self.calc.current_expression = "3^8900×10^7"
+        self.calc.calculate()
+        self.assertEqual("".join(self.calc.result_chunks(4096)), expected)
+    
+    def test_memory_recall_is_symbolic(self):
+        """Test that MR inserts a reference to M, keeping its full precision."""
+        self.calc.current_expression = "1÷3"
+        self.calc.calculate()
+        self.calc.memory_add()
+        self.calc.memory_recall()
+        self.assertEqual(self.calc.current_expression, "M")
+        self.calc.insert_text("×")
+        self.calc.insert_text("3")
+        self.assertEqual(self.calc.preview(), "1")
+        self.assertEqual(self.calc.calculate()[1], "1")
+    
+    def test_operator_after_result_continues_from_ans(self):
+        """Test that an operator typed after a result continues from its exact value."""
+        for char in "1÷3":
+            self.calc.insert_text(char)
+        self.assertEqual(self.calc.calculate()[1], "0.3333333333")
+        self.calc.insert_text("×")
+        self.calc.insert_text("3")
+        self.assertEqual(self.calc.current_expression, "ANS×3")
+        self.assertEqual(self.calc.preview(), "1")
+        self.assertEqual(self.calc.calculate()[1], "1")
+    
+    def test_named_memory_slots(self):
+        """Test storing, recalling and clearing named memory slots."""
+        self.calc.current_expression = "2÷3"
+        self.calc.calculate()
+        self.assertEqual(self.calc.memory_store("rate"), "0.6666666667")
+        self.calc.memory_recall("rate")
+        for char in "×300":
+            self.calc.insert_text(char)
+        self.assertEqual(self.calc.current_expression, "rate×300")
+        self.assertEqual(self.calc.preview(), "200")
+        self.assertEqual(self.calc.calculate()[1], "200")
+        self.assertEqual(self.calc.memory_slots(), {"rate": "0.6666666667"})
+        self.assertEqual(self.calc.prepare_expression("rate+1"), "(rate+1)")
+        
+        self.calc.set_precision(20)
+        self.calc.current_expression = "rate"
+        self.assertEqual(self.calc.calculate()[1], "0.66666666666666666667")
+        self.calc.set_precision(None)
+        
+        for name in ("ANS", "pi", "sqrt", "x1"):
+            with self.assertRaises(ValueError):
+                self.calc.memory_store(name)
+        self.calc.memory_clear("rate")
+        self.assertEqual(self.calc.memory_slots(), {})
+        with self.assertRaises(KeyError):
+            self.calc.memory_recall("rate")
+        self.calc.current_expression = "rate"
+        self.assertIn("unknown name", self.calc.calculate()[2])
+    
+    # -------------------------------------------------------------------------
+    # Undo Tests
+    # -------------------------------------------------------------------------
+    
+    def test_undo_restores_destructive_edits(self):
+        """Test that clear, backspace, AC, results and memory can be undone and redone."""
+        calc = self.calc
+        self.assertFalse(calc.undo())
+        for char in "12+3":
+            calc.insert_text(char)
+        calc.backspace()
+        calc.clear()
+        self.assertEqual(calc.current_expression, "")
+        self.assertTrue(calc.undo())
+        self.assertEqual(calc.current_expression, "12+")
+        self.assertTrue(calc.undo())
+        self.assertEqual(calc.current_expression, "12+3")
+        self.assertTrue(calc.redo())
+        self.assertEqual(calc.current_expression, "12+")
+        
+        # The restored buffer keeps its cursor and parser
+        calc.move_cursor(-2)
+        calc.insert_text("0")
+        self.assertEqual(calc.current_expression, "102+")
+        self.assertFalse(calc.redo())
+        calc.undo()
+        self.assertEqual(calc.display_expression(10, "|"), "1|2+")
+        calc.move_cursor_to(True)
+        calc.insert_text("4")
+        self.assertEqual(calc.preview(), "16")
+        
+        calc.calculate()
+        calc.memory_add()
+        calc.memory_store("x")
+        calc.all_clear()
+        self.assertEqual((calc.result, calc.memory_value), ("", "16"))
+        calc.undo()
+        self.assertEqual((calc.result, calc.last_answer, calc.memory_slots()), ("16", "16", {"x": "16"}))
+        calc.undo()
+        self.assertEqual(calc.memory_slots(), {})
+        calc.undo()
+        self.assertEqual(calc.memory_value, "0")
+        calc.undo()
+        self.assertEqual((calc.result, calc.last_answer, calc.current_expression), ("", "0", "12+4"))
+        
+        # Moving the cursor alone is not a step
+        steps = len(calc.undo_history)
+        calc.move_cursor(-1)
+        calc.move_cursor(-1)
+        calc.backspace()
+        self.assertEqual(len(calc.undo_history), steps + 1)
+    
+    def test_undo_cost_follows_change_size(self):
+        """Test that undo steps share the expression and stay within their memory limit."""
+        calc = self.calc
+        calc.insert_text("1+" * 2000 + "1")
+        calc.insert_text("+")
+        calc.backspace()
+        start = calc.undo_history.bytes
+        for _ in range(100):
+            calc.insert_text("+")
+            calc.backspace()
+        # 200 steps, each far smaller than the 4001-token expression
+        self.assertLess(calc.undo_history.bytes - start, 200 * 1000)
+        for _ in range(202):
+            calc.undo()
+        self.assertEqual(len(calc.current_expression), 4001)
+        calc.undo()
+        self.assertEqual(calc.current_expression, "")
+        
+        history = UndoHistory(max_bytes=10_000)
+        buffer = ExpressionBuffer()
+        for _ in range(1000):
+            history.record(UndoState(buffer.snapshot(), None, 0, 0, None, False),
+                           buffer.take_allocated())
+            buffer.insert("9")
+        self.assertLessEqual(history.bytes, 10_000)
+        self.assertGreater(len(history), 10)
+    
+    # -------------------------------------------------------------------------
+    # Decimal Mode Tests
+    # -------------------------------------------------------------------------
+    
+    def test_decimal_mode_precision(self):
+        """Test that Decimal mode returns results to the requested number of digits."""
+        self.assertEqual(evaluate("1÷3", precision=50).formatted, "0." + "3" * 50)
+        self.assertEqual(evaluate("π", precision=40).formatted,
+                         "3.141592653589793238462643383279502884197")
+        self.assertEqual(evaluate("sqrt(2)", precision=30).formatted,
+                         "1.41421356237309504880168872421")
+        self.assertEqual(evaluate("e", precision=20).formatted, "2.7182818284590452354")
+        self.assertEqual(type(evaluate("2×3", precision=20).value).__name__, "Decimal")
+    
+    def test_decimal_kernels_give_exact_values(self):
+        """Test that decimal literals and exact function values are not blurred by binary floats."""
+        cases = {"0.1+0.2": "0.3", "sin(30)": "0.5", "cos(60)": "0.5", "tan(45)": "1",
+                 "log(1000)": "3", "sqrt(1.44)": "1.2", "2^0.5×2^0.5": "2", "-sin(-210)": "-0.5"}
+        for expression, expected in cases.items():
+            self.assertEqual(evaluate(expression, precision=30).formatted, expected, expression)
+        self.assertEqual(evaluate("sin(π÷6)", angle_mode="RAD", precision=30).formatted, "0.5")
+        self.assertEqual(evaluate("sin(10^20)", angle_mode="RAD", precision=15).formatted,
+                         "-0.645251285265781")
+    
+    def test_decimal_literals_keep_their_digits(self):
+        """Test that Decimal mode reads literals from their text rather than through a float."""
+        self.assertEqual(evaluate("1.00000000000000000001-1", precision=40).formatted, "1e-20")
+        self.assertEqual(evaluate("12345678901234567890.12345", precision=40).formatted,
+                         "12345678901234567890.12345")
+        self.assertEqual(evaluate("1e400", precision=40).formatted, "1e+400")
+    
+    def test_decimal_zero_powers(self):
+        """Test that zero bases behave as in exact mode instead of giving Infinity."""
+        self.assertEqual(evaluate("0^0", precision=25).formatted, "1")
+        self.assertEqual(evaluate("0^-1", precision=25).error_type, "ZeroDivisionError")
+        self.assertEqual(evaluate("0^2", precision=25).formatted, "0")
+        self.assertEqual(evaluate("1e999999999", precision=25).error_type, "OverflowError")
+    
+    def test_decimal_errors(self):
+        """Test that Decimal mode reports the same errors as exact mode."""
+        for expression, error_type in (("1÷0", "ZeroDivisionError"), ("0÷0", "ZeroDivisionError"),
+                                       ("sqrt(-1)", "ValueError"), ("log(0)", "ValueError"),
+                                       ("10^(10^9)", "OverflowError")):
+            self.assertEqual(evaluate(expression, precision=25).error_type, error_type, expression)
+        self.assertEqual(evaluate("1÷0", precision=25).error, "division by zero")
+        self.assertEqual(evaluate("1", precision=0).error_type, "ValueError")
+    
+    def test_decimal_backend_cached_per_precision(self):
+        """Test that each precision has one backend and its own compiled expressions."""
+        self.assertIs(get_decimal_backend(42), get_decimal_backend(42))
+        cache = ExpressionCache()
+        results = [evaluate("2÷3", precision=digits, cache=cache).formatted for digits in (5, 10)]
+        self.assertEqual(results, ["0.66667", "0.6666666667"])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(list(evaluate_many(["1÷8", "1÷8"], precision=5, cache=cache)),
+                         [(True, "0.125", "")] * 2)
+    
+    def test_decimal_trig_reduction_is_bounded(self):
+        """Test that huge trig arguments are refused instead of reduced at any cost."""
+        start = time.perf_counter()
+        result = evaluate("sin(1e999999)", angle_mode="RAD", precision=15)
+        self.assertEqual(result.error_type, "OverflowError")
+        self.assertLess(time.perf_counter() - start, 1.0)
+        digits = decimal_math.MAX_REDUCTION_DIGITS - 1
+        self.assertTrue(evaluate(f"cos(1e{digits})", angle_mode="RAD", precision=15).success)
+    
+    def test_decimal_constants_keep_one_value(self):
+        """Test that π and e keep only their most precise value across precisions."""
+        values = [decimal_math.pi(digits) for digits in (60, 20, 400, 35)]
+        self.assertEqual(str(values[1]), "3.1415926535897932385")
+        self.assertEqual(str(values[3]), "3.1415926535897932384626433832795029")
+        self.assertEqual(decimal_math._constants[decimal_math._machin_pi][0],
+                         400 + decimal_math.GUARD_DIGITS)
+        self.assertIsNotNone(decimal_math.pi.cache_info().maxsize)
+    
+    def test_calculator_precision_switch(self):
+        """Test that switching modes converts the registers in both directions."""
+        self.calc.current_expression = "1÷8"
+        self.calc.calculate()
+        self.assertEqual(self.calc.set_precision(30), 30)
+        self.calc.current_expression = "1÷7"
+        self.assertEqual(self.calc.calculate()[1], "0." + "142857" * 5)
+        self.calc.memory_add()
+        self.calc.memory_add()
+        self.assertEqual(self.calc.memory_value, "0." + "285714" * 5)
+        self.assertEqual(self.calc.preview(), "")
+        
+        self.assertIsNone(self.calc.set_precision(None))
+        self.assertEqual(self.calc.ans, Fraction(142857 * (10 ** 30 - 1) // 999999, 10 ** 30))
+        self.calc.current_expression = "ANS×10^30"
+        self.assertEqual(self.calc.calculate()[1], "142857" * 5)
+        with self.assertRaises(ValueError):
+            self.calc.set_precision(10 ** 6)
+    
+    # -------------------------------------------------------------------------
+    # Expression Buffer Tests
+    # -------------------------------------------------------------------------
+    
+    def test_buffer_function_tokens_are_atomic(self):
+        """Test that functions are single tokens however they are typed."""
+        buffer = ExpressionBuffer("2×sin(30)+")
+        self.assertEqual(buffer.tokens(), ["2", "×", "sin(", "3", "0", ")", "+"])
+        for letter in "sqrt(":
+            buffer.insert(letter)
+        self.assertEqual(buffer.delete_before(), "sqrt(")
+        self.assertEqual(buffer.text(), "2×sin(30)+")
+        # A "(" after letters that are not a function stays on its own
+        buffer.insert("ANS(")
+        self.assertEqual(buffer.delete_before(), "(")
+    
+    def test_buffer_cursor_editing(self):
+        """Test inserting and deleting in the middle of the expression."""
+        buffer = ExpressionBuffer("12+34")
+        self.assertEqual(buffer.move_left(2), 2)
+        self.assertEqual(buffer.cursor, 3)
+        buffer.insert("cos(")
+        buffer.delete_after()
+        self.assertEqual(buffer.text(), "12+cos(4")
+        self.assertEqual(len(buffer), 8)
+        buffer.move_to_start()
+        buffer.insert("-")
+        self.assertEqual(buffer.text(), "-12+cos(4")
+        self.assertEqual(buffer.move_right(100), 5)
+        self.assertTrue(buffer.at_end)
+        self.assertEqual(buffer.delete_after(), "")
+    
+    def test_buffer_window(self):
+        """Test rendering only the text around the cursor."""
+        buffer = ExpressionBuffer("1+" * 5000 + "sin(")
+        self.assertEqual(buffer.tail(6), "1+sin(")
+        self.assertEqual(buffer.window(6), "1+sin(")
+        buffer.move_left(3)
+        self.assertEqual(buffer.window(6, "|"), "+1+|1+s")
+        self.assertEqual(buffer.head(3), "1+s")
+    
+    def test_calculator_editing_with_cursor(self):
+        """Test cursor movement through the Calculator interface."""
+        for key in ["2", "+", "3"]:
+            self.calc.insert_text(key)
+        self.assertEqual(self.calc.move_cursor(-1), 2)
+        self.calc.insert_text("1")
+        self.calc.move_cursor_to(False)
+        self.calc.insert_function("sqrt(")
+        self.calc.move_cursor_to(True)
+        self.calc.insert_text(")")
+        self.assertEqual(self.calc.current_expression, "sqrt(2+13)")
+        self.assertEqual(self.calc.display_expression(4, "|"), "+13)")
+        self.calc.backspace()
+        self.calc.backspace()
+        self.assertEqual(self.calc.calculate()[1], "1.732050808")
+    
+    def test_editing_methods_return_text(self):
+        """Test that the input methods return the updated expression as a string."""
+        self.assertEqual(self.calc.insert_text("2"), "2")
+        self.assertEqual(self.calc.insert_function("sin("), "2sin(")
+        self.assertEqual(self.calc.memory_recall(), "2sin(M")
+        self.calc.move_cursor(-1)
+        self.assertEqual(self.calc.backspace(), "2M")
+        self.assertIs(type(self.calc.insert_text("+")), str)
+        self.assertEqual(self.calc.current_expression, "2+M")
+    
+    def test_long_expression_editing_is_linear(self):
+        """Test that typing a long expression parses each key once and never re-renders it."""
+        advance = IncrementalParser.advance
+        with patch.object(IncrementalParser, "advance", autospec=True, side_effect=advance) as advanced, \
+                patch.object(ExpressionBuffer, "tokens", side_effect=AssertionError("re-rendered")):
+            for _ in range(20000):
+                self.calc.insert_text("1")
+                self.calc.insert_text("+")
+                self.calc.display_expression(30)
+            self.calc.backspace()
+        # One parser step per key
+        self.assertEqual(advanced.call_count, 40000)
+        self.assertEqual(self.calc.calculate()[1], "20000")
+    
+    def test_preview_matches_calculate(self):
+        """Test that the live preview shows what calculate() would."""
+        self.calc.ans = 3
+        self.calc.memory = 2.5
+        for expression in ("2+3×4", "2^3^2", "-2^2", "50+10%", "sin(30", "2e-3×ANS",
+                           "√(M+1)", "(1+2)×(3", "1÷0", "2++", "5)", "π×2", "7.5%%"):
+            for mode in ("DEG", "RAD"):
+                self.calc.angle_mode = mode
+                self.calc.clear()
+                for char in expression:
+                    self.calc.insert_text(char)
+                expected = evaluate(expression, angle_mode=mode, ans=3, memory=2.5)
+                self.assertEqual(self.calc.preview(),
+                                 expected.formatted if expected.success else "", expression)
+    
+    def test_preview_follows_edits(self):
+        """Test that backspace and cursor moves keep the preview current."""
+        for char in "12+3":
+            self.calc.insert_text(char)
+        self.assertEqual(self.calc.preview(), "15")
+        self.calc.backspace()
+        self.assertEqual(self.calc.preview(), "")
+        self.calc.insert_function("sqrt(")
+        self.calc.insert_text("9")
+        self.assertEqual(self.calc.editor().depth, 1)
+        self.assertEqual(self.calc.preview(), "15")
+        self.calc.move_cursor_to(False)
+        self.calc.insert_text("-")
+        self.assertEqual(self.calc.preview(), "-9")
+        self.calc.set_angle_mode("RAD")
+        self.calc.current_expression = "cos(π"
+        self.assertEqual(self.calc.preview(), "")
+        self.calc.insert_text(")")
+        self.assertEqual(self.calc.preview(), "-1")
+        self.calc.calculate()
+        self.assertEqual(self.calc.preview(), "")
+    
+    def test_preview_skips_huge_results(self):
+        """Test that the preview refuses results too large to show quickly."""
+        for char in "9^9^9":
+            self.calc.insert_text(char)
+        self.assertEqual(self.calc.preview(), "")
+        self.calc.backspace()
+        self.calc.backspace()
+        self.assertEqual(self.calc.preview(), "387420489")
+    
+    def test_preview_per_keystroke_is_constant(self):
+        """Test that previewing while typing does not re-parse the whole expression."""
+        advance = IncrementalParser.advance
+        with patch.object(IncrementalParser, "advance", autospec=True, side_effect=advance) as advanced, \
+                patch("calculator.parse", side_effect=AssertionError("re-parsed")):
+            for _ in range(10000):
+                self.calc.insert_text("2")
+                self.calc.insert_text("×")
+                self.calc.preview()
+            self.calc.insert_text("1")
+            preview = self.calc.preview()
+        # Previews at the end of the expression parse nothing beyond the keys
+        self.assertEqual(advanced.call_count, 20001)
+        self.assertEqual(preview, self.calc.calculate()[1])
+    
+    # -------------------------------------------------------------------------
+    # Phase Timing Tests
+    # -------------------------------------------------------------------------
+    
+    def test_histogram_percentiles(self):
+        """Test that histogram buckets and percentiles are within 1% of the samples."""
+        for value in list(range(1000)) + [10 ** 6 + 7, 2 ** 40 - 1, 2 ** 40]:
+            low, high = bucket_bounds(bucket_index(value))
+            self.assertTrue(low <= value <= high, value)
+            self.assertLessEqual(high - low, value / 128)
+        histogram = Histogram()
+        for value in range(1, 100001):
+            histogram.record(value * 1000)
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 100000)
+        self.assertEqual((summary["min"], summary["max"]), (1, 100000))
+        self.assertAlmostEqual(summary["mean"], 50000.5)
+        for name, expected in (("p50", 50000), ("p90", 90000), ("p99", 99000), ("p99.9", 99900)):
+            self.assertLess(abs(summary[name] - expected) / expected, 0.01, name)
+        self.assertEqual(Histogram().percentile(99), 0)
+    
+    def test_phase_timing(self):
+        """Test that phases are only timed while timing is enabled."""
+        evaluate("1+1")
+        self.assertIsNone(timing_stats())
+        self.assertIsNone(self.calc.stats()["phases"])
+        enable_timing()
+        try:
+            self.calc.current_expression = "2+3×4"
+            self.assertEqual(self.calc.calculate(), (True, "14", ""))
+            self.calc.current_expression = "1÷0"
+            self.assertFalse(self.calc.calculate()[0])
+            stats = self.calc.stats()
+        finally:
+            disable_timing()
+        phases = stats["phases"]
+        self.assertEqual(phases["unit"], "us")
+        self.assertEqual(phases["errors"], 1)
+        counts = [phases["phases"][name]["count"] for name in ("prepare", "compile", "execute", "format")]
+        self.assertEqual(counts, [2, 2, 2, 1])
+        self.assertGreater(phases["phases"]["compile"]["max"], 0)
+        self.assertIn("hits", stats["cache"])
+        self.assertIsNone(timing_stats())
+    
+    def test_phase_timing_dump_at_exit(self):
+        """Test that CALC_TIMING writes the timings to a JSON file on exit."""
+        import json
+        import tempfile
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "timings.json")
+            subprocess.run(
+                [sys.executable, "-c", "import calculator; calculator.evaluate('2^10')"],
+                cwd=root, env=dict(os.environ, CALC_TIMING=path), check=True, timeout=60
+            )
+            with open(path, encoding="utf-8") as f:
+                dumped = json.load(f)
+        self.assertEqual(dumped["phases"]["execute"]["count"], 1)
+        self.assertEqual(dumped["errors"], 0)
+    
+    def test_phase_timing_dump_registered_once(self):
+        """Test that enabling timing again only replaces the dump path."""
+        with patch("atexit.register") as register, patch("calculator._timings_dump_path", None):
+            try:
+                enable_timing("first.json")
+                enable_timing("second.json")
+                enable_timing()
+                self.assertEqual(register.call_count, 1)
+                import calculator
+                self.assertEqual(calculator._timings_dump_path, "second.json")
+            finally:
+                disable_timing()
 
 if __name__ == '__main__':
     # Create a test suite
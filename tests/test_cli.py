@@ -0,0 +1,89 @@
+"""
+Unit tests for the headless command line interface
+Tests argument handling, the three input modes and that Tk is never imported
+"""
+
+import unittest
+import sys
+import os
+import subprocess
+from io import StringIO
+
+# Add the parent directory to the path to import the cli module
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import calculator
+from cli import main, parse_args
+
+
+class TestCommandLine(unittest.TestCase):
+    """Test cases for the cli module."""
+    
+    def tearDown(self):
+        """Re-enable the shared logger that main() silences."""
+        calculator.logger.disabled = False
+    
+    def run_cli(self, argv, stdin_text=""):
+        """Run main() with in-memory streams and return (code, stdout, stderr)."""
+        stdout, stderr = StringIO(), StringIO()
+        code = main(argv, StringIO(stdin_text), stdout, stderr)
+        return code, stdout.getvalue(), stderr.getvalue()
+    
+    def test_single_expression(self):
+        """Test evaluating one expression from the arguments."""
+        self.assertEqual(self.run_cli(["2+3×4"]), (0, "14\n", ""))
+        self.assertEqual(self.run_cli(["-5+3"])[1], "-2\n")
+    
+    def test_single_expression_error(self):
+        """Test that a failing expression reports on stderr with exit code 1."""
+        code, out, err = self.run_cli(["1÷0"])
+        self.assertEqual(code, 1)
+        self.assertEqual(out, "")
+        self.assertEqual(err, "Error: division by zero\n")
+    
+    def test_options(self):
+        """Test angle mode, precision, ANS and memory options."""
+        self.assertEqual(self.run_cli(["--rad", "sin(π/2)"])[1], "1\n")
+        self.assertEqual(self.run_cli(["--digits", "25", "2÷3"])[1], "0." + "6" * 24 + "7\n")
+        self.assertEqual(self.run_cli(["--ans", "7", "ANS×2"])[1], "14\n")
+        self.assertEqual(self.run_cli(["--memory", "3", "M+1"])[1], "4\n")
+    
+    def test_usage_errors(self):
+        """Test that bad options exit with code 2."""
+        self.assertEqual(self.run_cli(["--bogus"])[0], 2)
+        self.assertEqual(self.run_cli(["--ans"])[0], 2)
+        self.assertEqual(self.run_cli(["--ans", "abc"])[0], 2)
+        self.assertEqual(self.run_cli(["--digits", "0", "1"])[0], 2)
+        self.assertEqual(parse_args(["--", "-v"])["expression"], "-v")
+    
+    def test_stream_mode(self):
+        """Test evaluating stdin line by line with shared session state."""
+        code, out, _ = self.run_cli([], "2+2\nANS×10\n\nM+\nMR\n1÷0\n")
+        self.assertEqual(code, 1)
+        self.assertEqual(out.splitlines(), ["4", "40", "", "40", "40",
+                                            "Error: division by zero"])
+    
+    def test_stream_mode_angle_commands(self):
+        """Test switching angle mode in the middle of a stream."""
+        _, out, _ = self.run_cli([], "cos(0)\nRAD\ncos(π)\nAC\n")
+        self.assertEqual(out.splitlines(), ["1", "RAD", "-1", "0"])
+    
+    def test_stream_mode_named_slots(self):
+        """Test storing results in named memory slots and using them later."""
+        _, out, _ = self.run_cli([], "1÷8\nSTO rate\n200×rate\nSTO sin\n")
+        self.assertEqual(out.splitlines(),
+                         ["0.125", "0.125", "25", "Error: Invalid memory slot name: 'sin'"])
+    
+    def test_no_tkinter_import(self):
+        """Test that running the CLI never loads tkinter or the UI package."""
+        script = ("import sys, cli; cli.main(['1+1']); "
+                  "print(sorted(m for m in sys.modules "
+                  "if m.split('.')[0] in ('tkinter', '_tkinter', 'ui')))")
+        output = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.splitlines(), ["2", "[]"])
+
+
+if __name__ == '__main__':
+    unittest.main()
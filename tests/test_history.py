@@ -0,0 +1,133 @@
+"""
+Unit tests for the calculation history
+Tests recording, batching, searching and the calculator's use of the store
+"""
+
+import unittest
+import sys
+import os
+import math
+import tempfile
+
+# Add the parent directory to the path to import the history package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import Calculator
+from history import HistoryStore, numeric_value
+
+DAY = 86400
+
+
+class TestHistoryStore(unittest.TestCase):
+    """Test cases for history.store."""
+
+    def setUp(self):
+        """Open a store in a fresh directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history", "history.db")
+        self.store = HistoryStore(self.path)
+
+    def tearDown(self):
+        """Close the store and remove the database."""
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_record_and_search(self):
+        """Test recorded rows are found by prefix, value and time, newest first."""
+        store = self.store
+        store.record("2+3", "5", 5, timestamp=100.0)
+        store.record("2^10", "1024", 1024, angle_mode="RAD", latency=0.25, timestamp=200.0)
+        store.record("1÷0", "Division by zero", success=False, timestamp=300.0)
+        store.record("30+1", "31", 31, timestamp=400.0)
+        self.assertTrue(store.flush(timeout=5))
+
+        self.assertEqual(store.count(), 4)
+        self.assertEqual([e.expression for e in store.recent()], ["30+1", "1÷0", "2^10", "2+3"])
+
+        entry = store.search(prefix="2^")[0]
+        self.assertEqual(entry.expression, "2^10")
+        self.assertEqual(entry.value, 1024.0)
+        self.assertEqual(entry.angle_mode, "RAD")
+        self.assertEqual(entry.latency, 0.25)
+        self.assertTrue(entry.success)
+        self.assertEqual([e.expression for e in store.search(prefix="2")], ["2^10", "2+3"])
+
+        # Errors have no value, so value ranges never return them
+        self.assertEqual([e.expression for e in store.search(min_value=5, max_value=1024)],
+                         ["30+1", "2^10", "2+3"])
+        self.assertEqual([e.expression for e in store.search(max_value=31, since=150)], ["30+1"])
+        failed = store.search(since=250, until=400)
+        self.assertEqual(len(failed), 1)
+        self.assertFalse(failed[0].success)
+        self.assertIsNone(failed[0].value)
+        self.assertEqual(len(store.search(limit=2)), 2)
+
+        generation = store.generation
+        store.clear()
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(store.recent(), [])
+        self.assertEqual(store.generation, generation + 1)
+        store.record("1+1", "2", 2)
+        store.flush()
+        self.assertEqual(store.last_id(), 1)
+
+    def test_value_range_over_days(self):
+        """Test value ranges within time ranges match a plain scan."""
+        store = self.store
+        rows = [(i * 3600.0 * 7, i * 37 % 101) for i in range(200)]
+        for timestamp, value in rows:
+            store.record(f"{value}", str(value), value, timestamp=DAY * 1000 + timestamp)
+        store.flush()
+
+        for since, until in [(0, None), (DAY * 1005.5, DAY * 1020.25), (DAY * 1040, None)]:
+            with self.subTest(since=since, until=until):
+                expected = [v for t, v in reversed(rows)
+                            if DAY * 1000 + t >= since
+                            and (until is None or DAY * 1000 + t < until)
+                            and 20 <= v <= 60]
+                found = store.search(min_value=20, max_value=60, since=since, until=until,
+                                     limit=None)
+                self.assertEqual([e.value for e in found], expected)
+
+    def test_numeric_values(self):
+        """Test how results are stored for range searches."""
+        from fractions import Fraction
+        from decimal import Decimal
+        self.assertEqual(numeric_value(Fraction(1, 4)), 0.25)
+        self.assertEqual(numeric_value(Decimal("1.5")), 1.5)
+        self.assertEqual(numeric_value(3 ** 5000), math.inf)
+        self.assertEqual(numeric_value(-(3 ** 5000)), -math.inf)
+        self.assertIsNone(numeric_value(None))
+
+    def test_reopen_and_close(self):
+        """Test close() writes queued rows and a reopened store sees them."""
+        self.store.record("1+1", "2", 2)
+        self.store.close()
+        self.store.close()
+        with self.assertRaises(RuntimeError):
+            self.store.record("1+2", "3", 3)
+
+        self.store = HistoryStore(self.path)
+        self.assertEqual(self.store.count(), 1)
+        self.store.record("1+2", "3", 3)
+        self.store.flush()
+        self.assertEqual([e.id for e in self.store.recent()], [2, 1])
+
+    def test_calculator_records_history(self):
+        """Test calculate() records successes and errors with their latency."""
+        calculator = Calculator(history=self.store)
+        calculator.power_on = True
+        calculator.current_expression = "6×7"
+        calculator.calculate()
+        calculator.angle_mode = "RAD"
+        calculator.current_expression = "1÷0"
+        calculator.calculate()
+        self.store.flush()
+
+        error, success = self.store.recent()
+        self.assertEqual((success.expression, success.result, success.value), ("6×7", "42", 42.0))
+        self.assertEqual(success.angle_mode, "DEG")
+        self.assertGreater(success.latency, 0)
+        self.assertEqual(error.expression, "1÷0")
+        self.assertEqual(error.angle_mode, "RAD")
+        self.assertFalse(error.success)
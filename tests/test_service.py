@@ -0,0 +1,261 @@
+"""
+Unit tests for the calculation service
+Tests the line protocol, pipelining, sessions, HTTP and the worker pool
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+import json
+
+# Add the parent directory to the path to import the service package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import ExpressionCache, ResourceLimits
+from service import CalculatorService, SessionCalculator, SessionStore
+from service.loadgen import percentile, run_load
+
+
+class TestCalculatorService(unittest.IsolatedAsyncioTestCase):
+    """Test cases for service.server."""
+    
+    async def asyncSetUp(self):
+        """Start a service on a free local port."""
+        self.service = CalculatorService(workers=0)
+        server = await self.service.start("127.0.0.1", 0)
+        self.port = server.sockets[0].getsockname()[1]
+    
+    async def asyncTearDown(self):
+        """Stop the service."""
+        await self.service.close()
+    
+    async def exchange(self, lines):
+        """Send all lines at once (pipelined) and return the response lines."""
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write("".join(line + "\n" for line in lines).encode("utf-8"))
+        writer.write_eof()
+        data = await reader.read()
+        writer.close()
+        return data.decode("utf-8").splitlines()
+    
+    async def test_plain_lines_are_pipelined(self):
+        """Test bare expressions sent without waiting keep their order and ANS."""
+        responses = await self.exchange(["1+1", "ANS×3", "", "1÷0", "ANS+1"])
+        self.assertEqual(responses, ["2", "6", "Error: division by zero", "7"])
+    
+    async def test_json_requests(self):
+        """Test structured requests, commands and request ids."""
+        responses = await self.exchange([
+            json.dumps({"id": 1, "expression": "2^10"}),
+            json.dumps({"id": 2, "command": "m+"}),
+            json.dumps({"id": 3, "command": "rad"}),
+            json.dumps({"id": 4, "expression": "M+cos(π)"}),
+            json.dumps({"id": 5, "command": "jump"}),
+            json.dumps({"id": 6}),
+            "{not json",
+        ])
+        responses = [json.loads(line) for line in responses]
+        self.assertEqual(responses[0], {"id": 1, "ok": True, "result": "1024", "error": ""})
+        self.assertEqual(responses[1]["result"], "1024")
+        self.assertEqual(responses[2]["result"], "RAD")
+        self.assertEqual(responses[3]["result"], "1023")
+        self.assertFalse(responses[4]["ok"])
+        self.assertFalse(responses[5]["ok"])
+        self.assertIn("Invalid request", responses[6]["error"])
+    
+    async def test_named_sessions(self):
+        """Test that named sessions persist across connections and stay separate."""
+        await self.exchange([json.dumps({"session": "a", "expression": "40+2"})])
+        await self.exchange([json.dumps({"session": "b", "expression": "7"})])
+        responses = await self.exchange([
+            json.dumps({"session": "a", "expression": "ANS"}),
+            json.dumps({"session": "b", "expression": "ANS"}),
+        ])
+        self.assertEqual([json.loads(r)["result"] for r in responses], ["42", "7"])
+        # Connection sessions are dropped when their connection closes
+        self.assertEqual(sorted(self.service.sessions), ["a", "b"])
+    
+    async def test_http(self):
+        """Test keep-alive HTTP requests on the same port."""
+        body = json.dumps({"expression": "6×7"})
+        request = (f"POST /evaluate HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n{body}"
+                   "GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(request.encode("utf-8"))
+        data = (await reader.read()).decode("utf-8")
+        writer.close()
+        self.assertEqual(data.count("HTTP/1.1 200 OK"), 2)
+        self.assertIn('"result": "42"', data)
+        self.assertIn('"sessions"', data)
+        self.assertIn("Connection: close", data)
+    
+    async def test_heavy_expressions_use_worker_pool(self):
+        """Test that expressions above heavy_digits are evaluated in the pool."""
+        service = CalculatorService(ResourceLimits(heavy_digits=10), workers=1)
+        try:
+            self.assertEqual(await service.evaluate("s", "2^10"), (True, "1024", ""))
+            self.assertEqual(service.offloaded, 0)
+            # Constant powers are folded when compiling, so use a register
+            self.assertEqual(await service.evaluate("s", "ANS^10"), (True, str(2 ** 100), ""))
+            self.assertEqual(service.offloaded, 1)
+            self.assertEqual(service.sessions.pop("s"), 2 ** 100)
+            self.assertEqual(service.locks, {})
+        finally:
+            await service.close()
+    
+    async def test_heavy_check_uses_session_backend(self):
+        """Test that the heavy check compiles with the session's Decimal backend."""
+        service = CalculatorService(ResourceLimits(heavy_digits=10), workers=1)
+        try:
+            cache = ExpressionCache()
+            with service.sessions.use("d") as session:
+                session.set_precision(30)
+                session.ans = 3
+                session.cache = cache
+                self.assertFalse(service.is_heavy(session, "ANS^2+1"))
+                session.current_expression = "ANS^2+1"
+                self.assertEqual(session.calculate()[1], "10")
+            # The evaluation reused the program compiled by the check
+            self.assertEqual((cache.misses, cache.hits), (1, 1))
+        finally:
+            await service.close()
+    
+    async def test_heavy_check_without_powers(self):
+        """Test that Decimal trig calls on huge arguments count as heavy."""
+        service = CalculatorService(ResourceLimits(heavy_digits=1000), workers=1)
+        try:
+            with service.sessions.use("d") as session:
+                session.set_precision(20)
+                session.ans = 10 ** 5000
+                self.assertTrue(service.is_heavy(session, "sin(ANS)"))
+                self.assertFalse(service.is_heavy(session, "sin(M)"))
+        finally:
+            await service.close()
+    
+    async def test_overrunning_worker_is_killed(self):
+        """Test that a timed-out evaluation kills its worker and the pool is replaced."""
+        limits = ResourceLimits(max_digits=10**9, heavy_digits=10, deadline=0.5)
+        service = CalculatorService(limits, workers=1)
+        try:
+            with service.sessions.use("s") as session:
+                session.ans = 3
+            success, result, error = await service.evaluate("s", "ANS^(2^28)")
+            self.assertFalse(success)
+            self.assertIn("exceeded", error)
+            self.assertIsNone(service.pool)
+            self.assertEqual(await service.evaluate("s", "ANS^20"), (True, str(3 ** 20), ""))
+        finally:
+            await service.close()
+    
+    async def test_broken_pool_is_reported(self):
+        """Test that a worker dying mid-evaluation gives an error reply."""
+        limits = ResourceLimits(max_digits=10**9, heavy_digits=10, deadline=30.0)
+        service = CalculatorService(limits, workers=1)
+        try:
+            with service.sessions.use("s") as session:
+                session.ans = 3
+            task = asyncio.create_task(service.evaluate("s", "ANS^(2^28)"))
+            while service.pool is None or not service.pool._processes:
+                await asyncio.sleep(0.01)
+            pool = service.pool
+            for process in list(pool._processes.values()):
+                process.kill()
+            success, result, error = await task
+            self.assertFalse(success)
+            self.assertEqual(error, "evaluation worker stopped")
+            self.assertIsNot(service.pool, pool)
+            self.assertEqual(await service.evaluate("s", "ANS^20"), (True, str(3 ** 20), ""))
+        finally:
+            await service.close()
+    
+    async def test_load_generator(self):
+        """Test the load generator against the service."""
+        report = await run_load(port=self.port, connections=3, requests=100, pipeline=8)
+        self.assertEqual((report.requests, report.errors), (100, 0))
+        self.assertLessEqual(percentile(report.latencies, 0.5), report.latencies[-1])
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test cases for service.sessions."""
+    
+    def setUp(self):
+        """Create a store driven by a fake clock."""
+        self.now = 0.0
+        self.store = SessionStore(max_sessions=3, ttl=10.0, clock=lambda: self.now)
+    
+    def test_sessions_share_one_calculator(self):
+        """Test that each session keeps its registers while one calculator runs them."""
+        with self.store.use("a") as calculator:
+            self.assertIsInstance(calculator, SessionCalculator)
+            self.assertTrue(calculator.power_on)
+            calculator.current_expression = "2^60"
+            calculator.calculate()
+        with self.store.use("b") as other:
+            self.assertIs(other, calculator)
+            self.assertEqual((other.ans, other.result_value, other.current_expression), (0, None, ""))
+            other.set_angle_mode("RAD")
+            other.current_expression = "1÷4"
+            other.calculate()
+            other.memory_add()
+        # The usual state after a calculation is stored as the bare result
+        self.assertEqual(self.store.get("a"), 2 ** 60)
+        self.assertEqual(self.store.get("b"), (0.25, 0.25, 0.25, "RAD", None, None))
+        with self.store.use("a") as calculator:
+            self.assertEqual((calculator.ans, calculator.memory_add()), (2 ** 60, str(2 ** 60)))
+            self.assertEqual(calculator.angle_mode, "DEG")
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used session is evicted when full."""
+        for name in "abc":
+            self.store.get(name)
+        self.store.get("a")
+        self.store.get("d")
+        self.assertEqual(list(self.store), ["c", "a", "d"])
+        self.assertEqual(self.store.stats()["evictions"], 1)
+    
+    def test_idle_expiry(self):
+        """Test that idle sessions expire as later lookups arrive."""
+        self.store.get("a")
+        self.now = 5.0
+        self.store.get("b")
+        self.now = 12.0
+        self.store.get("b")
+        self.assertNotIn("a", self.store)
+        self.assertIn("b", self.store)
+        self.now = 30.0
+        self.assertEqual(self.store.expire(), 1)
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.stats()["expirations"], 2)
+    
+    def test_expiry_between_marks(self):
+        """Test that sessions expire at most one resolution after their TTL."""
+        store = SessionStore(ttl=10.0, clock=lambda: self.now, resolution=2.0)
+        for self.now, name in ((0.0, "a"), (1.0, "b"), (2.5, "c"), (3.0, "d")):
+            store.get(name)
+        self.now = 10.5
+        # a was used at 0 but shares a time window with b, so it waits for b
+        self.assertEqual(store.expire(), 0)
+        self.now = 11.5
+        self.assertEqual(store.expire(), 2)
+        self.assertEqual(list(store), ["c", "d"])
+        self.now = 13.0
+        # Likewise c waits for d
+        self.assertEqual(store.expire(), 0)
+        self.now = 13.5
+        self.assertEqual(store.expire(), 2)
+        self.assertEqual(list(store), [])
+        self.assertEqual(len(store), 0)
+    
+    def test_pop(self):
+        """Test removing a session."""
+        with self.store.use("a") as calculator:
+            calculator.current_expression = "6×7"
+            calculator.calculate()
+        self.assertEqual(self.store.pop("a"), 42)
+        self.assertIsNone(self.store.pop("a"))
+        self.assertEqual(len(self.store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,14 +7,21 @@ import unittest
 import sys
 import os
 import tkinter as tk
+import threading
+import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, MagicMock, patch
 
 # Add the parent directory to the path to import modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ui.components.calculator_face import CalculatorFace
-from utils.styles import FACE_EXPRESSIONS, OPERATION_REACTIONS, ARCADE_COLORS
+from ui.components.history_panel import HistoryPanel
+from history import HistoryEntry
+from utils.styles import FACE_EXPRESSIONS, OPERATION_REACTIONS, ARCADE_COLORS, HISTORY_PANEL
 from calculator import Calculator
+from ui.calculator_ui import CalculatorUI
 
 
 class TestCalculatorFace(unittest.TestCase):
@@ -352,6 +359,298 @@ class TestUIIntegration(unittest.TestCase):
                 face.face_display.config.assert_called()
 
 
+class TestAsyncCalculation(unittest.TestCase):
+    """Test cases for background calculation in CalculatorUI."""
+    
+    def setUp(self):
+        """Build a CalculatorUI with mocked widgets, without a Tk window."""
+        self.calculator = Calculator()
+        self.calculator.power_on = True
+        
+        self.ui = CalculatorUI.__new__(CalculatorUI)
+        self.ui.root = Mock()
+        self.ui.calculator = self.calculator
+        self.ui.logger = logging.getLogger(__name__)
+        self.ui.colors = ARCADE_COLORS
+        self.ui.is_animating = False
+        self.ui.calc_count = 0
+        self.ui.executor = ThreadPoolExecutor(max_workers=2)
+        self.ui.calc_job = None
+        self.ui.calc_job_started = 0.0
+        self.ui.computing_shown = False
+        self.ui.pre_computing_text = ""
+        self.ui.preview_job = None
+        self.ui.history_panel = None
+        self.ui.history_shown = False
+        for widget in ("result_display", "expr_display", "screen_frame", "score_label", "face"):
+            setattr(self.ui, widget, Mock())
+        self.ui.result_display.cget.return_value = "0"
+    
+    def tearDown(self):
+        """Shut down the background executor."""
+        self.ui.executor.shutdown(wait=True)
+    
+    def run_scheduled(self):
+        """Run the most recent root.after callback, as the Tk loop would."""
+        args = self.ui.root.after.call_args[0]
+        args[1](*args[2:])
+    
+    def test_calculate_does_not_block(self):
+        """Test that calculate() returns before the result is computed."""
+        release = threading.Event()
+        self.ui.executor.submit(release.wait)
+        self.ui.executor.submit(release.wait)   # Occupy both workers
+        
+        self.calculator.current_expression = "6×7"
+        self.ui.calculate()
+        self.assertIsNotNone(self.ui.calc_job)
+        self.ui.face.react_to_calculation.assert_not_called()
+        self.assertFalse(self.calculator.result_shown)
+        release.set()
+    
+    def test_result_delivered_on_poll(self):
+        """Test that the result and face reaction arrive via root.after."""
+        self.calculator.current_expression = "6×7"
+        self.ui.calculate()
+        self.ui.calc_job.result(timeout=5)
+        self.run_scheduled()
+        
+        self.ui.result_display.config.assert_called_with(text="42")
+        self.ui.face.react_to_calculation.assert_called_once_with("42")
+        self.assertEqual(self.calculator.result, "42")
+        self.assertIsNone(self.ui.calc_job)
+    
+    def test_computing_indicator_for_slow_jobs(self):
+        """Test that the indicator appears while a job is still running."""
+        release = threading.Event()
+        self.ui.calc_job = self.ui.executor.submit(release.wait)
+        self.ui.calc_job_started = 0.0   # Started long ago
+        self.ui.poll_calculation(self.ui.calc_job)
+        self.ui.result_display.config.assert_called_with(text="COMPUTING...")
+        self.assertTrue(self.ui.computing_shown)
+        release.set()
+    
+    def test_keypress_cancels_stale_job(self):
+        """Test that typing abandons a pending calculation."""
+        release = threading.Event()
+        stale = self.ui.executor.submit(release.wait)
+        self.ui.calc_job = stale
+        self.ui.computing_shown = True
+        self.ui.pre_computing_text = "12"
+        
+        self.ui.insert_text("5")
+        self.assertIsNone(self.ui.calc_job)
+        self.ui.result_display.config.assert_called_with(text="12")
+        
+        # The stale job's poll is ignored once it finishes
+        release.set()
+        stale.result(timeout=5)
+        self.ui.poll_calculation(stale)
+        self.ui.face.react_to_calculation.assert_not_called()
+    
+    def test_calculation_waits_while_workers_busy(self):
+        """Test that abandoned running jobs delay, but do not lose, a new calculation."""
+        release = threading.Event()
+        started = threading.Semaphore(0)
+        
+        def job():
+            started.release()
+            release.wait()
+        
+        jobs = [self.ui.executor.submit(job) for _ in range(2)]
+        for _ in jobs:
+            self.assertTrue(started.acquire(timeout=5))
+        for job_future in jobs:
+            self.ui.calc_job = job_future
+            self.ui.cancel_calculation()   # Running, so it keeps its worker
+            self.assertFalse(job_future.cancelled())
+        
+        self.calculator.current_expression = "6×7"
+        self.ui.calculate()
+        queued = self.ui.calc_job
+        self.ui.calc_job_started = 0.0   # Started long ago
+        self.run_scheduled()
+        self.assertFalse(queued.running())
+        self.ui.result_display.config.assert_called_with(text="COMPUTING...")
+        
+        # Cancelling a calculation that is still queued drops it
+        self.ui.cancel_calculation()
+        self.assertTrue(queued.cancelled())
+        
+        self.ui.calculate()
+        release.set()
+        self.ui.calc_job.result(timeout=5)
+        self.run_scheduled()
+        self.ui.result_display.config.assert_called_with(text="42")
+        self.assertEqual(self.calculator.result, "42")
+    
+    def test_empty_expression_reports_immediately(self):
+        """Test that an empty expression is reported without a background job."""
+        self.ui.calculate()
+        self.assertIsNone(self.ui.calc_job)
+        self.ui.face.react_to_error.assert_called_once()
+    
+    def test_cursor_keys_redraw_expression(self):
+        """Test that moving the cursor shows the marker in the expression display."""
+        self.ui.insert_text("12")
+        self.ui.move_cursor(-1)
+        self.ui.insert_text("+")
+        self.ui.expr_display.config.assert_called_with(text="1+▏2")
+        self.ui.move_cursor_to(True)
+        self.ui.expr_display.config.assert_called_with(text="1+2")
+    
+    def test_live_preview_is_debounced(self):
+        """Test that the preview is shown once typing pauses, not on every key."""
+        self.ui.root.after.side_effect = ["job1", "job2", "job3"]
+        for char in "6×7":
+            self.ui.insert_text(char)
+        self.assertEqual(self.ui.root.after_cancel.call_count, 2)
+        self.ui.root.after_cancel.assert_called_with("job2")
+        self.ui.expr_display.config.assert_called_with(text="6×7")
+        self.run_scheduled()
+        self.ui.expr_display.config.assert_called_with(text="6×7 = 42")
+        self.assertIsNone(self.ui.preview_job)
+    
+    def test_copy_result_streams_every_digit(self):
+        """Test that copying a huge result puts all its digits on the clipboard in chunks."""
+        self.calculator.current_expression = "7^20000"
+        self.calculator.calculate()
+        self.ui.copy_result()
+        self.ui.root.clipboard_clear.assert_called_once()
+        chunks = [call[0][0] for call in self.ui.root.clipboard_append.call_args_list]
+        self.assertGreater(len(chunks), 0)
+        text = "".join(chunks)
+        self.assertEqual((len(text), text[-4:]), (16902, "0001"))
+    
+    def test_undo_redo_update_displays(self):
+        """Test that undo and redo bring back a cleared expression and result."""
+        self.calculator.current_expression = "6×7"
+        self.calculator.calculate()
+        self.ui.all_clear()
+        self.ui.undo()
+        self.ui.expr_display.config.assert_called_with(text="6×7")
+        self.ui.result_display.config.assert_called_with(text="42")
+        self.ui.redo()
+        self.ui.result_display.config.assert_called_with(text="0")
+    
+    def test_recall_history_entry_replaces_result(self):
+        """Test that recalling a history entry while a result is shown starts a new expression."""
+        for expression in ("sin(30)", "21+1"):
+            self.calculator.current_expression = "2+3"
+            self.calculator.calculate()
+            self.ui.recall_history_entry(HistoryEntry(1, 0.0, expression, "", None, "DEG", 0.0, True))
+            self.assertEqual(self.calculator.current_expression, expression)
+            self.ui.expr_display.config.assert_called_with(text=expression)
+        self.ui.recall_history_entry(HistoryEntry(2, 0.0, "×2", "", None, "DEG", 0.0, True))
+        self.assertEqual(self.calculator.current_expression, "21+1×2")
+    
+    def test_history_needs_a_store(self):
+        """Test that the history panel is not built without a history store."""
+        self.ui.toggle_history()
+        self.assertIsNone(self.ui.history_panel)
+        self.ui.face.show_expression.assert_called_once()
+
+
+class FakeHistory:
+    """Stands in for a HistoryStore, making up entries on request."""
+    
+    def __init__(self, total):
+        self.total = total
+        self.reads = 0
+        self.generation = 0
+    
+    def last_id(self):
+        return self.total
+    
+    def count(self):
+        return self.total
+    
+    def entries(self, first_id, last_id):
+        self.reads += 1
+        return [HistoryEntry(i, float(i), f"{i}+1", str(i + 1), i + 1.0, "DEG", 0.0, i % 10 != 0)
+                for i in range(first_id, min(last_id, self.total) + 1)]
+
+
+class TestHistoryPanel(unittest.TestCase):
+    """Test cases for the virtualized HistoryPanel component."""
+    
+    def setUp(self):
+        """Build a panel over a million-entry history, with a mocked canvas."""
+        self.store = FakeHistory(1_000_000)
+        self.selected = []
+        with patch('tkinter.Frame'), patch('tkinter.Label'), patch('tkinter.Scrollbar'), \
+                patch('tkinter.Canvas'):
+            self.panel = HistoryPanel(Mock(), self.store, ARCADE_COLORS, None,
+                                      on_select=self.selected.append)
+        self.panel.canvas = Mock()
+        self.panel.canvas.create_text.side_effect = itertools.count(1)
+        self.panel.refresh()
+        self.panel.on_resize(Mock(width=260, height=220))
+    
+    def shown(self):
+        """Return the expressions on screen, top to bottom."""
+        texts = {}
+        for call in self.panel.canvas.itemconfigure.call_args_list:
+            texts[call[0][0]] = call[1]["text"]
+        panel = self.panel
+        first = panel.offset // panel.row_height
+        rows = [panel.rows[p % len(panel.rows)][0]
+                for p in range(first, first + panel.height // panel.row_height)]
+        return [texts[item] for item in rows]
+    
+    def test_rows_are_pooled(self):
+        """Test that scrolling anywhere reuses the same canvas items."""
+        self.assertEqual(self.panel.canvas.create_text.call_count, 2 * 12)
+        self.assertEqual(self.shown()[:2], ["1000000+1", "999999+1"])
+        
+        self.panel.yview("moveto", "0.5")
+        self.assertEqual(self.shown()[0], "500000+1")
+        self.panel.yview("scroll", "1", "pages")
+        self.assertEqual(self.shown()[0], "499991+1")
+        for _ in range(200):
+            self.panel.on_wheel(Mock(num=5, delta=0))
+        self.panel.yview("moveto", "1.0")
+        self.assertEqual(self.shown()[-1], "1+1")
+        
+        self.assertEqual(self.panel.canvas.create_text.call_count, 2 * 12)
+        self.assertLessEqual(len(self.panel.pages), HISTORY_PANEL["cached_pages"])
+    
+    def test_scrolling_one_row_relabels_one_row(self):
+        """Test that a small scroll only changes the rows coming into view."""
+        self.panel.canvas.itemconfigure.reset_mock()
+        reads = self.store.reads
+        self.panel.scroll_rows(1)
+        self.assertEqual(self.panel.canvas.itemconfigure.call_count, 2)
+        self.assertEqual(self.store.reads, reads)
+    
+    def test_new_entries(self):
+        """Test that the top follows new entries and a scrolled view stays put."""
+        self.store.total += 5
+        self.panel.refresh()
+        self.assertEqual(self.shown()[0], "1000005+1")
+        
+        self.panel.scroll_rows(100)
+        before = self.shown()
+        self.store.total += 3
+        self.panel.refresh()
+        self.assertEqual(self.shown(), before)
+    
+    def test_clear_is_noticed_when_ids_catch_up(self):
+        """Test that a cleared history is re-read even once it is as long as before."""
+        self.panel.scroll_rows(100)
+        pages = len(self.panel.pages)
+        self.store.generation += 1
+        self.panel.refresh()
+        self.assertEqual(self.panel.offset, 0)
+        self.assertLess(len(self.panel.pages), pages)
+        self.assertEqual(self.shown()[0], "1000000+1")
+    
+    def test_click_selects_entry(self):
+        """Test that clicking a row passes its entry to on_select."""
+        self.panel.on_click(Mock(y=HISTORY_PANEL["row_height"] * 2 + 3))
+        self.assertEqual(self.selected[0].id, 999998)
+
+
 if __name__ == '__main__':
     # Create test suite
     loader = unittest.TestLoader()
@@ -361,6 +660,8 @@ if __name__ == '__main__':
     suite.addTests(loader.loadTestsFromTestCase(TestCalculatorFace))
     suite.addTests(loader.loadTestsFromTestCase(TestStylesConfiguration))
     suite.addTests(loader.loadTestsFromTestCase(TestUIIntegration))
+    suite.addTests(loader.loadTestsFromTestCase(TestAsyncCalculation))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistoryPanel))
     
     # Run tests with verbose output
     runner = unittest.TextTestRunner(verbosity=2)
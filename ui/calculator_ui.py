@@ -8,14 +8,16 @@ from tkinter import font
 import logging
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
 
 # Import UI components
 from .components.calculator_face import CalculatorFace
+from .components.history_panel import HistoryPanel
 
 # Import style definitions
 from utils.styles import (
     ARCADE_COLORS, BASIC_COLORS, FONTS, 
-    BUTTON_CONFIGS, ANIMATION
+    BUTTON_CONFIGS, ANIMATION, DISPLAY, HISTORY_PANEL
 )
 
 class CalculatorUI:
@@ -87,6 +89,20 @@ class CalculatorUI:
         # Initialize arcade mode
         self.arcade_mode = True
         
+        # Background calculation state (keeps the Tk thread free while evaluating)
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="calc")
+        self.calc_job = None              # Future of the calculation in progress
+        self.calc_job_started = 0.0       # When it was started (time.monotonic)
+        self.computing_shown = False      # Whether the COMPUTING indicator is up
+        self.pre_computing_text = ""      # Result text to restore if cancelled
+        
+        # Live preview of the result while typing (debounced)
+        self.preview_job = None           # Pending root.after id, if any
+        
+        # History side panel, built the first time it is opened
+        self.history_panel = None
+        self.history_shown = False
+        
     def create_fonts(self):
         """Create custom pixel-style fonts for Game Boy aesthetic."""
         try:
@@ -592,6 +608,8 @@ class CalculatorUI:
         
         # Restore game colors
         self.screen_frame.config(bg=self.colors["display_bg"])
+        if self.history_panel is not None:
+            self.history_panel.set_colors(self.colors)
         self.result_display.config(fg=self.colors["accent1"])
         self.title_label.config(text="CALC-BOY COLOR")
         
@@ -615,6 +633,8 @@ class CalculatorUI:
         self.screen_frame.config(bg="#111111")  # Dark but not pure black
         self.result_display.config(fg="#FFFFFF")  # White text
         self.title_label.config(text="BASIC CALC")
+        if self.history_panel is not None:
+            self.history_panel.set_colors(self.colors)
         
         # Hide scan line
         self.scan_line.place_forget()
@@ -654,6 +674,7 @@ class CalculatorUI:
         if not self.calculator.power_on:
             return
             
+        self.cancel_calculation()
         self.calculator.set_angle_mode(mode)
         
         if mode == "DEG":
@@ -680,6 +701,7 @@ class CalculatorUI:
     
     def toggle_power(self):
         """Toggle power with animation effects."""
+        self.cancel_calculation()
         new_power_state = self.calculator.toggle_power()
         
         # React to power state change
@@ -699,10 +721,11 @@ class CalculatorUI:
             return
             
         # Update calculator state
+        self.cancel_calculation()
         self.calculator.insert_text(text)
         
         # Update display
-        self.expr_display.config(text=self.calculator.current_expression)
+        self.show_expression()
         
         # React to operation buttons
         if text in ["+", "-", "×", "÷", "^", "%"]:
@@ -714,10 +737,45 @@ class CalculatorUI:
             return
             
         # Update calculator state
+        self.cancel_calculation()
         self.calculator.insert_function(func)
         
         # Update display
-        self.expr_display.config(text=self.calculator.current_expression)
+        self.show_expression()
+    
+    def move_cursor(self, steps):
+        """Move the editing cursor by whole tokens (negative moves left)."""
+        if not self.calculator.power_on:
+            return
+        self.calculator.move_cursor(steps)
+        self.show_expression()
+    
+    def move_cursor_to(self, end):
+        """Move the editing cursor to the start or the end of the expression."""
+        if not self.calculator.power_on:
+            return
+        self.calculator.move_cursor_to(end)
+        self.show_expression()
+    
+    def show_expression(self):
+        """Show the part of the expression around the cursor."""
+        self.expr_display.config(text=self.calculator.display_expression(
+            DISPLAY["expression_chars"], DISPLAY["cursor_marker"]))
+        
+        # Restart the preview timer so fast typing only previews once
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(ANIMATION["preview_delay"], self.show_preview)
+    
+    def show_preview(self):
+        """Append the live result preview to the expression display."""
+        self.preview_job = None
+        preview = self.calculator.preview()
+        # Incomplete expressions keep the plain expression already shown
+        if preview:
+            self.expr_display.config(text=self.calculator.display_expression(
+                DISPLAY["expression_chars"], DISPLAY["cursor_marker"])
+                + DISPLAY["preview_separator"] + preview)
     
     def clear(self):
         """Clear the current expression."""
@@ -725,6 +783,7 @@ class CalculatorUI:
             return
             
         # Update calculator state
+        self.cancel_calculation()
         self.calculator.clear()
         
         # Update display
@@ -739,6 +798,7 @@ class CalculatorUI:
             return
             
         # Update calculator state
+        self.cancel_calculation()
         expr, result = self.calculator.all_clear()
         
         # Update display
@@ -754,19 +814,131 @@ class CalculatorUI:
             return
             
         # Update calculator state
+        self.cancel_calculation()
         self.calculator.backspace()
         
         # Update display
-        self.expr_display.config(text=self.calculator.current_expression)
+        self.show_expression()
+    
+    def undo(self):
+        """Undo the last change (Ctrl+Z)."""
+        self.restore_step(self.calculator.undo)
+    
+    def redo(self):
+        """Redo the last undone change (Ctrl+Y)."""
+        self.restore_step(self.calculator.redo)
+    
+    def restore_step(self, step):
+        """Run calculator.undo or calculator.redo and show the restored state."""
+        if not self.calculator.power_on:
+            return
+        
+        self.cancel_calculation()
+        if step():
+            self.show_expression()
+            self.result_display.config(text=self.calculator.result or "0")
     
     def calculate(self):
-        """Calculate the result of the expression."""
+        """Start calculating the expression in the background."""
         if not self.calculator.power_on:
             return
-            
-        # Calculate expression - call the calculator logic's calculate method
-        success, result, error = self.calculator.calculate()
         
+        # A new calculation replaces one that is still running
+        self.cancel_calculation()
+        
+        future = self.calculator.calculate_async(self.executor)
+        if future is None:
+            # Nothing to calculate - report it right away
+            self.show_calculation_result(*self.calculator.calculate())
+            return
+        
+        self.calc_job = future
+        self.calc_job_started = time.monotonic()
+        self.root.after(ANIMATION["calc_poll_interval"], self.poll_calculation, future)
+    
+    def poll_calculation(self, future):
+        """Check a background calculation and deliver its result when done."""
+        # Ignore jobs that were cancelled or replaced
+        if future is not self.calc_job:
+            return
+        
+        if not future.done():
+            # Only show the indicator for slow calculations to avoid flicker
+            elapsed_ms = (time.monotonic() - self.calc_job_started) * 1000
+            if not self.computing_shown and elapsed_ms >= ANIMATION["computing_delay"]:
+                self.pre_computing_text = self.result_display.cget("text")
+                self.result_display.config(text="COMPUTING...")
+                self.computing_shown = True
+            self.root.after(ANIMATION["calc_poll_interval"], self.poll_calculation, future)
+            return
+        
+        self.calc_job = None
+        self.computing_shown = False
+        outcome = future.result()
+        latency = time.monotonic() - self.calc_job_started
+        self.show_calculation_result(*self.calculator.apply_result(outcome, latency))
+    
+    def copy_result(self):
+        """Copy the last result, with every digit, to the clipboard."""
+        if not self.calculator.power_on or self.calculator.result_value is None:
+            return
+        self.root.clipboard_clear()
+        # Huge integers arrive in chunks rather than as one giant string
+        for chunk in self.calculator.result_chunks():
+            self.root.clipboard_append(chunk)
+    
+    def toggle_history(self):
+        """Show or hide the history panel beside the cabinet."""
+        store = self.calculator.history
+        if store is None:
+            self.face.show_expression("confused", "No history! 📜")
+            return
+        
+        width = HISTORY_PANEL["width"]
+        if self.history_panel is None:
+            self.history_panel = HistoryPanel(
+                self.root, store, self.colors, self.small_font, on_select=self.recall_history_entry)
+        
+        self.history_shown = not self.history_shown
+        if self.history_shown:
+            self.root.geometry(f"{500 + width}x650")
+            self.history_panel.frame.place(x=500, y=0, width=width, height=650)
+            self.history_panel.show()
+        else:
+            self.history_panel.hide()
+            self.history_panel.frame.place_forget()
+            self.root.geometry("500x650")
+    
+    def recall_history_entry(self, entry):
+        """Insert the expression of a history entry at the cursor, replacing a shown result."""
+        if not self.calculator.power_on:
+            return
+        self.cancel_calculation()
+        self.calculator.insert_expression(entry.expression)
+        self.show_expression()
+    
+    def cancel_calculation(self):
+        """
+        Abandon the calculation in progress, if any.
+        
+        A job still waiting for a worker is dropped. A running job cannot
+        be interrupted (Python threads cannot be stopped), so it keeps its
+        worker until it finishes and its result is ignored; the resource
+        limits bound how long that takes. While both workers are busy with
+        abandoned jobs a new calculation waits behind them, showing
+        COMPUTING..., and is delivered as soon as a worker is free.
+        """
+        if self.calc_job is None:
+            return
+        
+        self.calc_job.cancel()
+        self.calc_job = None
+        if self.computing_shown:
+            self.result_display.config(text=self.pre_computing_text)
+            self.computing_shown = False
+    
+    def show_calculation_result(self, success, result, error):
+        """Display a finished calculation and react to it."""
         if success:
             # Increment calculation count and update score
             try:
@@ -819,12 +991,22 @@ class CalculatorUI:
         self.root.bind("<BackSpace>", lambda e: self.backspace())
         self.root.bind("<Escape>", lambda e: self.all_clear())
         self.root.bind("<Delete>", lambda e: self.clear())
+        self.root.bind("<Control-c>", lambda e: self.copy_result())
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
+        
+        # Cursor movement
+        self.root.bind("<Left>", lambda e: self.move_cursor(-1))
+        self.root.bind("<Right>", lambda e: self.move_cursor(1))
+        self.root.bind("<Home>", lambda e: self.move_cursor_to(False))
+        self.root.bind("<End>", lambda e: self.move_cursor_to(True))
         
         # Function keys
         self.root.bind("<F1>", lambda e: self.toggle_power())
         self.root.bind("<F2>", lambda e: self.toggle_angle_mode("DEG"))
         self.root.bind("<F3>", lambda e: self.toggle_angle_mode("RAD"))
         self.root.bind("<F4>", lambda e: self.toggle_calculator_mode())
+        self.root.bind("<F5>", lambda e: self.toggle_history())
     
     def handle_key_press(self, key):
         """Handle keyboard input."""
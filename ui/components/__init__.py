@@ -4,4 +4,5 @@ Individual UI components that make up the calculator interface
 """
 
 # Import components for easy access
-from .calculator_face import CalculatorFace
\ No newline at end of file
+from .calculator_face import CalculatorFace
+from .history_panel import HistoryPanel
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+Game-Style Calculator - History Panel Component
+A scrolling list of past calculations that stays fast at any history size
+"""
+
+import tkinter as tk
+from collections import OrderedDict
+from utils.styles import HISTORY_PANEL
+
+
+def clip(text, limit):
+    """Shorten text to at most limit characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class HistoryPanel:
+    """
+    A virtualized view of the calculation history.
+
+    Only the rows that fit on screen exist: a fixed pool of canvas text
+    items is moved and relabelled as the view scrolls, and entries are read
+    from the history store a page at a time, so opening or scrolling a
+    history of millions of entries costs the same as a short one.
+
+    Rows are numbered from the newest entry (position 0). Entry ids are
+    contiguous, so position p is the entry with id newest_id - p and a page
+    is a primary key range in the store. Pages other than the newest are
+    complete and never change, so they are cached until evicted.
+    """
+
+    def __init__(self, parent, store, colors, font, on_select=None, config=HISTORY_PANEL):
+        """
+        Create the panel's widgets.
+
+        Args:
+            parent: The tkinter widget to place the panel in
+            store (HistoryStore): Where the entries are read from
+            colors: Dictionary of color schemes from the main UI
+            font: Font for the rows
+            on_select (callable): Called with the HistoryEntry of a clicked row
+            config (dict): Sizes and intervals, see utils.styles.HISTORY_PANEL
+        """
+        self.store = store
+        self.colors = colors
+        self.font = font
+        self.on_select = on_select
+        self.row_height = config["row_height"]
+        self.page_size = config["page_size"]
+        self.cached_pages = config["cached_pages"]
+        self.poll_interval = config["poll_interval"]
+        self.expression_chars = config["expression_chars"]
+        self.result_chars = config["result_chars"]
+        self.wheel_rows = config["wheel_rows"]
+
+        # View state
+        self.newest_id = 0          # Id of the entry at position 0
+        self.generation = 0         # The store's generation when newest_id was read
+        self.total = 0              # Number of entries
+        self.offset = 0             # Scroll position in pixels from the top
+        self.width = config["width"]
+        self.height = 0
+        self.pages = OrderedDict()  # Page number -> entries, least recently used first
+        self.rows = []              # Pool of (expression item, result item)
+        self.row_positions = []     # Position each pool row currently shows
+        self.poll_job = None        # Pending root.after id while shown
+
+        # Widgets
+        self.frame = tk.Frame(parent, bg=colors["bg_dark"], bd=0)
+        self.title = tk.Label(
+            self.frame,
+            text="HISTORY",
+            font=font,
+            bg=colors["bg_dark"],
+            fg=colors["accent1"]
+        )
+        self.title.pack(fill=tk.X, pady=(20, 5))
+        self.scrollbar = tk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=(0, 20))
+        self.canvas = tk.Canvas(
+            self.frame,
+            bg=colors["display_bg"],
+            highlightthickness=0,
+            width=self.width
+        )
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=(0, 20))
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", self.on_wheel)
+        self.canvas.bind("<Button-5>", self.on_wheel)
+        self.canvas.bind("<Button-1>", self.on_click)
+
+    #-------------------------------------------------------------------------
+    # Showing and Refreshing
+    #-------------------------------------------------------------------------
+
+    def show(self):
+        """Start following the history for new entries."""
+        self.refresh()
+        if self.poll_job is None:
+            self.poll_job = self.frame.after(self.poll_interval, self.poll)
+
+    def hide(self):
+        """Stop following the history."""
+        if self.poll_job is not None:
+            self.frame.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    def poll(self):
+        """Pick up new entries and check again later."""
+        self.refresh()
+        self.poll_job = self.frame.after(self.poll_interval, self.poll)
+
+    def refresh(self):
+        """
+        Catch up with entries written since the last refresh.
+
+        Only the newest (partial) page is re-read. A scrolled view keeps
+        showing the same entries; a view at the top follows new ones.
+        """
+        generation = self.store.generation
+        newest_id = self.store.last_id()
+        if generation == self.generation and newest_id == self.newest_id:
+            return
+        if generation != self.generation:
+            # The history was cleared, and its ids may have been reused since
+            self.generation = generation
+            self.pages.clear()
+            self.offset = 0
+        else:
+            self.pages.pop(self.page_of(self.newest_id), None)
+            if self.offset:
+                self.offset += (newest_id - self.newest_id) * self.row_height
+        self.newest_id = newest_id
+        self.total = self.store.count()
+        self.row_positions = [None] * len(self.rows)
+        self.redraw()
+
+    def set_colors(self, colors):
+        """Recolor the panel for another color scheme."""
+        self.colors = colors
+        self.frame.config(bg=colors["bg_dark"])
+        self.title.config(bg=colors["bg_dark"], fg=colors["accent1"])
+        self.canvas.config(bg=colors["display_bg"])
+        self.row_positions = [None] * len(self.rows)
+        self.redraw()
+
+    #-------------------------------------------------------------------------
+    # Entries
+    #-------------------------------------------------------------------------
+
+    def page_of(self, entry_id):
+        """Return the number of the page holding an entry id."""
+        return (entry_id - 1) // self.page_size
+
+    def entry_at(self, position):
+        """
+        Return the entry at a position, reading its page if needed.
+
+        Args:
+            position (int): Rows from the newest entry
+
+        Returns:
+            HistoryEntry: The entry, or None past the end of the history
+        """
+        entry_id = self.newest_id - position
+        if position < 0 or entry_id < 1:
+            return None
+        number = self.page_of(entry_id)
+        page = self.pages.get(number)
+        if page is None:
+            first_id = number * self.page_size + 1
+            page = self.store.entries(first_id, first_id + self.page_size - 1)
+            self.pages[number] = page
+            if len(self.pages) > self.cached_pages:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(number)
+        index = entry_id - 1 - number * self.page_size
+        return page[index] if index < len(page) else None
+
+    #-------------------------------------------------------------------------
+    # Drawing
+    #-------------------------------------------------------------------------
+
+    def on_resize(self, event):
+        """Grow the row pool to cover the new height."""
+        self.width = event.width
+        self.height = event.height
+        needed = self.height // self.row_height + 2
+        while len(self.rows) < needed:
+            self.rows.append((
+                self.canvas.create_text(0, 0, anchor=tk.W, font=self.font, tags=("row",)),
+                self.canvas.create_text(0, 0, anchor=tk.E, font=self.font, tags=("row",)),
+            ))
+            self.row_positions.append(None)
+        self.row_positions = [None] * len(self.rows)
+        self.redraw()
+
+    def redraw(self):
+        """
+        Place the pooled rows for the current scroll position.
+
+        Row slot p % len(rows) always shows position p, so scrolling by a
+        few rows relabels only the rows that came into view; the others
+        are just moved.
+        """
+        self.offset = max(0, min(self.offset, self.max_offset()))
+        count = len(self.rows)
+        if not count:
+            return
+        row_height = self.row_height
+        first = self.offset // row_height
+        shift = self.offset - first * row_height
+        right = self.width - 6
+        canvas = self.canvas
+        for position in range(first, first + count):
+            slot = position % count
+            expression_item, result_item = self.rows[slot]
+            if self.row_positions[slot] != position:
+                self.row_positions[slot] = position
+                entry = self.entry_at(position)
+                if entry is None:
+                    canvas.itemconfigure(expression_item, text="")
+                    canvas.itemconfigure(result_item, text="")
+                elif entry.success:
+                    canvas.itemconfigure(expression_item, fill=self.colors["text_dim"],
+                                         text=clip(entry.expression, self.expression_chars))
+                    canvas.itemconfigure(result_item, fill=self.colors["accent1"],
+                                         text=clip(entry.result, self.result_chars))
+                else:
+                    canvas.itemconfigure(expression_item, fill=self.colors["text_dim"],
+                                         text=clip(entry.expression, self.expression_chars))
+                    canvas.itemconfigure(result_item, fill=self.colors["accent2"], text="Error")
+            y = (position - first) * row_height - shift + row_height // 2
+            canvas.coords(expression_item, 6, y)
+            canvas.coords(result_item, right, y)
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        """Show the visible fraction of the history on the scrollbar."""
+        content = self.total * self.row_height
+        if content <= self.height or not content:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / content, (self.offset + self.height) / content)
+
+    #-------------------------------------------------------------------------
+    # Scrolling
+    #-------------------------------------------------------------------------
+
+    def max_offset(self):
+        """Return the largest scroll position, in pixels."""
+        return max(0, self.total * self.row_height - self.height)
+
+    def scroll_to(self, offset):
+        """Scroll so the given pixel offset is at the top."""
+        self.offset = int(offset)
+        self.redraw()
+
+    def scroll_rows(self, rows):
+        """Scroll by a number of rows (negative scrolls toward newer entries)."""
+        self.scroll_to(self.offset + rows * self.row_height)
+
+    def yview(self, *args):
+        """
+        Scroll from the scrollbar, like Canvas.yview.
+
+        Args:
+            *args: ("moveto", fraction) or ("scroll", count, "units" | "pages")
+        """
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total * self.row_height)
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if args[2] == "pages":
+                count *= max(1, self.height // self.row_height - 1)
+            self.scroll_rows(count)
+
+    def on_wheel(self, event):
+        """Scroll with the mouse wheel (MouseWheel events, or buttons 4 and 5 on X11)."""
+        newer = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.scroll_rows(-self.wheel_rows if newer else self.wheel_rows)
+
+    def on_click(self, event):
+        """Pass the clicked entry to on_select."""
+        entry = self.entry_at((self.offset + event.y) // self.row_height)
+        if entry is not None and self.on_select is not None:
+            self.on_select(entry)
@@ -0,0 +1,245 @@
+"""
+Game-Style Calculator - Big Integer Rendering
+Decimal digits of huge integer results, computed only as far as needed.
+
+Converting an integer to a string is quadratic in CPython (and refused past
+sys.get_int_max_str_digits()), so a result like 2^1000000 is never turned
+into a string just to be displayed. LazyInteger finds the digit count and
+the leading and trailing digits from a few machine words of the value, and
+converts the whole number only when asked to, divide-and-conquer style
+through the decimal module, whose multiplication is subquadratic.
+"""
+
+# Standard library imports
+import decimal
+from decimal import Decimal
+
+# Integers this small are converted with str() directly
+_SMALL_BITS = 192
+
+# Working precision for estimating the leading digits; the estimate is
+# bracketed, so the precision only decides how rarely the exact (slow)
+# fallback is needed
+_ESTIMATE_CONTEXT = decimal.Context(prec=60, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+_SLACK = Decimal("1e-50")
+
+# Block size, in bits, below which the divide-and-conquer conversion uses
+# Decimal(int) directly
+_LEAF_BITS = 256
+
+DEFAULT_CHUNK_SIZE = 65536
+
+#-----------------------------------------------------------------------------
+# Digit Estimates
+#-----------------------------------------------------------------------------
+
+def _bounds(value):
+    """
+    Bracket a positive integer between two Decimals.
+
+    Only the top _SMALL_BITS bits take part, so the cost does not depend on
+    the size of the value.
+    """
+    shift = max(0, value.bit_length() - _SMALL_BITS)
+    top = value >> shift
+    context = _ESTIMATE_CONTEXT
+    scale = context.power(2, shift)
+    lower = context.multiply(context.multiply(top, scale), 1 - _SLACK)
+    upper = context.multiply(context.multiply(top + 1, scale), 1 + _SLACK)
+    return lower, upper
+
+
+def _leading_and_count(value, count):
+    """
+    Return (first count digits as an int, total digit count) of a positive integer.
+
+    Both bounds agreeing settles the answer; otherwise the value sits
+    extremely close to a digit boundary (10^k itself, for instance) and
+    is checked exactly.
+    """
+    if value.bit_length() <= _SMALL_BITS:
+        text = str(value)
+        return int(text[:count]), len(text)
+    lower, upper = _bounds(value)
+    exponent = lower.adjusted()
+    if upper.adjusted() == exponent:
+        low = lower.scaleb(count - 1 - exponent).to_integral_value(decimal.ROUND_FLOOR)
+        high = upper.scaleb(count - 1 - exponent).to_integral_value(decimal.ROUND_FLOOR)
+        if low == high:
+            return int(low), exponent + 1
+    # Exact fallback, with one big power of ten: costs about as much as
+    # computing a power like 10^k did in the first place
+    scale = 10 ** max(0, exponent + 1 - count)
+    leading = value // scale
+    if leading >= 10 ** count:
+        return leading // 10, exponent + 2
+    return leading, exponent + 1
+
+#-----------------------------------------------------------------------------
+# Full Conversion
+#-----------------------------------------------------------------------------
+
+def to_decimal_string(value):
+    """
+    Convert an integer of any size to its decimal digits.
+
+    Splits the value's bits in halves recursively and recombines the
+    halves as Decimals (hi · 2^k + lo), caching the powers of two.
+
+    Args:
+        value (int): Integer to convert
+
+    Returns:
+        str: The digits, with a leading "-" for negative values
+    """
+    if value.bit_length() <= _SMALL_BITS:
+        return str(value)
+    powers = {}
+
+    def power_of_two(bits):
+        result = powers.get(bits)
+        if result is None:
+            if bits <= _LEAF_BITS:
+                result = Decimal(1 << bits)
+            else:
+                half = bits >> 1
+                result = power_of_two(half) * power_of_two(bits - half)
+            powers[bits] = result
+        return result
+
+    def convert(number, bits):
+        if bits <= _LEAF_BITS:
+            return Decimal(number)
+        half = bits >> 1
+        high = number >> half
+        low = number - (high << half)
+        return convert(high, bits - half) * power_of_two(half) + convert(low, half)
+
+    with decimal.localcontext() as context:
+        context.prec = decimal.MAX_PREC
+        context.Emax = decimal.MAX_EMAX
+        context.traps[decimal.Inexact] = True
+        digits = str(convert(abs(value), value.bit_length()))
+    return "-" + digits if value < 0 else digits
+
+#-----------------------------------------------------------------------------
+# Lazy Result
+#-----------------------------------------------------------------------------
+
+class LazyInteger:
+    """
+    An integer result that renders its decimal digits on demand.
+
+    The digit count, the leading digits and the trailing digits cost
+    microseconds whatever the size of the value; the full digits are only
+    produced by chunks() and write(), for copying or saving the result.
+    """
+    __slots__ = ("value", "_digit_count")
+
+    def __init__(self, value):
+        """
+        Wrap an integer.
+
+        Args:
+            value (int): The integer result
+        """
+        self.value = value
+        self._digit_count = None
+
+    def __repr__(self):
+        return f"LazyInteger({self.scientific()}, {self.digit_count} digits)"
+
+    def __str__(self):
+        return self.scientific()
+
+    @property
+    def digit_count(self):
+        """int: Number of decimal digits, without the sign."""
+        if self._digit_count is None:
+            self._digit_count = _leading_and_count(abs(self.value), 1)[1] if self.value else 1
+        return self._digit_count
+
+    def leading(self, count=10):
+        """
+        Return the first digits of the value.
+
+        Args:
+            count (int): Number of digits wanted
+
+        Returns:
+            str: Up to count leading digits (all of them for short values)
+        """
+        if not self.value:
+            return "0"
+        leading, self._digit_count = _leading_and_count(abs(self.value), count)
+        return str(leading)
+
+    def trailing(self, count=10):
+        """
+        Return the last digits of the value.
+
+        Args:
+            count (int): Number of digits wanted
+
+        Returns:
+            str: Up to count trailing digits, with their zeros kept
+        """
+        digits = str(abs(self.value) % 10 ** count)
+        return digits.zfill(min(count, self.digit_count))
+
+    def scientific(self, significant=10):
+        """
+        Render the value like other large results: 9.900656229e+301029.
+
+        Args:
+            significant (int): Significant digits shown, rounded half up
+
+        Returns:
+            str: The value in exponent notation
+        """
+        if not self.value:
+            return "0"
+        digits = int(self.leading(significant + 1))
+        exponent = self.digit_count - 1
+        if digits >= 10 ** significant:
+            digits = (digits + 5) // 10
+            if digits == 10 ** significant:
+                # Rounding up carried into a new digit (9.99...95 -> 1.0)
+                digits //= 10
+                exponent += 1
+        mantissa = str(digits).rstrip("0") or "0"
+        if len(mantissa) > 1:
+            mantissa = mantissa[0] + "." + mantissa[1:]
+        sign = "-" if self.value < 0 else ""
+        return f"{sign}{mantissa}e+{exponent:02d}"
+
+    def chunks(self, size=DEFAULT_CHUNK_SIZE):
+        """
+        Yield the full decimal digits in pieces.
+
+        Args:
+            size (int): Characters per piece (the last may be shorter)
+
+        Yields:
+            str: Consecutive pieces of the digits, the sign in the first one
+        """
+        digits = to_decimal_string(self.value)
+        for start in range(0, len(digits), size):
+            yield digits[start:start + size]
+
+    def write(self, stream, size=DEFAULT_CHUNK_SIZE):
+        """
+        Write the full decimal digits to a text stream, chunk by chunk.
+
+        Args:
+            stream: Object with a write(str) method (file, socket wrapper, ...)
+            size (int): Characters per write
+
+        Returns:
+            int: Number of characters written
+        """
+        written = 0
+        for chunk in self.chunks(size):
+            stream.write(chunk)
+            written += len(chunk)
+        return written
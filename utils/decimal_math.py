@@ -0,0 +1,436 @@
+"""
+Game-Style Calculator - Decimal Math Kernels
+Arbitrary-precision constants and elementary functions for decimal.Decimal,
+used by the calculator's selectable-precision mode.
+
+Every function takes the number of significant digits to work to. Constants
+are computed once at the largest precision asked for and rounded for smaller
+ones, and series coefficients are cached for recent precisions, so after the
+first evaluation at a given precision only the series themselves run.
+"""
+
+# Standard library imports
+import decimal
+from decimal import Decimal
+from functools import lru_cache
+
+# Extra digits carried through a calculation and dropped when the result
+# is rounded, so rounding errors of intermediate steps do not show
+GUARD_DIGITS = 10
+
+# Largest integer part, in digits, that sin, cos and tan reduce by π/2.
+# Reducing x needs π to as many digits as x has, which costs time quadratic
+# in that number, so larger arguments are refused
+MAX_REDUCTION_DIGITS = 20_000
+
+_ONE = Decimal(1)
+
+#-----------------------------------------------------------------------------
+# Constants
+#-----------------------------------------------------------------------------
+
+def _arctan_inverse(n, scale):
+    """Return arctan(1/n) * scale as an integer (fixed-point Taylor series)."""
+    power = scale // n
+    total = power
+    n_squared = n * n
+    k = 3
+    sign = -1
+    while power:
+        power //= n_squared
+        total += sign * (power // k)
+        sign = -sign
+        k += 2
+    return total
+
+
+def _from_fixed(value, digits, precision):
+    """Turn a fixed-point integer with the given number of decimals into a Decimal."""
+    context = decimal.Context(prec=precision)
+    return context.create_decimal(value).scaleb(-digits, context)
+
+
+def _machin_pi(digits):
+    """π·10^digits as an integer, by Machin's formula."""
+    scale = 10 ** digits
+    return 16 * _arctan_inverse(5, scale) - 4 * _arctan_inverse(239, scale)
+
+
+def _series_e(digits):
+    """e·10^digits as an integer, summing 1/n!."""
+    term = 10 ** digits
+    total = 0
+    n = 0
+    while term:
+        total += term
+        n += 1
+        term //= n
+    return total
+
+
+# series -> (digits, exact Decimal): the most precise value computed so
+# far, carrying GUARD_DIGITS beyond the precision it was computed for
+_constants = {}
+
+
+def _constant(series, precision):
+    """
+    Return a constant to the given number of significant digits.
+
+    Only the most precise value is kept; smaller precisions are rounded
+    from it, which is as accurate as summing the series again.
+
+    Args:
+        series (callable): Returns the constant times 10^digits as an int
+        precision (int): Significant digits
+    """
+    digits = precision + GUARD_DIGITS
+    known = _constants.get(series)
+    if known is None or known[0] < digits:
+        # The integer has one digit before the point, so this is exact
+        known = _constants[series] = (digits, _from_fixed(series(digits), digits, digits + 1))
+    return decimal.Context(prec=precision).plus(known[1])
+
+
+@lru_cache(maxsize=32)
+def pi(precision):
+    """
+    Return π to the given number of significant digits.
+
+    Uses Machin's formula π = 16·arctan(1/5) - 4·arctan(1/239) in
+    fixed-point integer arithmetic.
+
+    Args:
+        precision (int): Significant digits
+
+    Returns:
+        Decimal: π, correctly rounded
+    """
+    return _constant(_machin_pi, precision)
+
+
+@lru_cache(maxsize=32)
+def e(precision):
+    """
+    Return e to the given number of significant digits.
+
+    Sums 1/n! in fixed-point integer arithmetic.
+
+    Args:
+        precision (int): Significant digits
+
+    Returns:
+        Decimal: e, correctly rounded
+    """
+    return _constant(_series_e, precision)
+
+
+@lru_cache(maxsize=32)
+def _inverse_factorials(precision):
+    """
+    Return the coefficient table 1/0!, 1/1!, 1/2!, ... for the sin/cos series.
+
+    The table stops where 1/n! drops below the precision, which is enough
+    for arguments up to 1 (the series only sees |x| <= π/4).
+    """
+    context = decimal.Context(prec=precision)
+    limit = Decimal(10) ** -(precision + 1)
+    table = []
+    value = _ONE
+    n = 0
+    while value > limit:
+        table.append(value)
+        n += 1
+        value = context.divide(value, n)
+    return tuple(table)
+
+#-----------------------------------------------------------------------------
+# Elementary Functions
+#-----------------------------------------------------------------------------
+
+def _series(x_squared, coefficients, start, context):
+    """Sum the alternating series Σ (-1)^k · coefficients[start + 2k] · x^(2k)."""
+    total = Decimal(0)
+    power = _ONE
+    sign = 1
+    for index in range(start, len(coefficients), 2):
+        term = context.multiply(power, coefficients[index])
+        if not term:
+            break
+        total = context.add(total, term) if sign > 0 else context.subtract(total, term)
+        power = context.multiply(power, x_squared)
+        sign = -sign
+    return total
+
+
+def _reduce(x, precision):
+    """
+    Reduce x to r in [-π/4, π/4] with x = r + k·π/2.
+
+    π is taken with enough extra digits to cover the integer part of x, so
+    large arguments keep their precision.
+
+    Returns:
+        tuple: (r, k mod 4, Context for the series)
+
+    Raises:
+        OverflowError: If x has more than MAX_REDUCTION_DIGITS integer digits
+    """
+    if x.adjusted() >= MAX_REDUCTION_DIGITS:
+        raise OverflowError("math range error")
+    extra = max(0, x.adjusted()) + GUARD_DIGITS
+    context = decimal.Context(prec=precision + extra)
+    half_pi = context.divide(pi(precision + extra), 2)
+    k = context.divide(x, half_pi).to_integral_value(decimal.ROUND_HALF_EVEN)
+    r = context.subtract(x, context.multiply(k, half_pi))
+    return r, int(k) % 4, decimal.Context(prec=precision + GUARD_DIGITS)
+
+
+def _sin_cos(x, precision):
+    """Return (sin x, cos x) before the final rounding."""
+    r, quadrant, context = _reduce(x, precision)
+    coefficients = _inverse_factorials(context.prec)
+    r_squared = context.multiply(r, r)
+    sin_r = context.multiply(r, _series(r_squared, coefficients, 1, context))
+    cos_r = _series(r_squared, coefficients, 0, context)
+    if quadrant == 0:
+        return sin_r, cos_r
+    if quadrant == 1:
+        return cos_r, -sin_r
+    if quadrant == 2:
+        return -sin_r, -cos_r
+    return -cos_r, sin_r
+
+
+def sin(x, precision):
+    """
+    Sine of x (radians) to the given number of significant digits.
+
+    Args:
+        x (Decimal): Angle in radians
+        precision (int): Significant digits
+
+    Returns:
+        Decimal: sin(x)
+    """
+    return decimal.Context(prec=precision).plus(_sin_cos(to_decimal(x), precision)[0])
+
+
+def cos(x, precision):
+    """
+    Cosine of x (radians) to the given number of significant digits.
+
+    Args:
+        x (Decimal): Angle in radians
+        precision (int): Significant digits
+
+    Returns:
+        Decimal: cos(x)
+    """
+    return decimal.Context(prec=precision).plus(_sin_cos(to_decimal(x), precision)[1])
+
+
+def tan(x, precision):
+    """
+    Tangent of x (radians) to the given number of significant digits.
+
+    Args:
+        x (Decimal): Angle in radians
+        precision (int): Significant digits
+
+    Returns:
+        Decimal: tan(x)
+    """
+    sine, cosine = _sin_cos(to_decimal(x), precision)
+    return decimal.Context(prec=precision).divide(sine, cosine)
+
+
+def sqrt(x, precision):
+    """
+    Square root to the given number of significant digits.
+
+    Decimal's own square root is already correctly rounded at any precision.
+
+    Raises:
+        ValueError: For negative x, like math.sqrt
+    """
+    x = to_decimal(x)
+    if x < 0:
+        raise ValueError("math domain error")
+    return decimal.Context(prec=precision).sqrt(x)
+
+
+def log10(x, precision):
+    """
+    Base-10 logarithm to the given number of significant digits.
+
+    Decimal's own log10 is correctly rounded at any precision.
+
+    Raises:
+        ValueError: For x <= 0, like math.log10
+    """
+    x = to_decimal(x)
+    if x <= 0:
+        raise ValueError("math domain error")
+    return decimal.Context(prec=precision).log10(x)
+
+
+def radians(x, precision):
+    """Convert degrees to radians using π at the given precision."""
+    context = decimal.Context(prec=precision)
+    return context.divide(context.multiply(to_decimal(x), pi(precision)), 180)
+
+
+def power(x, y):
+    """
+    x^y in the current context, treating zero bases like exact arithmetic.
+
+    Decimal gives Infinity for 0^-1 and signals an invalid operation for
+    0^0; the exact backend raises ZeroDivisionError and returns 1.
+
+    Raises:
+        ZeroDivisionError: For a zero base and a negative exponent
+    """
+    if not x:
+        if not y:
+            return _ONE
+        if y < 0:
+            raise ZeroDivisionError("0 cannot be raised to a negative power")
+    return x ** y
+
+#-----------------------------------------------------------------------------
+# Conversion and Formatting
+#-----------------------------------------------------------------------------
+
+# type -> converter; floats go through their shortest repr, so the literal
+# 0.1 becomes Decimal("0.1") rather than the binary float's exact value
+_CONVERTERS = {
+    Decimal: lambda value: value,
+    int: Decimal,
+    float: lambda value: Decimal(repr(value)),
+}
+
+
+def to_decimal(value, context=None):
+    """
+    Convert a number (int, float, Fraction, Decimal) to a Decimal.
+
+    Args:
+        value: Number to convert
+        context (decimal.Context): Precision to divide out Fractions at;
+            defaults to the current context
+
+    Returns:
+        Decimal: The value; exact except for Fractions
+    """
+    convert = _CONVERTERS.get(type(value))
+    if convert is not None:
+        return convert(value)
+    if not hasattr(value, "denominator"):
+        raise TypeError(f"Cannot convert {type(value).__name__} to Decimal")
+    context = context or decimal.getcontext()
+    return context.divide(Decimal(value.numerator), Decimal(value.denominator))
+
+
+def format_decimal(value):
+    """
+    Format a Decimal result for display.
+
+    Every significant digit is shown, without trailing zeros. Values are
+    written out in full while that needs no padding zeros beyond 16 integer
+    digits (like float results), otherwise in exponent notation.
+
+    Args:
+        value (Decimal): Result, already rounded to the working precision
+
+    Returns:
+        str: Display text
+    """
+    if not value:
+        return "0"
+    value = value.normalize(decimal.Context(prec=len(value.as_tuple().digits)))
+    adjusted = value.adjusted()
+    if -7 < adjusted < max(16, len(value.as_tuple().digits)):
+        return f"{value:f}"
+    return f"{value:e}"
+
+#-----------------------------------------------------------------------------
+# Evaluation Context
+#-----------------------------------------------------------------------------
+
+class DecimalArithmetic:
+    """
+    Runs compiled expressions on Decimals at a fixed precision.
+
+    Supplies the hooks the calculator's Backend expects from numbers with a
+    context: convert() for literals and registers, scope() for constant
+    folding and wrap() for evaluation. Intermediate steps carry
+    GUARD_DIGITS extra digits; only the final result is rounded to the
+    requested precision.
+    """
+    __slots__ = ("precision", "working", "result")
+
+    def __init__(self, precision):
+        """
+        Initialize the contexts for a precision.
+
+        Args:
+            precision (int): Significant digits of results
+        """
+        self.precision = precision
+        self.working = decimal.Context(prec=precision + GUARD_DIGITS)
+        self.result = decimal.Context(prec=precision)
+
+    def convert(self, value, text=None):
+        """
+        Convert a literal or register value to a Decimal.
+
+        Args:
+            value: The number
+            text (str): Source text of a float literal; read exactly when
+                given, so digits beyond float precision are kept
+        """
+        if text is not None:
+            return Decimal(text)
+        return to_decimal(value, self.working)
+
+    def scope(self):
+        """Return a context manager that makes the working context current."""
+        return decimal.localcontext(self.working)
+
+    def wrap(self, run):
+        """
+        Wrap a compiled expression's evaluator.
+
+        The returned function evaluates in the working context, rounds the
+        result to the precision and reports decimal signals, and infinite
+        results, as the errors exact arithmetic would raise.
+
+        Args:
+            run (callable): Evaluator taking the environment dict
+
+        Returns:
+            callable: Evaluator with the same signature
+        """
+        working = self.working
+        finish = self.result.plus
+
+        def evaluate(env):
+            try:
+                with decimal.localcontext(working):
+                    value = run(env)
+                value = finish(value)
+            except ZeroDivisionError:
+                # decimal's DivisionByZero is also a ZeroDivisionError
+                raise ZeroDivisionError("division by zero") from None
+            except decimal.Overflow:
+                raise OverflowError("math range error") from None
+            except decimal.InvalidOperation as e:
+                # The signals that caused it are listed in the arguments
+                if decimal.DivisionUndefined in e.args[0]:
+                    raise ZeroDivisionError("division by zero") from None
+                raise ValueError("math domain error") from None
+            if not value.is_finite():
+                raise OverflowError("math range error")
+            return value
+        return evaluate
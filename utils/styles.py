@@ -98,6 +98,28 @@ ANIMATION = {
     "boot_sequence_delay": 400,  # Delay between boot text frames (ms)
     "char_animation_delay": 50,  # Delay in character animation effects (ms)
     "wave_step_delay": 50,       # Delay between waves in button animations
+    "calc_poll_interval": 15,    # Delay between checks on a background calculation (ms)
+    "computing_delay": 100,      # Time before showing the COMPUTING indicator (ms)
+    "preview_delay": 150,        # Typing pause before showing the live result preview (ms)
+}
+
+# Expression display configuration
+DISPLAY = {
+    "expression_chars": 28,      # Characters of the expression shown around the cursor
+    "cursor_marker": "▏",        # Drawn at the cursor when it is not at the end
+    "preview_separator": " = ",  # Between the expression and its live result preview
+}
+
+# History side panel configuration
+HISTORY_PANEL = {
+    "width": 260,                # Panel width beside the cabinet (pixels)
+    "row_height": 22,            # Height of one history row (pixels)
+    "page_size": 64,             # Entries read from the history store at a time
+    "cached_pages": 16,          # Pages kept in memory while scrolling
+    "poll_interval": 250,        # Delay between checks for new entries while shown (ms)
+    "expression_chars": 16,      # Characters of each expression shown
+    "result_chars": 12,          # Characters of each result shown
+    "wheel_rows": 3,             # Rows scrolled per mouse wheel notch
 }
 
 # Easter egg configurations
@@ -0,0 +1,200 @@
+"""
+Game-Style Calculator - Timing Histograms
+Latency histograms for the phases of an evaluation, kept while timing is
+enabled in the calculator core.
+
+Histograms are HDR-style: values are bucketed log-linearly, so every
+recorded latency costs one small update, memory stays constant whatever
+the number of samples, and every percentile is accurate to within
+1/HALF_BUCKETS of its value (under 1%) from nanoseconds to minutes.
+"""
+
+# Standard library imports
+import json
+import threading
+
+# Sub-buckets per power of two: each bucket spans at most 1/128 of its values
+SUB_BUCKET_BITS = 8
+HALF_BUCKETS = 1 << (SUB_BUCKET_BITS - 1)
+
+# Percentiles reported by Histogram.summary()
+PERCENTILES = (50, 90, 99, 99.9)
+
+#-----------------------------------------------------------------------------
+# Histogram
+#-----------------------------------------------------------------------------
+
+def bucket_index(value):
+    """
+    Return the bucket of a non-negative integer.
+
+    Values below 2^SUB_BUCKET_BITS have a bucket each; above that, each
+    power of two is split into HALF_BUCKETS equal buckets.
+    """
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    if shift <= 0:
+        return value
+    return shift * HALF_BUCKETS + (value >> shift)
+
+
+def bucket_bounds(index):
+    """
+    Return the range of values in a bucket.
+
+    Returns:
+        tuple: (lowest, highest) value, inclusive
+    """
+    if index < 2 * HALF_BUCKETS:
+        return index, index
+    shift = index // HALF_BUCKETS - 1
+    low = (index - shift * HALF_BUCKETS) << shift
+    return low, low + (1 << shift) - 1
+
+
+class Histogram:
+    """
+    Log-linear histogram of integer samples (nanoseconds, here).
+
+    Keeps a count per non-empty bucket plus the exact count, total,
+    minimum and maximum.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """
+        Add one sample.
+
+        Args:
+            value (int): Sample, >= 0
+        """
+        index = bucket_index(value)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """
+        Return the value below which percent of the samples fall.
+
+        Args:
+            percent (float): 0 to 100
+
+        Returns:
+            int: The highest value of the bucket reaching that rank
+                (capped at the maximum), or 0 when empty
+        """
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def mean(self):
+        """float: Average sample, 0 when empty."""
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, scale=1e-3):
+        """
+        Summarize the histogram.
+
+        Args:
+            scale (float): Factor applied to values (default: ns -> µs)
+
+        Returns:
+            dict: count, min, mean, max and the PERCENTILES as p50, p99, ...
+        """
+        result = {
+            "count": self.count,
+            "min": round((self.min or 0) * scale, 3),
+            "mean": round(self.mean() * scale, 3),
+            "max": round((self.max or 0) * scale, 3),
+        }
+        for percent in PERCENTILES:
+            result[f"p{percent:g}"] = round(self.percentile(percent) * scale, 3)
+        return result
+
+#-----------------------------------------------------------------------------
+# Phase Timings
+#-----------------------------------------------------------------------------
+
+class PhaseTimings:
+    """
+    One histogram per evaluation phase, safe to update from many threads.
+    """
+
+    def __init__(self, phases):
+        """
+        Initialize empty histograms.
+
+        Args:
+            phases (tuple): Phase names, in pipeline order
+        """
+        self.phases = phases
+        self.histograms = {phase: Histogram() for phase in phases}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, durations, failed=False):
+        """
+        Record the durations of one evaluation.
+
+        Args:
+            durations (list): Nanoseconds per phase, in the order of
+                self.phases; stops at the failing phase of a failed evaluation
+            failed (bool): Whether the evaluation raised
+        """
+        with self._lock:
+            histograms = self.histograms
+            for phase, duration in zip(self.phases, durations):
+                histograms[phase].record(duration)
+            if failed:
+                self.errors += 1
+
+    def reset(self):
+        """Forget every sample."""
+        with self._lock:
+            self.histograms = {phase: Histogram() for phase in self.phases}
+            self.errors = 0
+
+    def stats(self):
+        """
+        Summarize every phase, in microseconds.
+
+        Returns:
+            dict: {"unit": "us", "errors": n, "phases": {phase: summary}}
+        """
+        with self._lock:
+            return {
+                "unit": "us",
+                "errors": self.errors,
+                "phases": {phase: histogram.summary() for phase, histogram in self.histograms.items()},
+            }
+
+    def dump(self, path):
+        """
+        Write stats() to a JSON file.
+
+        Args:
+            path (str): File to write
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, indent=2)
+            f.write("\n")